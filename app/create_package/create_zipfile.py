@@ -1,7 +1,8 @@
 import os
-import zipfile
 import logging
 
+from app.processing.zip_archive import ZipArchiveBuilder
+
 logger = logging.getLogger(__name__)
 
 
@@ -20,12 +21,18 @@ def create_zip_file(source_folder, output_zip_path):
     os.makedirs(os.path.dirname(output_zip_path), exist_ok=True)
 
     try:
-        with zipfile.ZipFile(output_zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, dirs, files in os.walk(source_folder):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, start=source_folder)
-                    zipf.write(file_path, arcname)
+        builder = ZipArchiveBuilder(output_zip_path, base_dir=source_folder)
+        try:
+            futures = [
+                builder.submit(os.path.join(root, file))
+                for root, dirs, files in os.walk(source_folder)
+                for file in files
+                if os.path.abspath(os.path.join(root, file)) != os.path.abspath(output_zip_path)
+            ]
+            for future in futures:
+                future.result()
+        finally:
+            builder.close()
         logger.info(f"Zip file created at {output_zip_path}")
     except Exception as e:
         logger.error(f"Failed to create zip file {output_zip_path}: {e}")
@@ -33,11 +40,16 @@ def create_zip_file(source_folder, output_zip_path):
 
 
 def create_zip_archive(OUTPUT_PDFS_DIR, zip_filename):
-    with zipfile.ZipFile(zip_filename, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for root, dirs, files in os.walk(OUTPUT_PDFS_DIR):
-            for file in files:
-                if not file.endswith('.zip'):
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, OUTPUT_PDFS_DIR)
-                    zipf.write(file_path, arcname=arcname)
-    logging.info(f"ZIP-Archiv erstellt: {zip_filename}")
+    # PDFs werden nach Stichprobe unverändert gespeichert oder parallel komprimiert
+    builder = ZipArchiveBuilder(zip_filename, base_dir=OUTPUT_PDFS_DIR)
+    try:
+        futures = [
+            builder.submit(os.path.join(root, file))
+            for root, dirs, files in os.walk(OUTPUT_PDFS_DIR)
+            for file in files
+            if not file.endswith(('.zip', '.deflate'))
+        ]
+        for future in futures:
+            future.result()
+    finally:
+        builder.close()
@@ -0,0 +1,326 @@
+# app/processing/adaptive_concurrency.py
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Deque, Dict, Optional
+
+import psutil
+
+from config import (
+    logger,
+    RENDER_MIN_CONCURRENCY,
+    RENDER_MAX_CONCURRENCY,
+    RENDER_INITIAL_CONCURRENCY,
+    RENDER_MEMORY_LIMIT_MB,
+    RENDER_MEMORY_HIGH_PERCENT,
+    RENDER_MEMORY_LOW_PERCENT,
+    RENDER_CPU_HIGH_PERCENT,
+    RENDER_CONTROL_INTERVAL,
+    RENDER_LATENCY_WINDOW_SECONDS,
+)
+
+
+CGROUP_DIR = Path('/sys/fs/cgroup')
+
+
+def _read_cgroup(*names: str) -> Optional[str]:
+    """Liest die erste vorhandene cgroup-Datei (v2 zuerst, dann v1)."""
+    for name in names:
+        try:
+            return (CGROUP_DIR / name).read_text().strip()
+        except OSError:
+            continue
+    return None
+
+
+def _cgroup_stat(name: str, field: str) -> Optional[int]:
+    text = _read_cgroup(name)
+    for line in (text or '').splitlines():
+        key, _, value = line.partition(' ')
+        if key == field and value.isdigit():
+            return int(value)
+    return None
+
+
+def cgroup_memory_limit_bytes() -> Optional[int]:
+    """Speicherlimit der cgroup (Container/Dyno) oder None, wenn keines gesetzt ist."""
+    value = _read_cgroup('memory.max', 'memory/memory.limit_in_bytes')
+    if value and value.isdigit() and int(value) < psutil.virtual_memory().total:
+        return int(value)
+    return None
+
+
+def cgroup_memory_usage_bytes() -> Optional[int]:
+    """
+    Working Set der cgroup: belegter Speicher ohne inaktiven Datei-Cache, der vor einem
+    OOM-Kill zurückgewonnen würde (wie kubelet/docker stats es rechnen).
+    """
+    if (CGROUP_DIR / 'memory.current').exists():
+        usage, inactive = _read_cgroup('memory.current'), _cgroup_stat('memory.stat', 'inactive_file')
+    else:
+        usage = _read_cgroup('memory/memory.usage_in_bytes')
+        inactive = _cgroup_stat('memory/memory.stat', 'total_inactive_file')
+    if not usage or not usage.isdigit():
+        return None
+    return max(0, int(usage) - (inactive or 0))
+
+
+def cgroup_cpu_limit() -> Optional[float]:
+    """CPU-Kontingent der cgroup in Kernen (cpu.max bzw. cfs_quota) oder None ohne Kontingent."""
+    value = _read_cgroup('cpu.max')
+    if value:
+        quota, _, period = value.partition(' ')
+    else:
+        quota = _read_cgroup('cpu/cpu.cfs_quota_us') or ''
+        period = _read_cgroup('cpu/cpu.cfs_period_us') or ''
+    if quota.isdigit() and period.isdigit() and int(period):
+        return int(quota) / int(period)
+    return None
+
+
+def cgroup_cpu_usage_seconds() -> Optional[float]:
+    """Bisher verbrauchte CPU-Zeit der cgroup in Sekunden."""
+    usage = _cgroup_stat('cpu.stat', 'usage_usec')
+    if usage is not None:
+        return usage / 1e6
+    value = _read_cgroup('cpuacct/cpuacct.usage', 'cpu,cpuacct/cpuacct.usage')
+    return int(value) / 1e9 if value and value.isdigit() else None
+
+
+def detect_memory_limit_bytes() -> int:
+    """
+    Ermittelt das Speicherlimit des Prozesses: erst die cgroup (Container/Dyno),
+    sonst den physischen RAM. psutil.virtual_memory() sieht in Containern den Host.
+    """
+    if RENDER_MEMORY_LIMIT_MB:
+        return RENDER_MEMORY_LIMIT_MB * 1024 ** 2
+    return cgroup_memory_limit_bytes() or psutil.virtual_memory().total
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Semaphore mit dynamischem Limit für gleichzeitige Render-Vorgänge (AIMD).
+
+    Ein Regelkreis misst periodisch den Speicherverbrauch (Working Set der cgroup bzw. Prozessbaum
+    inkl. Chromium) relativ zum Limit, die CPU-Last (relativ zum CPU-Kontingent der cgroup, falls
+    gesetzt) und die geglättete Latenz pro Seite:
+    - Speicher über RENDER_MEMORY_HIGH_PERCENT: Limit halbieren
+    - Speicher über RENDER_MEMORY_LOW_PERCENT oder CPU ausgelastet: Limit -1
+    - sonst, wenn alle Slots belegt sind, Seiten warten und die Latenz nicht stark gestiegen ist: Limit +1
+    Basislinie der Latenz ist das Minimum der geglätteten Latenz im letzten latency_window (kein
+    Allzeit-Minimum, das einzelne schnelle Ausreißer für immer festhalten würde). Gemessen werden nur
+    echte Renders; Cache-Treffer, gesperrte Hosts und zusammengefasste Anfragen zählen nicht.
+    Laufende Renders werden nie abgebrochen, neue Slots werden nur zurückgehalten.
+    """
+
+    def __init__(
+        self,
+        min_limit: int = RENDER_MIN_CONCURRENCY,
+        max_limit: int = RENDER_MAX_CONCURRENCY,
+        initial_limit: int = RENDER_INITIAL_CONCURRENCY,
+        memory_high_percent: float = RENDER_MEMORY_HIGH_PERCENT,
+        memory_low_percent: float = RENDER_MEMORY_LOW_PERCENT,
+        cpu_high_percent: float = RENDER_CPU_HIGH_PERCENT,
+        interval: float = RENDER_CONTROL_INTERVAL,
+        latency_window: float = RENDER_LATENCY_WINDOW_SECONDS,
+    ):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = min(max(initial_limit, self.min_limit), self.max_limit)
+        self.memory_high_percent = memory_high_percent
+        self.memory_low_percent = memory_low_percent
+        self.cpu_high_percent = cpu_high_percent
+        self.interval = interval
+        self.latency_window = latency_window
+        self.memory_limit_bytes = detect_memory_limit_bytes()
+        self._cgroup_memory_limit = cgroup_memory_limit_bytes()
+        self._cpu_quota = cgroup_cpu_limit()
+        self._cpu_sample = None  # (CPU-Sekunden der cgroup, Zeitpunkt) der letzten Messung
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._control_task: Optional[asyncio.Task] = None
+        self._latency_ewma: Optional[float] = None
+        self._latency_baseline: Optional[float] = None
+        # (Zeitpunkt, EWMA) der Messungen im Fenster, aufsteigend nach EWMA (monotone Deque)
+        self._latency_window: Deque = deque()
+        self._last_sample: Dict = {}
+        self.stats = {'increases': 0, 'decreases': 0, 'completed': 0}
+
+    # ----------------------- Slots -----------------------
+
+    @asynccontextmanager
+    async def slot(self):
+        """Belegt einen Render-Slot für die Dauer des Blocks und misst dessen Latenz."""
+        await self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    async def acquire(self):
+        self._ensure_control_loop()
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future in self._waiters:
+                self._waiters.remove(future)
+            elif future.done() and not future.cancelled():
+                # Slot wurde bereits zugeteilt, aber nicht mehr gebraucht
+                self.active -= 1
+                self._wake_waiters()
+            raise
+
+    def release(self, latency: Optional[float] = None):
+        self.active -= 1
+        if latency is not None:
+            self._record_latency(latency)
+        self._wake_waiters()
+
+    def _wake_waiters(self):
+        while self._waiters and self.active < self.limit:
+            future = self._waiters.popleft()
+            if not future.done():
+                self.active += 1
+                future.set_result(None)
+
+    def _record_latency(self, latency: float):
+        self.stats['completed'] += 1
+        if self._latency_ewma is None:
+            self._latency_ewma = latency
+        else:
+            self._latency_ewma = 0.8 * self._latency_ewma + 0.2 * latency
+        # Gleitendes Minimum: ältere Werte, die nicht kleiner sind, können nie mehr Minimum werden
+        now = time.monotonic()
+        while self._latency_window and self._latency_window[-1][1] >= self._latency_ewma:
+            self._latency_window.pop()
+        self._latency_window.append((now, self._latency_ewma))
+        while self._latency_window[0][0] < now - self.latency_window:
+            self._latency_window.popleft()
+        self._latency_baseline = self._latency_window[0][1]
+
+    # ----------------------- Regelkreis -----------------------
+
+    def _ensure_control_loop(self):
+        if self._control_task is None or self._control_task.done():
+            self._cpu_percent()  # Initialisiert die CPU-Messung
+            self._control_task = asyncio.get_running_loop().create_task(self._control_loop())
+
+    async def _control_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.adjust()
+            except Exception as e:
+                logger.error(f"Fehler in der adaptiven Render-Parallelität: {e}")
+
+    def _memory_percent(self) -> float:
+        """
+        Speicherverbrauch relativ zum Limit. Mit cgroup-Limit zählt das Working Set der cgroup
+        (ersatzweise der Prozessbaum); die Systemauslastung aus virtual_memory() sieht in Containern
+        den Host und wird nur ohne cgroup-Limit herangezogen.
+        """
+        if self._cgroup_memory_limit:
+            usage = cgroup_memory_usage_bytes()
+            if usage is None:
+                usage = self._tree_rss()
+            return usage / self.memory_limit_bytes * 100
+        tree_percent = self._tree_rss() / self.memory_limit_bytes * 100 if self.memory_limit_bytes else 0.0
+        return max(tree_percent, psutil.virtual_memory().percent)
+
+    @staticmethod
+    def _tree_rss() -> int:
+        """Resident Set Size dieses Prozesses und aller Kinder (inkl. Chromium)."""
+        rss = 0
+        try:
+            processes = [psutil.Process()] + psutil.Process().children(recursive=True)
+        except psutil.NoSuchProcess:
+            processes = []
+        for proc in processes:
+            try:
+                rss += proc.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return rss
+
+    def _cpu_percent(self) -> float:
+        """
+        CPU-Auslastung seit der letzten Messung. Mit CPU-Kontingent der cgroup relativ zu diesem
+        Kontingent (psutil.cpu_percent() misst den ganzen Host), sonst systemweit.
+        """
+        if self._cpu_quota:
+            usage, now = cgroup_cpu_usage_seconds(), time.monotonic()
+            if usage is not None:
+                previous, self._cpu_sample = self._cpu_sample, (usage, now)
+                if previous is None or now <= previous[1]:
+                    return 0.0
+                return (usage - previous[0]) / ((now - previous[1]) * self._cpu_quota) * 100
+        return psutil.cpu_percent(interval=None)
+
+    def adjust(self):
+        memory_percent = self._memory_percent()
+        cpu_percent = self._cpu_percent()
+        latency_degraded = (
+            self._latency_ewma is not None and self._latency_baseline
+            and self._latency_ewma > 2 * self._latency_baseline
+        )
+        previous = self.limit
+
+        if memory_percent > self.memory_high_percent:
+            self.limit = max(self.min_limit, self.limit // 2)
+        elif memory_percent > self.memory_low_percent or cpu_percent > self.cpu_high_percent:
+            self.limit = max(self.min_limit, self.limit - 1)
+        elif self._waiters and self.active >= self.limit and not latency_degraded:
+            # Stark gestiegene Latenz hält das Limit nur an, senkt es aber nicht
+            self.limit = min(self.max_limit, self.limit + 1)
+
+        if self.limit > previous:
+            self.stats['increases'] += 1
+            self._wake_waiters()
+        elif self.limit < previous:
+            self.stats['decreases'] += 1
+            logger.info(
+                f"Render-Parallelität reduziert: {previous} -> {self.limit} "
+                f"(Speicher {memory_percent:.0f} %, CPU {cpu_percent:.0f} %)"
+            )
+
+        self._last_sample = {
+            'memory_percent': round(memory_percent, 1),
+            'cpu_percent': round(cpu_percent, 1),
+            'latency_degraded': bool(latency_degraded),
+        }
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            'limit': self.limit,
+            'active': self.active,
+            'waiting': len(self._waiters),
+            'min_limit': self.min_limit,
+            'max_limit': self.max_limit,
+            'memory_limit_mb': round(self.memory_limit_bytes / 1024 ** 2),
+            'latency_ewma_seconds': round(self._latency_ewma, 2) if self._latency_ewma else None,
+            'latency_baseline_seconds': round(self._latency_baseline, 2) if self._latency_baseline else None,
+            **self._last_sample,
+        }
+
+
+# ======================= Prozessweiter Limiter =======================
+
+_render_limiter: Optional[AdaptiveConcurrencyLimiter] = None
+
+
+def get_render_limiter() -> AdaptiveConcurrencyLimiter:
+    """Gibt den prozessweiten Limiter zurück, den sich alle Jobs auf dem Render-Loop teilen."""
+    global _render_limiter
+    if _render_limiter is None:
+        _render_limiter = AdaptiveConcurrencyLimiter()
+    return _render_limiter
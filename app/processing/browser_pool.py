@@ -0,0 +1,320 @@
+# app/processing/browser_pool.py
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+import psutil
+from playwright.async_api import async_playwright, Browser
+
+from app.processing.context_pool import ContextPool, PooledContext
+from app.processing.render_loop import render_loop
+from config import (
+    logger,
+    BROWSER_POOL_SIZE,
+    BROWSER_MAX_PAGES,
+    BROWSER_MAX_MEMORY_MB,
+    BROWSER_HEALTH_CHECK_INTERVAL,
+)
+
+# Startparameter für alle Chromium-Instanzen im Pool
+LAUNCH_ARGS = [
+    '--disable-dev-shm-usage',
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-infobars',
+    '--window-size=2560,1440',  # Größere Fenstergröße
+]
+
+
+class PooledBrowser:
+    """Eine warme Chromium-Instanz im Pool samt Nutzungszählern."""
+
+    def __init__(self, browser: Browser, process: Optional[psutil.Process], browser_id: int, stats: Dict):
+        self.browser = browser
+        self.contexts = ContextPool(browser, stats)
+        self.process = process
+        self.browser_id = browser_id
+        self.created_at = time.monotonic()
+        self.pages_rendered = 0
+        self.active_leases = 0
+        self.retired = False
+        self.retire_reason = None
+
+    def memory_mb(self) -> float:
+        """RSS des Browser-Prozesses inklusive aller Renderer-Prozesse in MB."""
+        if self.process is None:
+            return 0.0
+        try:
+            processes = [self.process] + self.process.children(recursive=True)
+            rss = 0
+            for proc in processes:
+                try:
+                    rss += proc.memory_info().rss
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    continue
+            return rss / (1024 ** 2)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return 0.0
+
+    def is_healthy(self) -> bool:
+        return not self.retired and self.browser.is_connected()
+
+    def retire(self, reason: str):
+        """Markiert den Browser zum Recycling, sobald keine Leases mehr aktiv sind."""
+        if not self.retired:
+            self.retired = True
+            self.retire_reason = reason
+            logger.info(f"Browser #{self.browser_id} wird recycelt: {reason}")
+
+
+class BrowserPool:
+    """
+    Prozessweiter Pool warmer Chromium-Instanzen.
+
+    Jobs leihen sich pro Seite einen Browser (mehrere Leases pro Browser sind erlaubt,
+    gewählt wird der am wenigsten ausgelastete). Browser werden nach einer festen Anzahl
+    gerenderter Seiten oder beim Überschreiten eines Speicherlimits recycelt, und ein
+    periodischer Health-Check ersetzt abgestürzte Instanzen.
+    Alle Methoden müssen auf dem Render-Loop ausgeführt werden.
+    """
+
+    def __init__(
+        self,
+        size: int = BROWSER_POOL_SIZE,
+        max_pages: int = BROWSER_MAX_PAGES,
+        max_memory_mb: int = BROWSER_MAX_MEMORY_MB,
+        health_check_interval: float = BROWSER_HEALTH_CHECK_INTERVAL,
+    ):
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+        self.health_check_interval = health_check_interval
+        self._playwright = None
+        self._browsers: List[PooledBrowser] = []
+        self._lock: Optional[asyncio.Lock] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self._next_id = 0
+        self._started = False
+        self.stats = {
+            'launched': 0,
+            'recycled': 0,
+            'leases': 0,
+            'pages_rendered': 0,
+            'launch_seconds_total': 0.0,
+            'contexts_created': 0,
+            'contexts_reused': 0,
+            'contexts_closed': 0,
+            'context_reset_failures': 0,
+            'context_setup_seconds_total': 0.0,
+            'context_teardown_seconds_total': 0.0,
+        }
+
+    async def start(self):
+        """Startet Playwright und füllt den Pool mit warmen Browsern."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._started:
+                return
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            while len(self._browsers) < self.size:
+                self._browsers.append(await self._launch())
+            self._health_task = asyncio.create_task(self._health_loop())
+            self._started = True
+            logger.info(f"Browser-Pool gestartet mit {len(self._browsers)} Instanzen.")
+
+    async def _launch(self) -> PooledBrowser:
+        """Startet eine neue Chromium-Instanz. Muss unter self._lock aufgerufen werden."""
+        started = time.monotonic()
+        before = self._chromium_pids()
+        browser = await self._playwright.chromium.launch(headless=True, args=LAUNCH_ARGS)
+        process = self._find_new_browser_process(before)
+        elapsed = time.monotonic() - started
+
+        self._next_id += 1
+        pooled = PooledBrowser(browser, process, self._next_id, self.stats)
+        self.stats['launched'] += 1
+        self.stats['launch_seconds_total'] += elapsed
+        logger.info(f"Browser #{pooled.browser_id} gestartet in {elapsed:.2f}s.")
+        return pooled
+
+    @staticmethod
+    def _chromium_pids() -> set:
+        try:
+            return {
+                proc.pid for proc in psutil.Process().children(recursive=True)
+                if 'chrom' in proc.name().lower() or 'headless_shell' in proc.name().lower()
+            }
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return set()
+
+    def _find_new_browser_process(self, before: set) -> Optional[psutil.Process]:
+        """Ermittelt den Hauptprozess des gerade gestarteten Browsers (für Speichermessung)."""
+        new_pids = self._chromium_pids() - before
+        for pid in new_pids:
+            try:
+                proc = psutil.Process(pid)
+                if proc.ppid() not in new_pids:
+                    return proc
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        logger.debug("Browser-Prozess konnte nicht ermittelt werden, Speicherlimit wird nicht überwacht.")
+        return None
+
+    @asynccontextmanager
+    async def lease(self):
+        """Leiht einen gesunden Browser aus dem Pool für die Dauer des Blocks."""
+        pooled = await self._acquire()
+        try:
+            yield pooled
+        finally:
+            await self._release(pooled)
+
+    @asynccontextmanager
+    async def lease_page(self):
+        """
+        Leiht einen Browser und daraus einen zurückgesetzten Kontext mit offener Seite.
+        Setzt der Aufrufer `discard` auf dem PooledContext, wird der Kontext danach verworfen.
+        """
+        async with self.lease() as pooled:
+            pooled_context: PooledContext = await pooled.contexts.acquire()
+            try:
+                yield pooled_context
+            except BaseException:
+                pooled_context.discard = True
+                raise
+            finally:
+                await pooled.contexts.release(pooled_context)
+
+    async def _acquire(self) -> PooledBrowser:
+        await self.start()
+        async with self._lock:
+            candidates = [b for b in self._browsers if b.is_healthy()]
+            if not candidates:
+                replacement = await self._launch()
+                self._browsers.append(replacement)
+                candidates = [replacement]
+            pooled = min(candidates, key=lambda b: b.active_leases)
+            pooled.active_leases += 1
+            self.stats['leases'] += 1
+            return pooled
+
+    async def _release(self, pooled: PooledBrowser):
+        pooled.active_leases -= 1
+        pooled.pages_rendered += 1
+        self.stats['pages_rendered'] += 1
+        if self.max_pages and pooled.pages_rendered >= self.max_pages:
+            pooled.retire(f"{pooled.pages_rendered} Seiten gerendert")
+        if pooled.retired and pooled.active_leases == 0:
+            async with self._lock:
+                await self._replace(pooled)
+
+    async def _replace(self, pooled: PooledBrowser):
+        """Schließt einen ausgemusterten Browser und startet bei Bedarf einen Ersatz. Unter self._lock."""
+        if pooled not in self._browsers:
+            return
+        self._browsers.remove(pooled)
+        try:
+            await pooled.browser.close()
+        except Exception as e:
+            logger.debug(f"Fehler beim Schließen von Browser #{pooled.browser_id}: {e}")
+        self.stats['recycled'] += 1
+        active = [b for b in self._browsers if not b.retired]
+        if len(active) < self.size:
+            try:
+                self._browsers.append(await self._launch())
+            except Exception as e:
+                logger.error(f"Ersatz-Browser konnte nicht gestartet werden: {e}")
+
+    async def health_check(self):
+        """Prüft alle Browser auf Verbindung und Speicherverbrauch und ersetzt ausgemusterte."""
+        async with self._lock:
+            for pooled in list(self._browsers):
+                if not pooled.browser.is_connected():
+                    pooled.retire("Verbindung verloren")
+                elif self.max_memory_mb and pooled.memory_mb() > self.max_memory_mb:
+                    pooled.retire(f"Speicherlimit überschritten ({pooled.memory_mb():.0f} MB)")
+                if pooled.retired and pooled.active_leases == 0:
+                    await self._replace(pooled)
+            while len([b for b in self._browsers if not b.retired]) < self.size:
+                self._browsers.append(await self._launch())
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            try:
+                await self.health_check()
+            except Exception as e:
+                logger.error(f"Fehler beim Health-Check des Browser-Pools: {e}")
+
+    async def close(self):
+        """Schließt alle Browser und stoppt Playwright."""
+        if self._health_task:
+            self._health_task.cancel()
+            self._health_task = None
+        for pooled in self._browsers:
+            try:
+                await pooled.browser.close()
+            except Exception as e:
+                logger.debug(f"Fehler beim Schließen von Browser #{pooled.browser_id}: {e}")
+        self._browsers = []
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+        self._started = False
+        logger.info("Browser-Pool geschlossen.")
+
+    def get_stats(self) -> Dict:
+        """Momentaufnahme des Pools für Monitoring-Endpunkte."""
+        context_uses = self.stats['contexts_created'] + self.stats['contexts_reused']
+        return {
+            **self.stats,
+            'avg_context_setup_ms': round(
+                self.stats['context_setup_seconds_total'] * 1000 / context_uses, 2) if context_uses else 0.0,
+            'avg_context_teardown_ms': round(
+                self.stats['context_teardown_seconds_total'] * 1000 / context_uses, 2) if context_uses else 0.0,
+            'size': self.size,
+            'browsers': [
+                {
+                    'id': b.browser_id,
+                    'pages_rendered': b.pages_rendered,
+                    'active_leases': b.active_leases,
+                    'idle_contexts': b.contexts.idle_count,
+                    'memory_mb': round(b.memory_mb(), 1),
+                    'uptime_seconds': round(time.monotonic() - b.created_at, 1),
+                    'retired': b.retired,
+                }
+                for b in list(self._browsers)
+            ],
+        }
+
+
+# ======================= Prozessweiter Pool =======================
+
+_browser_pool: Optional[BrowserPool] = None
+_warmup_started = False
+
+
+def get_browser_pool() -> BrowserPool:
+    """Gibt den prozessweiten Browser-Pool zurück (wird beim ersten Zugriff angelegt)."""
+    global _browser_pool
+    if _browser_pool is None:
+        _browser_pool = BrowserPool()
+    return _browser_pool
+
+
+def warm_up_browser_pool():
+    """Startet den Pool im Hintergrund auf dem Render-Loop, ohne zu blockieren."""
+    global _warmup_started
+    if _warmup_started:
+        return
+    _warmup_started = True
+
+    def _log_result(future):
+        if future.exception():
+            logger.error(f"Browser-Pool konnte nicht vorgewärmt werden: {future.exception()}")
+
+    render_loop.submit(get_browser_pool().start()).add_done_callback(_log_result)
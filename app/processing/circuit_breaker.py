@@ -0,0 +1,137 @@
+# app/processing/circuit_breaker.py
+
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from config import logger, CIRCUIT_BREAKER_THRESHOLD, CIRCUIT_BREAKER_COOLDOWN_SECONDS
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class _HostState:
+    def __init__(self):
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.rejected = 0
+
+
+class HostCircuitBreaker:
+    """
+    Circuit-Breaker pro Host für das Rendern.
+
+    Nach threshold aufeinanderfolgenden Timeouts/Netzwerkfehlern wird der Host für cooldown
+    Sekunden gesperrt (open): weitere URLs schlagen sofort fehl, statt Render-Slots bis zum
+    Timeout zu blockieren. Danach darf genau ein Versuch durch (half_open); gelingt er, ist
+    der Host wieder frei, sonst bleibt er für einen weiteren Cooldown gesperrt.
+    """
+
+    def __init__(self, threshold: int = CIRCUIT_BREAKER_THRESHOLD,
+                 cooldown_seconds: float = CIRCUIT_BREAKER_COOLDOWN_SECONDS):
+        self.threshold = max(1, threshold)
+        self.cooldown_seconds = cooldown_seconds
+        self._hosts: Dict[str, _HostState] = {}
+        self._lock = threading.Lock()
+        self.stats = {'opened': 0, 'rejected': 0}
+
+    @staticmethod
+    def host_of(url: str) -> str:
+        return (urlparse(url).hostname or '').lower()
+
+    def allow(self, url: str) -> bool:
+        """Prüft, ob für den Host der URL gerendert werden darf."""
+        return self.acquire(url)[0]
+
+    def acquire(self, url: str) -> Tuple[bool, bool]:
+        """
+        Wie allow(), gibt aber zusätzlich zurück, ob der Versuch der Probe-Versuch eines halb
+        offenen Hosts ist: (erlaubt, probe). Ein Probe-Versuch muss mit record_success(),
+        record_failure() oder – ohne Ergebnis, z.B. bei Abbruch – mit release_probe() enden.
+        """
+        host = self.host_of(url)
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or state.state == CLOSED:
+                return True, False
+            if state.state == OPEN and time.monotonic() - state.opened_at >= self.cooldown_seconds:
+                state.state = HALF_OPEN
+                state.probe_in_flight = False
+            if state.state == HALF_OPEN and not state.probe_in_flight:
+                state.probe_in_flight = True
+                return True, True
+            state.rejected += 1
+            self.stats['rejected'] += 1
+            return False, False
+
+    def release_probe(self, url: str):
+        """Gibt den Probe-Versuch ohne Ergebnis frei; der nächste Versuch darf wieder proben."""
+        with self._lock:
+            state = self._hosts.get(self.host_of(url))
+            if state is not None and state.state == HALF_OPEN:
+                state.probe_in_flight = False
+
+    def retry_after(self, url: str) -> float:
+        """Sekunden, bis für den Host der URL wieder ein (Probe-)Versuch durchgelassen wird; 0 = sofort."""
+        host = self.host_of(url)
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or state.state == CLOSED:
+                return 0.0
+            if state.state == OPEN:
+                return max(0.0, self.cooldown_seconds - (time.monotonic() - state.opened_at))
+            # half_open: frei, sobald kein Probe-Versuch mehr läuft
+            return self.cooldown_seconds if state.probe_in_flight else 0.0
+
+    def record_success(self, url: str):
+        host = self.host_of(url)
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                return
+            if state.state != CLOSED:
+                logger.info(f"Circuit-Breaker für {host} wieder geschlossen.")
+            self._hosts.pop(host, None)
+
+    def record_failure(self, url: str):
+        """Zählt einen Timeout oder Netzwerkfehler des Hosts."""
+        host = self.host_of(url)
+        with self._lock:
+            state = self._hosts.setdefault(host, _HostState())
+            state.consecutive_failures += 1
+            if state.state == HALF_OPEN or state.consecutive_failures >= self.threshold:
+                if state.state != OPEN:
+                    self.stats['opened'] += 1
+                    logger.warning(
+                        f"Circuit-Breaker für {host} geöffnet nach {state.consecutive_failures} Fehlern, "
+                        f"Sperre für {self.cooldown_seconds:.0f} s."
+                    )
+                state.state = OPEN
+                state.opened_at = time.monotonic()
+                state.probe_in_flight = False
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self.stats,
+                'hosts': {
+                    host: {'state': state.state, 'consecutive_failures': state.consecutive_failures,
+                           'rejected': state.rejected}
+                    for host, state in self._hosts.items()
+                },
+            }
+
+
+# ======================= Prozessweiter Circuit-Breaker =======================
+
+_circuit_breaker: Optional[HostCircuitBreaker] = None
+
+
+def get_circuit_breaker() -> HostCircuitBreaker:
+    """Gibt den prozessweiten Circuit-Breaker zurück (gilt für alle Jobs)."""
+    global _circuit_breaker
+    if _circuit_breaker is None:
+        _circuit_breaker = HostCircuitBreaker()
+    return _circuit_breaker
@@ -0,0 +1,58 @@
+# app/processing/cleanup_script.py
+
+import json
+from typing import Dict
+
+from app.processing.website_cleaner import HIDE_NAVIGATION_JS, REMOVE_SELECTORS_JS, get_unwanted_selectors
+from app.processing.website_handler import EXPAND_HIDDEN_ELEMENTS_JS, PAGE_READINESS_JS
+from app.processing.website_utils import COLLAPSED_CSS
+
+
+def compile_cleanup_script(expanded: bool, elements_config: Dict, remove_elements_js: str) -> str:
+    """
+    Baut die komplette Bereinigung eines Modus (Aufklappen, Entfernen, Verstecken, CSS,
+    removeElements aus der JSON-Konfiguration) zu einer einzigen JS-Funktion zusammen.
+    Sie wird einmal pro Job erzeugt und pro Seite mit genau einem page.evaluate ausgeführt.
+    Als Argument erwartet sie die Optionen des Bereitschafts-Detektors; zurückgegeben
+    werden die Laufzeiten der einzelnen Schritte in Millisekunden.
+    """
+    steps = []
+    if expanded:
+        steps.append(('expand_hidden_elements', f"({EXPAND_HIDDEN_ELEMENTS_JS})()"))
+        # Auf die durch die Klicks ausgelösten DOM-Änderungen warten, ohne Round-Trip nach Python
+        steps.append(('wait_for_expansion', "waitForPageReady(readinessOptions)"))
+        steps.append((
+            'remove_unwanted_elements',
+            f"({REMOVE_SELECTORS_JS})({json.dumps(get_unwanted_selectors(expanded=True))})"
+        ))
+    else:
+        steps.append(('remove_navigation_and_sidebars', f"({HIDE_NAVIGATION_JS})()"))
+        steps.append((
+            'inject_custom_css',
+            "(() => { const style = document.createElement('style'); "
+            f"style.textContent = {json.dumps(COLLAPSED_CSS)}; "
+            "(document.head || document.documentElement).appendChild(style); })()"
+        ))
+
+    if remove_elements_js and elements_config:
+        steps.append(('remove_elements', f"removeElements({json.dumps(elements_config)})"))
+
+    step_calls = '\n'.join(
+        f"    await step({json.dumps(name)}, async () => {{ await {call}; }});" for name, call in steps
+    )
+    return f"""async (readinessOptions) => {{
+    {remove_elements_js if remove_elements_js else ''}
+    {PAGE_READINESS_JS}
+    const timings = {{}};
+    const step = async (name, fn) => {{
+        const t0 = performance.now();
+        try {{
+            await fn();
+        }} catch (e) {{
+            timings[name + '_error'] = String(e);
+        }}
+        timings[name] = Math.round(performance.now() - t0);
+    }};
+{step_calls}
+    return timings;
+}}"""
@@ -0,0 +1,151 @@
+# app/processing/context_pool.py
+
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from playwright.async_api import Browser, BrowserContext, Page
+
+from config import logger, CONTEXT_POOL_MAX_IDLE, CONTEXT_MAX_USES, CONTEXT_REUSE_PAGES
+
+# Einheitliche Kontext-Einstellungen für alle Render-Vorgänge
+CONTEXT_OPTIONS = {
+    'viewport': {"width": 2560, "height": 1440},
+    'device_scale_factor': 2,
+    'locale': 'de-DE',
+    'user_agent': (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/94.0.4606.81 Safari/537.36"
+    ),
+}
+
+
+def _origin(url: str) -> Optional[str]:
+    parsed = urlparse(url)
+    if parsed.scheme in ('http', 'https') and parsed.netloc:
+        return f"{parsed.scheme}://{parsed.netloc}"
+    return None
+
+
+class PooledContext:
+    """Ein wiederverwendbarer BrowserContext mit (optional) einer offenen Seite."""
+
+    def __init__(self, context: BrowserContext):
+        self.context = context
+        self.page: Optional[Page] = None
+        self.uses = 0
+        self.origins = set()  # Besuchte Origins, deren Storage beim Zurücksetzen gelöscht wird
+        self.setup_ms = 0.0
+        self.discard = False  # Vom Aufrufer gesetzt, wenn der Zustand nicht mehr vertrauenswürdig ist
+
+    async def ensure_page(self) -> Page:
+        if self.page is None or self.page.is_closed():
+            self.page = await self.context.new_page()
+            self.page.on('framenavigated', self._track_origin)
+        return self.page
+
+    def _track_origin(self, frame):
+        origin = _origin(frame.url)
+        if origin:
+            self.origins.add(origin)
+
+
+class ContextPool:
+    """
+    Pool von BrowserContexts für einen einzelnen Browser.
+
+    Beim Zurückgeben werden Cookies, Berechtigungen, Routen und der Storage aller besuchten
+    Origins gelöscht. Ist CONTEXT_REUSE_PAGES aktiv, bleibt auch die Seite offen und wird
+    nur auf about:blank zurückgesetzt. Schlägt das Zurücksetzen fehl, wird der Kontext verworfen.
+    """
+
+    def __init__(
+        self,
+        browser: Browser,
+        stats: Dict,
+        max_idle: int = CONTEXT_POOL_MAX_IDLE,
+        max_uses: int = CONTEXT_MAX_USES,
+        reuse_pages: bool = CONTEXT_REUSE_PAGES,
+    ):
+        self.browser = browser
+        self.stats = stats
+        self.max_idle = max_idle
+        self.max_uses = max_uses
+        self.reuse_pages = reuse_pages
+        self._idle: List[PooledContext] = []
+
+    async def acquire(self) -> PooledContext:
+        started = time.monotonic()
+        if self._idle:
+            pooled = self._idle.pop()
+            self.stats['contexts_reused'] += 1
+        else:
+            pooled = PooledContext(await self.browser.new_context(**CONTEXT_OPTIONS))
+            self.stats['contexts_created'] += 1
+        await pooled.ensure_page()
+        pooled.uses += 1
+        pooled.discard = False
+        pooled.setup_ms = (time.monotonic() - started) * 1000
+        self.stats['context_setup_seconds_total'] += pooled.setup_ms / 1000
+        return pooled
+
+    async def release(self, pooled: PooledContext):
+        started = time.monotonic()
+        keep = (
+            not pooled.discard
+            and pooled.uses < self.max_uses
+            and len(self._idle) < self.max_idle
+            and self.browser.is_connected()
+        )
+        if keep:
+            try:
+                await self._reset(pooled)
+                self._idle.append(pooled)
+            except Exception as e:
+                logger.debug(f"Kontext konnte nicht zurückgesetzt werden, wird verworfen: {e}")
+                self.stats['context_reset_failures'] += 1
+                keep = False
+        if not keep:
+            await self._close(pooled)
+        self.stats['context_teardown_seconds_total'] += time.monotonic() - started
+
+    async def _reset(self, pooled: PooledContext):
+        """Setzt den Zustand des Kontexts zurück, damit die nächste URL isoliert gerendert wird."""
+        context = pooled.context
+        page = pooled.page
+        if page is not None and not page.is_closed():
+            await page.unroute_all(behavior='ignoreErrors')
+            if pooled.origins:
+                cdp = await context.new_cdp_session(page)
+                try:
+                    for origin in pooled.origins:
+                        await cdp.send('Storage.clearDataForOrigin', {'origin': origin, 'storageTypes': 'all'})
+                finally:
+                    await cdp.detach()
+            if self.reuse_pages:
+                await page.goto('about:blank')
+            else:
+                await page.close()
+                pooled.page = None
+        pooled.origins.clear()
+        await context.unroute_all(behavior='ignoreErrors')
+        await context.clear_cookies()
+        await context.clear_permissions()
+
+    async def _close(self, pooled: PooledContext):
+        try:
+            await pooled.context.close()
+        except Exception as e:
+            logger.debug(f"Fehler beim Schließen eines Kontexts: {e}")
+        self.stats['contexts_closed'] += 1
+
+    async def close(self):
+        """Schließt alle unbenutzten Kontexte."""
+        idle, self._idle = self._idle, []
+        for pooled in idle:
+            await self._close(pooled)
+
+    @property
+    def idle_count(self) -> int:
+        return len(self._idle)
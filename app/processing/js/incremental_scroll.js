@@ -0,0 +1,123 @@
+// app/processing/js/incremental_scroll.js
+
+async function scrollIncrementally(options) {
+    const opts = Object.assign({
+        stepRatio: 0.9,        // Schrittweite relativ zur Viewport-Höhe
+        quietMs: 150,          // So lange darf nach einem Schritt nichts mehr nachladen
+        stepCapMs: 1500,       // Obergrenze pro Schritt
+        totalCapMs: 15000,     // Harte Obergrenze für den gesamten Scrollvorgang
+        maxSteps: 150          // Schutz gegen Endlos-Scrolling
+    }, options || {});
+    const started = performance.now();
+    const scroller = document.scrollingElement || document.documentElement;
+    const viewportHeight = window.innerHeight || 800;
+    const step = Math.max(100, Math.floor(viewportHeight * opts.stepRatio));
+    const report = {
+        steps: 0, lazyElementsTriggered: 0, lazyResources: 0,
+        startHeight: scroller.scrollHeight, finalHeight: 0,
+        pendingImages: 0, timedOut: false, stepLimitReached: false
+    };
+
+    // Letzte Aktivität (abgeschlossene Ressource, DOM-Änderung, Lazy-Element im Viewport)
+    let lastActivity = performance.now();
+    const touch = () => { lastActivity = performance.now(); };
+
+    // Während des Scrollens geladene Ressourcen zählen
+    let resourceObserver = null;
+    if (window.PerformanceObserver) {
+        try {
+            resourceObserver = new PerformanceObserver(list => {
+                report.lazyResources += list.getEntries().length;
+                touch();
+            });
+            resourceObserver.observe({ type: 'resource', buffered: false });
+        } catch (e) {
+            resourceObserver = null;
+        }
+    }
+
+    const mutationObserver = new MutationObserver(touch);
+    mutationObserver.observe(document.documentElement, { childList: true, subtree: true, attributes: true });
+
+    // Lazy-Kandidaten: native Lazy-Bilder/-Iframes und typische data-src-Muster
+    const seen = new WeakSet();
+    const intersectionObserver = window.IntersectionObserver ? new IntersectionObserver(entries => {
+        entries.forEach(entry => {
+            if (entry.isIntersecting) {
+                report.lazyElementsTriggered += 1;
+                intersectionObserver.unobserve(entry.target);
+                touch();
+            }
+        });
+    }) : null;
+    const observeCandidates = () => {
+        if (!intersectionObserver) return;
+        document.querySelectorAll(
+            'img[loading="lazy"], iframe[loading="lazy"], img[data-src], img[data-srcset], [data-bg], [data-background]'
+        ).forEach(el => {
+            if (!seen.has(el)) {
+                seen.add(el);
+                intersectionObserver.observe(el);
+            }
+        });
+    };
+
+    // Unvollständige Bilder im (erweiterten) Viewport
+    const pendingVisibleImages = () => {
+        let pending = 0;
+        for (const img of document.images) {
+            if (img.complete) continue;
+            const rect = img.getBoundingClientRect();
+            if (rect.bottom >= -viewportHeight && rect.top <= 2 * viewportHeight) pending += 1;
+        }
+        return pending;
+    };
+
+    // Nach einem Schritt warten, bis ausgelöste Ladevorgänge abgeschlossen sind
+    const settle = () => new Promise(resolve => {
+        const t0 = performance.now();
+        const check = () => {
+            const now = performance.now();
+            const quiet = now - lastActivity >= opts.quietMs;
+            if ((quiet && pendingVisibleImages() === 0) || now - t0 >= opts.stepCapMs
+                    || now - started >= opts.totalCapMs) {
+                resolve();
+            } else {
+                setTimeout(check, 50);
+            }
+        };
+        setTimeout(check, Math.min(50, opts.quietMs));
+    });
+
+    try {
+        let y = 0;
+        while (true) {
+            observeCandidates();
+            window.scrollTo(0, y);
+            report.steps += 1;
+            await settle();
+
+            if (performance.now() - started >= opts.totalCapMs) {
+                report.timedOut = true;
+                break;
+            }
+            if (report.steps >= opts.maxSteps) {
+                report.stepLimitReached = true;
+                break;
+            }
+            // Ende erreicht und die Seite ist nicht weiter gewachsen
+            if (y + viewportHeight >= scroller.scrollHeight) break;
+            y = Math.min(y + step, scroller.scrollHeight - viewportHeight);
+        }
+    } finally {
+        resourceObserver && resourceObserver.disconnect();
+        mutationObserver.disconnect();
+        intersectionObserver && intersectionObserver.disconnect();
+        window.scrollTo(0, 0);
+    }
+
+    report.finalHeight = scroller.scrollHeight;
+    report.pendingImages = Array.from(document.images).filter(img => !img.complete).length;
+    report.totalMs = Math.round(performance.now() - started);
+    return report;
+}
@@ -0,0 +1,85 @@
+// app/processing/js/page_readiness.js
+
+async function waitForPageReady(options) {
+    const opts = Object.assign({
+        quietMs: 150,          // So lange darf keine DOM-Mutation auftreten
+        mutationCapMs: 2000,
+        imageCapMs: 3000,
+        fontCapMs: 2000,
+        layoutCapMs: 1000,
+        layoutFrames: 3        // Anzahl Frames ohne Höhenänderung
+    }, options || {});
+    const report = {};
+    const started = performance.now();
+
+    // Führt eine Wartebedingung mit Obergrenze aus und protokolliert Dauer und Timeout
+    function capped(name, capMs, start) {
+        return new Promise(resolve => {
+            const t0 = performance.now();
+            let done = false;
+            let cleanup = () => {};
+            const finish = (timedOut) => {
+                if (done) return;
+                done = true;
+                clearTimeout(timer);
+                cleanup();
+                report[name] = { ms: Math.round(performance.now() - t0), timedOut: timedOut };
+                resolve();
+            };
+            const timer = setTimeout(() => finish(true), capMs);
+            cleanup = start(() => finish(false)) || cleanup;
+        });
+    }
+
+    // 1. DOM-Mutationen: warten, bis quietMs lang nichts mehr passiert
+    const mutations = capped('mutations', opts.mutationCapMs, (done) => {
+        let quietTimer = setTimeout(done, opts.quietMs);
+        const observer = new MutationObserver(() => {
+            clearTimeout(quietTimer);
+            quietTimer = setTimeout(done, opts.quietMs);
+        });
+        observer.observe(document.documentElement || document, {
+            childList: true, subtree: true, attributes: true, characterData: true
+        });
+        return () => { observer.disconnect(); clearTimeout(quietTimer); };
+    });
+
+    // 2. Bilder, die bereits laden (Lazy-Bilder außerhalb des Viewports werden beim Scrollen behandelt)
+    const pendingImages = Array.from(document.images).filter(img => !img.complete && img.loading !== 'lazy');
+    report.pendingImages = pendingImages.length;
+    const images = capped('images', opts.imageCapMs, (done) => {
+        Promise.all(pendingImages.map(img => new Promise(r => {
+            img.addEventListener('load', r, { once: true });
+            img.addEventListener('error', r, { once: true });
+        }))).then(done);
+    });
+
+    // 3. Webfonts
+    const fonts = capped('fonts', opts.fontCapMs, (done) => {
+        (document.fonts ? document.fonts.ready : Promise.resolve()).then(done, done);
+    });
+
+    await Promise.all([mutations, images, fonts]);
+
+    // 4. Layout-Stabilität: Dokumenthöhe über mehrere Frames unverändert
+    await capped('layout', opts.layoutCapMs, (done) => {
+        let stableFrames = 0;
+        let lastHeight = -1;
+        let frame = 0;
+        const check = () => {
+            const height = document.documentElement.scrollHeight;
+            stableFrames = height === lastHeight ? stableFrames + 1 : 0;
+            lastHeight = height;
+            if (stableFrames >= opts.layoutFrames) {
+                done();
+            } else {
+                frame = requestAnimationFrame(check);
+            }
+        };
+        frame = requestAnimationFrame(check);
+        return () => cancelAnimationFrame(frame);
+    });
+
+    report.totalMs = Math.round(performance.now() - started);
+    return report;
+}
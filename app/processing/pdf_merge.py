@@ -0,0 +1,658 @@
+# app/processing/pdf_merge.py
+
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from decimal import Decimal
+from io import BytesIO
+from typing import BinaryIO, Callable, Dict, List, Optional, Tuple
+
+import pikepdf
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+from config import logger, PDF_MERGE_DEDUPLICATE, PDF_MERGE_WORKERS, PDF_FAST_WEB_VIEW_DEFAULT
+
+TOC_FONT = "Helvetica"
+TOC_FONT_SIZE = 12
+TOC_LINE_HEIGHT = 20
+TOC_LEFT = 100
+TOC_RIGHT_MARGIN = 60
+
+# Seitenattribute, die eine Seite von ihren Pages-Knoten erben kann
+_INHERITABLE_PAGE_KEYS = ('/Resources', '/MediaBox', '/CropBox', '/Rotate')
+# Ab dieser Verschachtelungstiefe werden Objekte zurückgestellt statt rekursiv geschrieben
+_MAX_COPY_DEPTH = 200
+# Unkomprimierte Streams ab dieser Größe werden beim Kopieren mit Flate komprimiert
+_COMPRESS_MIN_BYTES = 512
+# Objekte dieser Typen sind an ihre Seite gebunden und werden nie zusammengelegt
+_UNSHARED_TYPES = {'/Annot', '/Page', '/Pages', '/Catalog', '/Outlines'}
+
+
+def _fit_title(title: str, max_width: float) -> str:
+    """Kürzt einen Titel, damit er mit Seitenzahl in eine Zeile des Inhaltsverzeichnisses passt."""
+    if stringWidth(title, TOC_FONT, TOC_FONT_SIZE) <= max_width:
+        return title
+    while title and stringWidth(title + "...", TOC_FONT, TOC_FONT_SIZE) > max_width:
+        title = title[:-1]
+    return title + "..."
+
+
+def create_table_of_contents(toc_entries: List[Dict], page_offset: int = 0) -> BytesIO:
+    """
+    Erstellt das Inhaltsverzeichnis (beliebig viele Seiten) und gibt es als BytesIO-Objekt zurück.
+    page_offset wird zu jeder Seitenzahl addiert, typischerweise die Länge des Verzeichnisses selbst.
+    """
+    packet = BytesIO()
+    can = canvas.Canvas(packet, pagesize=A4)
+    width, height = A4
+    can.setFont("Helvetica-Bold", 16)
+    can.drawString(TOC_LEFT, height - 50, "Inhaltsverzeichnis")
+    can.setFont(TOC_FONT, TOC_FONT_SIZE)
+    y_position = height - 80
+    for entry in toc_entries:
+        page_number = str(entry['page_number'] + page_offset + 1)  # 1-basierte Seitennummerierung
+        number_x = width - TOC_RIGHT_MARGIN
+        max_title_width = number_x - TOC_LEFT - stringWidth(" ...... " + page_number, TOC_FONT, TOC_FONT_SIZE)
+        can.drawString(TOC_LEFT, y_position, _fit_title(entry['title'], max_title_width) + " ......")
+        can.drawRightString(number_x, y_position, page_number)
+        y_position -= TOC_LINE_HEIGHT
+        if y_position < 50:
+            can.showPage()
+            can.setFont(TOC_FONT, TOC_FONT_SIZE)
+            y_position = height - 50
+    can.save()
+    packet.seek(0)
+    return packet
+
+
+def _toc_pdf(toc_entries: List[Dict]) -> BytesIO:
+    """Rendert das Inhaltsverzeichnis mit Seitenzahlen, die seine eigene Länge berücksichtigen."""
+    toc = create_table_of_contents(toc_entries, page_offset=1)
+    with pikepdf.open(toc) as pdf:
+        toc_pages = len(pdf.pages)
+    if toc_pages == 1:
+        toc.seek(0)
+        return toc
+    # Jede Zeile ist gleich hoch, die Seitenzahl des Verzeichnisses ändert sich beim zweiten Lauf nicht
+    return create_table_of_contents(toc_entries, page_offset=toc_pages)
+
+
+def _name(key: str) -> bytes:
+    return pikepdf.Name(key).unparse()
+
+
+def _scalar(value) -> bytes:
+    """Serialisiert Werte, die pikepdf als Python-Typen liefert (Zahlen, Wahrheitswerte, null)."""
+    if value is None:
+        return b'null'
+    if isinstance(value, bool):
+        return b'true' if value else b'false'
+    if isinstance(value, int):
+        return b'%d' % value
+    if isinstance(value, (Decimal, float)):
+        text = format(Decimal(value).normalize(), 'f')
+        return text.encode('ascii')
+    return value.unparse()
+
+
+class _StreamingPdfWriter:
+    """
+    Schreibt ein PDF Objekt für Objekt direkt in eine Datei. Im Speicher bleibt nur die
+    Offset-Tabelle für die Querverweise, nie der Inhalt bereits geschriebener Objekte.
+    Beim Pickeln (Übergabe an den Merge-Pool) wird nur der Zustand übertragen; der Empfänger
+    öffnet die Datei erneut und schreibt ab der übergebenen Position weiter.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file: BinaryIO = open(path, 'wb')
+        self._file.write(b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n')
+        self._offsets: List[Optional[int]] = [None]  # Objekt 0 ist immer frei
+
+    def __getstate__(self) -> Dict:
+        self._file.flush()
+        return {'path': self.path, 'offsets': list(self._offsets), 'position': self._file.tell()}
+
+    def __setstate__(self, state: Dict):
+        self.path = state['path']
+        self._offsets = state['offsets']
+        self._file = open(self.path, 'r+b')
+        self._file.seek(state['position'])
+        self._file.truncate()
+
+    def checkpoint(self) -> Tuple[int, int]:
+        return self._file.tell(), len(self._offsets)
+
+    def rollback(self, checkpoint: Tuple[int, int]):
+        """Verwirft alles, was nach checkpoint geschrieben oder reserviert wurde."""
+        position, count = checkpoint
+        self._file.seek(position)
+        self._file.truncate()
+        del self._offsets[count:]
+
+    def truncate(self):
+        """Schneidet Reste eines abgebrochenen Abschlussversuchs (z.B. im Worker) hinter der Position ab."""
+        self._file.flush()
+        self._file.truncate()
+
+    def reserve(self) -> int:
+        self._offsets.append(None)
+        return len(self._offsets) - 1
+
+    def write_object(self, num: int, body: bytes, stream: Optional[bytes] = None):
+        self._offsets[num] = self._file.tell()
+        self._file.write(b'%d 0 obj\n' % num)
+        self._file.write(body)
+        if stream is not None:
+            self._file.write(b'\nstream\n')
+            self._file.write(stream)
+            self._file.write(b'\nendstream')
+        self._file.write(b'\nendobj\n')
+
+    def close(self, root_num: int):
+        xref_offset = self._file.tell()
+        self._file.write(b'xref\n0 %d\n' % len(self._offsets))
+        self._file.write(b'0000000000 65535 f \n')
+        for offset in self._offsets[1:]:
+            if offset is None:
+                self._file.write(b'0000000000 00000 f \n')
+            else:
+                self._file.write(b'%010d 00000 n \n' % offset)
+        self._file.write(b'trailer\n<< /Size %d /Root %d 0 R >>\n' % (len(self._offsets), root_num))
+        self._file.write(b'startxref\n%d\n%%%%EOF\n' % xref_offset)
+        self._file.close()
+
+    def abort(self):
+        self._file.close()
+
+
+class _DedupIndex:
+    """
+    Erkennt byte-identische Objekte über alle Quellen eines Merges (Schriften, Bilder,
+    ICC-Profile, ...) und liefert die Nummer des bereits geschriebenen Exemplars.
+    Gespeichert werden nur SHA-256-Werte, nicht die Objekte selbst.
+    """
+
+    def __init__(self):
+        self._objects: Dict[bytes, int] = {}
+        self.stats = {'deduplicated_objects': 0, 'deduplicated_bytes': 0}
+
+    @staticmethod
+    def digest(body: bytes, stream: Optional[bytes]) -> bytes:
+        digest = hashlib.sha256(body)
+        if stream is not None:
+            digest.update(b'\0stream\0')
+            digest.update(stream)
+        return digest.digest()
+
+    def lookup(self, digest: bytes, size: int) -> Optional[int]:
+        num = self._objects.get(digest)
+        if num is not None:
+            self.stats['deduplicated_objects'] += 1
+            self.stats['deduplicated_bytes'] += size
+        return num
+
+    def add(self, digest: bytes, num: int):
+        self._objects.setdefault(digest, num)
+
+    def rollback(self, first_num: int):
+        """Vergisst Objekte ab first_num (nach einem verworfenen Dokument)."""
+        self._objects = {digest: num for digest, num in self._objects.items() if num < first_num}
+
+
+class _SourceCopier:
+    """
+    Überträgt die Seiten eines Quell-PDFs mit allen erreichbaren Objekten in den Writer.
+    Objektnummern werden neu vergeben, Streams roh (mit ihren Filtern) kopiert; es wird
+    immer nur ein Stream gleichzeitig gelesen. Objekte werden erst nach allen Objekten
+    geschrieben, auf die sie verweisen; mit dedup werden so nicht nur identische Streams,
+    sondern auch die darauf verweisenden Schrift- und Ressourcen-Dictionaries zusammengelegt.
+    """
+
+    def __init__(self, writer: _StreamingPdfWriter, pdf: pikepdf.Pdf, pages_root: int,
+                 dedup: Optional[_DedupIndex] = None):
+        self.writer = writer
+        self.pdf = pdf
+        self.pages_root = pages_root
+        self.dedup = dedup
+        self._numbers: Dict[Tuple[int, int], int] = {}
+        self._in_progress = set()
+        self._deferred: List[pikepdf.Object] = []
+        self._written = set()
+
+    def copy_pages(self) -> List[int]:
+        """Schreibt alle Seiten und gibt ihre neuen Objektnummern in Seitenreihenfolge zurück."""
+        pages = [page.obj for page in self.pdf.pages]
+        # Seiten vorab nummerieren: Verweise zwischen Seiten (Links, /P in Annotationen) werden so aufgelöst,
+        # ohne von Seite zu Seite weiter zu rekursieren
+        page_numbers = []
+        for page in pages:
+            num = self.writer.reserve()
+            self._numbers[page.objgen] = num
+            page_numbers.append(num)
+        for page, num in zip(pages, page_numbers):
+            entries = [(key, value) for key, value in page.items() if key != '/Parent']
+            for key in _INHERITABLE_PAGE_KEYS:
+                if key not in page:
+                    inherited = self._inherited(page, key)
+                    if inherited is not None:
+                        entries.append((key, inherited))
+            body = b'<<' + b''.join(_name(key) + b' ' + self._encode(value, 0) for key, value in entries)
+            body += b' /Parent %d 0 R>>' % self.pages_root
+            self.writer.write_object(num, body)
+            self._written.add(num)
+        self._write_deferred()
+        return page_numbers
+
+    @staticmethod
+    def _inherited(page: pikepdf.Object, key: str):
+        node = page.get('/Parent')
+        for _ in range(64):
+            if node is None:
+                return None
+            if key in node:
+                return node[key]
+            node = node.get('/Parent')
+        return None
+
+    def _encode(self, obj: pikepdf.Object, depth: int) -> bytes:
+        """Serialisiert einen direkten Wert; indirekte Objekte werden als Verweis geschrieben."""
+        if not isinstance(obj, pikepdf.Object):
+            return _scalar(obj)
+        if obj.is_indirect:
+            return b'%d 0 R' % self._ref(obj, depth)
+        if isinstance(obj, pikepdf.Dictionary):
+            return b'<<' + b''.join(
+                _name(key) + b' ' + self._encode(value, depth + 1) for key, value in obj.items()
+            ) + b'>>'
+        if isinstance(obj, pikepdf.Array):
+            return b'[' + b' '.join(self._encode(value, depth + 1) for value in obj) + b']'
+        return _scalar(obj)
+
+    def _ref(self, obj: pikepdf.Object, depth: int) -> int:
+        key = obj.objgen
+        num = self._numbers.get(key)
+        if num is not None:
+            return num
+        if key in self._in_progress or depth > _MAX_COPY_DEPTH:
+            # Zyklus oder sehr tiefe Kette: Nummer vergeben, Objekt später schreiben
+            num = self.writer.reserve()
+            self._numbers[key] = num
+            self._deferred.append(obj)
+            return num
+        self._in_progress.add(key)
+        try:
+            body, stream = self._encode_indirect(obj, depth)
+        finally:
+            self._in_progress.discard(key)
+        # Während des Kodierens kann das Objekt über einen Zyklus bereits eine Nummer erhalten haben
+        num = self._numbers.get(key)
+        if num is None and self.dedup is not None and self._shareable(obj):
+            digest = self.dedup.digest(body, stream)
+            num = self.dedup.lookup(digest, len(body) + len(stream or b''))
+            if num is None:
+                num = self.writer.reserve()
+                self.dedup.add(digest, num)
+                self._emit(num, body, stream)
+            self._numbers[key] = num
+            return num
+        num = num or self.writer.reserve()
+        self._numbers[key] = num
+        self._emit(num, body, stream)
+        return num
+
+    @staticmethod
+    def _shareable(obj: pikepdf.Object) -> bool:
+        if isinstance(obj, pikepdf.Stream):
+            return True
+        if isinstance(obj, pikepdf.Dictionary):
+            return str(obj.get('/Type', '')) not in _UNSHARED_TYPES
+        return isinstance(obj, pikepdf.Array)
+
+    def _encode_indirect(self, obj: pikepdf.Object, depth: int) -> Tuple[bytes, Optional[bytes]]:
+        if isinstance(obj, pikepdf.Stream):
+            raw = obj.read_raw_bytes()
+            entries = [(key, value) for key, value in obj.stream_dict.items() if key != '/Length']
+            body = b'<<' + b''.join(_name(key) + b' ' + self._encode(value, depth + 1) for key, value in entries)
+            if '/Filter' not in obj.stream_dict and len(raw) >= _COMPRESS_MIN_BYTES:
+                raw = zlib.compress(raw, 6)
+                body += b' /Filter /FlateDecode'
+            return body + b' /Length %d>>' % len(raw), raw
+        if isinstance(obj, pikepdf.Dictionary):
+            return b'<<' + b''.join(
+                _name(key) + b' ' + self._encode(value, depth + 1) for key, value in obj.items()
+            ) + b'>>', None
+        if isinstance(obj, pikepdf.Array):
+            return b'[' + b' '.join(self._encode(value, depth + 1) for value in obj) + b']', None
+        return _scalar(obj), None
+
+    def _emit(self, num: int, body: bytes, stream: Optional[bytes]):
+        if num in self._written:
+            return
+        self.writer.write_object(num, body, stream)
+        self._written.add(num)
+
+    def _write_deferred(self):
+        while self._deferred:
+            obj = self._deferred.pop()
+            num = self._numbers[obj.objgen]
+            if num in self._written:
+                continue
+            body, stream = self._encode_indirect(obj, 0)
+            self._emit(num, body, stream)
+
+
+class IncrementalPdfMerger:
+    """
+    Speicherbegrenztes Zusammenführen vieler PDFs mit pikepdf.
+
+    append() kopiert die Seiten eines PDFs sofort Objekt für Objekt in die (noch unfertige)
+    Ausgabedatei; die Quelldatei wird danach nicht mehr gebraucht und kann gelöscht werden.
+    Die Seitenreihenfolge steht erst im /Kids-Array des Seitenbaums, das finish() schreibt:
+    Nachträglich eingefügte Dokumente (order) und das Inhaltsverzeichnis, das als letztes
+    geschrieben wird, stehen dort trotzdem an der richtigen Stelle. Es ist immer nur eine Quelle
+    geöffnet und nur ein Stream im Speicher. Lesezeichen werden aus den bekannten Seitenbereichen
+    geschrieben, ohne Seiten erneut zu lesen. Mit deduplicate werden byte-identische Schriften,
+    Bilder und ICC-Profile aller Quellen nur einmal gespeichert.
+    Mit linearize wird das Ergebnis zum Schluss als "Fast Web View" (linearisiert, mit Objekt-Streams
+    und komprimierter Xref) neu geschrieben; dieser Schritt liest die ganze Datei mit qpdf ein.
+    """
+
+    def __init__(self, output_path: str, deduplicate: bool = PDF_MERGE_DEDUPLICATE,
+                 linearize: bool = PDF_FAST_WEB_VIEW_DEFAULT):
+        self.output_path = output_path
+        self.linearize = linearize
+        self.tmp_path = f"{output_path}.tmp"
+        self.toc_entries: List[Dict] = []
+        self.current_page = 0
+        self._writer: Optional[_StreamingPdfWriter] = None
+        self._pages_root: Optional[int] = None
+        self._dedup = _DedupIndex() if deduplicate else None
+        self.progress = {'phase': 'collecting', 'documents_written': 0, 'documents_total': 0,
+                         'pages_written': 0, 'pages_total': 0}
+
+    def _ensure_writer(self) -> _StreamingPdfWriter:
+        if self._writer is None:
+            self._writer = _StreamingPdfWriter(self.tmp_path)
+            self._pages_root = self._writer.reserve()
+        return self._writer
+
+    def append(self, entry: Dict, order: Optional[int] = None) -> bool:
+        """Hängt ein erfolgreiches Render-Ergebnis an. Gibt False zurück, wenn es übersprungen wurde."""
+        if entry.get('status') != 'success':
+            return False
+        if order is None:
+            order = self.toc_entries[-1]['order'] + 1 if self.toc_entries else 0
+        writer = self._ensure_writer()
+        checkpoint = writer.checkpoint()
+        decrypted_path = f"{self.tmp_path}.decrypted"
+        try:
+            with pikepdf.open(entry['path']) as pdf:
+                if pdf.is_encrypted:
+                    # Rohdaten verschlüsselter Streams lassen sich nicht übernehmen, entschlüsselt kopieren
+                    pdf.save(decrypted_path)
+            source = decrypted_path if os.path.exists(decrypted_path) else entry['path']
+            with pikepdf.open(source) as pdf:
+                page_objects = _SourceCopier(writer, pdf, self._pages_root, self._dedup).copy_pages()
+        except Exception as e:
+            # Halb kopierte Objekte verwerfen, damit kein Verweis auf unvollständige Objekte bleibt
+            writer.rollback(checkpoint)
+            if self._dedup:
+                self._dedup.rollback(checkpoint[1])
+            logger.error(f"Fehler beim Lesen der PDF {entry['path']}: {e}")
+            return False
+        finally:
+            if os.path.exists(decrypted_path):
+                os.remove(decrypted_path)
+        page_count = len(page_objects)
+
+        # Einfügeposition: hinter allen Dokumenten mit kleinerer Reihenfolge (auch nachträglich)
+        position = next((i for i, toc in enumerate(self.toc_entries) if toc['order'] > order),
+                        len(self.toc_entries))
+        start_page = self.toc_entries[position]['page_number'] if position < len(self.toc_entries) \
+            else self.current_page
+        for toc in self.toc_entries[position:]:
+            toc['page_number'] += page_count
+        self.toc_entries.insert(position, {
+            'title': entry['title'],
+            'page_number': start_page,
+            'order': order,
+            'page_objects': page_objects,
+            'page_count': page_count,
+        })
+        self.current_page += page_count
+        self.progress['documents_written'] += 1
+        self.progress['pages_written'] += page_count
+        return True
+
+    def _report(self, on_progress: Optional[Callable[[Dict], None]], **changes):
+        self.progress.update(changes)
+        if on_progress:
+            on_progress(dict(self.progress))
+
+    def finish(self, on_progress: Optional[Callable[[Dict], None]] = None) -> bool:
+        """
+        Schließt das zusammengeführte PDF ab: Inhaltsverzeichnis, Seitenbaum, Lesezeichen und
+        Querverweise (die Dokumente selbst hat append() bereits geschrieben). on_progress erhält
+        den Fortschritt (phase, documents_written/total, pages_written/total). Gibt False zurück,
+        wenn das Schreiben fehlschlägt.
+        """
+        writer = self._ensure_writer()
+        self._report(on_progress, phase='toc', documents_total=len(self.toc_entries),
+                     pages_total=self.current_page)
+        try:
+            writer.truncate()
+            kids: List[int] = []
+            if self.toc_entries:
+                # Erstelle das Inhaltsverzeichnis (mehrseitig, Seitenzahlen inklusive seiner eigenen Länge);
+                # es liegt hinten in der Datei, steht im Seitenbaum aber vorn
+                with pikepdf.open(_toc_pdf(self.toc_entries)) as toc:
+                    kids += _SourceCopier(writer, toc, self._pages_root, self._dedup).copy_pages()
+            for entry in self.toc_entries:
+                kids += entry['page_objects']
+            self._report(on_progress, phase='outline')
+
+            writer.write_object(self._pages_root, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+                b' '.join(b'%d 0 R' % kid for kid in kids), len(kids)))
+
+            # Füge Lesezeichen hinzu
+            first_pages = [entry['page_objects'][0] if entry['page_objects'] else None
+                           for entry in self.toc_entries]
+            outlines = self._write_outline(writer, first_pages)
+            catalog = writer.reserve()
+            catalog_body = b'<< /Type /Catalog /Pages %d 0 R' % self._pages_root
+            if outlines:
+                catalog_body += b' /Outlines %d 0 R /PageMode /UseOutlines' % outlines
+            writer.write_object(catalog, catalog_body + b' >>')
+            writer.close(catalog)
+            if self.linearize:
+                self._report(on_progress, phase='linearize')
+                self._linearize(self.tmp_path)
+
+            # Schreibe das zusammengeführte PDF
+            os.replace(self.tmp_path, self.output_path)
+            logger.info(f"Alle PDFs wurden zu einem zusammengeführt: {self.output_path}")
+            if self._dedup and self._dedup.stats['deduplicated_objects']:
+                logger.info(
+                    f"Gemeinsame Ressourcen zusammengelegt: {self._dedup.stats['deduplicated_objects']} Objekte, "
+                    f"{self._dedup.stats['deduplicated_bytes'] / (1024 ** 2):.1f} MB eingespart."
+                )
+            self._report(on_progress, phase='done')
+            return True
+        except Exception as e:
+            logger.error(f"Fehler beim Schreiben des zusammengeführten PDFs: {e}")
+            self._report(on_progress, phase='failed')
+            return False
+        finally:
+            self.close()
+
+    def can_retry_finish(self) -> bool:
+        """Ob finish() nach einem abgebrochenen Versuch (z.B. defekter Worker) erneut laufen kann."""
+        return os.path.exists(self.tmp_path)
+
+    def _linearize(self, path: str):
+        """Schreibt path linearisiert mit Objekt-Streams neu. Schlägt das fehl, bleibt die normale Fassung."""
+        linear_path = f"{path}.linear"
+        try:
+            with pikepdf.open(path) as pdf:
+                pdf.save(linear_path, linearize=True, compress_streams=True,
+                         object_stream_mode=pikepdf.ObjectStreamMode.generate)
+            before, after = os.path.getsize(path), os.path.getsize(linear_path)
+            os.replace(linear_path, path)
+            logger.info(f"Zusammengeführtes PDF linearisiert (Fast Web View): "
+                        f"{before / (1024 ** 2):.1f} MB -> {after / (1024 ** 2):.1f} MB.")
+        except Exception as e:
+            if os.path.exists(linear_path):
+                os.remove(linear_path)
+            logger.warning(f"PDF konnte nicht linearisiert werden, behalte die normale Fassung: {e}")
+
+    def _write_outline(self, writer: _StreamingPdfWriter, first_pages: List[Optional[int]]) -> Optional[int]:
+        items = [(entry['title'], page) for entry, page in zip(self.toc_entries, first_pages) if page]
+        if not items:
+            return None
+        outlines = writer.reserve()
+        numbers = [writer.reserve() for _ in items]
+        for i, ((title, page), num) in enumerate(zip(items, numbers)):
+            body = b'<< /Title %s /Parent %d 0 R /Dest [%d 0 R /Fit]' % (
+                pikepdf.String(title).unparse(), outlines, page)
+            if i > 0:
+                body += b' /Prev %d 0 R' % numbers[i - 1]
+            if i < len(numbers) - 1:
+                body += b' /Next %d 0 R' % numbers[i + 1]
+            writer.write_object(num, body + b' >>')
+        writer.write_object(outlines, b'<< /Type /Outlines /First %d 0 R /Last %d 0 R /Count %d >>' % (
+            numbers[0], numbers[-1], len(numbers)))
+        return outlines
+
+    def get_stats(self) -> Dict:
+        return dict(self._dedup.stats) if self._dedup else {'deduplicated_objects': 0, 'deduplicated_bytes': 0}
+
+    def close(self):
+        """Schließt die Ausgabedatei; eine unfertige Fassung wird entfernt."""
+        if self._writer is not None:
+            self._writer.abort()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def merge_pdfs_with_bookmarks(pdf_entries: List[Dict], output_path: str):
+    """
+    Fasst mehrere PDFs zu einem zusammen, fügt ein Inhaltsverzeichnis hinzu und setzt Lesezeichen.
+    """
+    merger = IncrementalPdfMerger(output_path)
+    for entry in pdf_entries:
+        merger.append(entry)
+    merger.finish()
+
+
+# ======================= Zusammenführen im Prozess-Pool =======================
+
+def _write_progress(progress_path: str, progress: Dict):
+    tmp_path = f"{progress_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(progress, f)
+    os.replace(tmp_path, progress_path)
+
+
+def read_merge_progress(progress_path: str) -> Optional[Dict]:
+    """Liest den zuletzt gemeldeten Fortschritt eines Merges im Pool (None, solange noch nichts gemeldet wurde)."""
+    try:
+        with open(progress_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _finish_in_worker(merger: IncrementalPdfMerger, progress_path: str) -> Dict:
+    """Läuft im Worker-Prozess: schreibt das PDF und meldet den Fortschritt über eine kleine JSON-Datei."""
+    def report(progress: Dict):
+        try:
+            _write_progress(progress_path, progress)
+        except OSError:
+            pass
+
+    ok = merger.finish(report)
+    return {'ok': ok, 'progress': dict(merger.progress), **merger.get_stats()}
+
+
+class PdfMergePool:
+    """
+    Führt IncrementalPdfMerger.finish() in einem Prozess-Pool aus, damit Inhaltsverzeichnis,
+    Abschluss und vor allem das Linearisieren großer PDFs weder den Render-Loop noch die
+    Status-Endpunkte blockieren. Der Merger wird mit seinem Zustand (Inhaltsverzeichnis,
+    Objekttabelle, Position in der unfertigen Ausgabedatei) an den Worker übergeben; mit
+    mehreren Workern laufen die Merges für collapsed und expanded gleichzeitig.
+    """
+
+    def __init__(self, workers: int = PDF_MERGE_WORKERS):
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.stats = {'merges': 0, 'failures': 0, 'fallbacks': 0, 'merge_seconds_total': 0.0}
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    async def finish(self, merger: IncrementalPdfMerger, progress_path: str) -> Dict:
+        """Schreibt das zusammengeführte PDF im Pool. Gibt {ok, progress, deduplicated_*} zurück."""
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        try:
+            result = await loop.run_in_executor(self.executor, _finish_in_worker, merger, progress_path)
+        except (BrokenProcessPool, pickle.PicklingError) as e:
+            with self._lock:
+                self._executor = None
+            # Im Thread nur wiederholen, solange die unfertige Ausgabe noch existiert; der Thread
+            # schneidet Reste des abgebrochenen Versuchs ab und schreibt ab dem Stand nach append() weiter
+            if not merger.can_retry_finish():
+                raise
+            logger.warning(f"Merge-Pool nicht verfügbar ({e}), führe {merger.output_path} im Thread zusammen.")
+            self.stats['fallbacks'] += 1
+            result = await asyncio.to_thread(_finish_in_worker, merger, progress_path)
+        finally:
+            if os.path.exists(progress_path):
+                os.remove(progress_path)
+        self.stats['merges'] += 1
+        self.stats['merge_seconds_total'] += time.monotonic() - started
+        if not result['ok']:
+            self.stats['failures'] += 1
+        return result
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, 'merge_seconds_total': round(self.stats['merge_seconds_total'], 2),
+                'workers': self.workers, 'running': self._executor is not None}
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+
+# ======================= Prozessweiter Merge-Pool =======================
+
+_merge_pool: Optional[PdfMergePool] = None
+
+
+def get_merge_pool() -> PdfMergePool:
+    """Gibt den prozessweiten Merge-Pool zurück (Worker starten erst beim ersten Merge)."""
+    global _merge_pool
+    if _merge_pool is None:
+        _merge_pool = PdfMergePool()
+    return _merge_pool
@@ -0,0 +1,227 @@
+# app/processing/pdf_optimizer.py
+
+import asyncio
+import math
+import multiprocessing
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Dict, Optional, Tuple
+
+import pikepdf
+from PIL import Image
+
+from config import (
+    logger,
+    PDF_OPTIMIZE_TARGET_DPI,
+    PDF_OPTIMIZE_JPEG_QUALITY,
+    PDF_OPTIMIZE_WORKERS,
+)
+
+# Bilder werden erst verkleinert, wenn sie das Ziel um mehr als diesen Faktor überschreiten
+DPI_TOLERANCE = 1.2
+# Farbräume, deren Pixeldaten sich ohne Umrechnung neu abtasten lassen
+_RESAMPLABLE_COLORSPACES = {'/DeviceRGB': 'RGB', '/DeviceGray': 'L'}
+
+Matrix = Tuple[float, float, float, float, float, float]
+_IDENTITY: Matrix = (1, 0, 0, 1, 0, 0)
+
+
+def _multiply(m: Matrix, n: Matrix) -> Matrix:
+    """Matrixprodukt m x n im PDF-Sinne (m wird zuerst angewendet)."""
+    a, b, c, d, e, f = m
+    A, B, C, D, E, F = n
+    return (a * A + b * C, a * B + b * D, c * A + d * C, c * B + d * D, e * A + f * C + E, e * B + f * D + F)
+
+
+def _collect_placements(content_owner, resources, ctm: Matrix, placements: Dict, depth: int = 0):
+    """
+    Läuft durch den Content-Stream (Seite oder Form-XObject), verfolgt die CTM über q/Q/cm
+    und merkt sich für jedes Bild die größte dargestellte Breite und Höhe in Punkten.
+    """
+    if depth > 8 or resources is None:
+        return
+    xobjects = resources.get('/XObject')
+    if xobjects is None:
+        return
+    stack = []
+    for operands, operator in pikepdf.parse_content_stream(content_owner, 'q Q cm Do'):
+        op = str(operator)
+        if op == 'q':
+            stack.append(ctm)
+        elif op == 'Q':
+            ctm = stack.pop() if stack else _IDENTITY
+        elif op == 'cm':
+            ctm = _multiply(tuple(float(v) for v in operands), ctm)
+        elif op == 'Do':
+            xobject = xobjects.get(operands[0])
+            if xobject is None:
+                continue
+            subtype = xobject.get('/Subtype')
+            if subtype == '/Image':
+                a, b, c, d, _, _ = ctm
+                width_pt, height_pt = math.hypot(a, b), math.hypot(c, d)
+                key = xobject.objgen
+                previous = placements.get(key, (xobject, 0.0, 0.0))
+                placements[key] = (xobject, max(previous[1], width_pt), max(previous[2], height_pt))
+            elif subtype == '/Form':
+                matrix = tuple(float(v) for v in xobject.get('/Matrix', _IDENTITY))
+                _collect_placements(xobject, xobject.get('/Resources', resources),
+                                    _multiply(matrix, ctm), placements, depth + 1)
+
+
+def _resample_image(image: pikepdf.Object, width_pt: float, height_pt: float, target_dpi: int,
+                    jpeg_quality: int) -> bool:
+    """Rechnet ein Bild auf target_dpi herunter. Gibt True zurück, wenn es ersetzt wurde."""
+    if image.get('/ImageMask') or image.get('/Decode') is not None:
+        return False
+    mode = _RESAMPLABLE_COLORSPACES.get(str(image.get('/ColorSpace')))
+    if mode is None or int(image.get('/BitsPerComponent', 8)) != 8:
+        return False
+    if width_pt <= 0 or height_pt <= 0:
+        return False
+
+    width, height = int(image.Width), int(image.Height)
+    dpi = min(width / (width_pt / 72), height / (height_pt / 72))
+    if dpi <= target_dpi * DPI_TOLERANCE:
+        return False
+    scale = target_dpi / dpi
+    new_size = (max(1, math.ceil(width * scale)), max(1, math.ceil(height * scale)))
+
+    pil_image = pikepdf.PdfImage(image).as_pil_image()
+    if pil_image.mode != mode:
+        pil_image = pil_image.convert(mode)
+    pil_image = pil_image.resize(new_size, Image.LANCZOS)
+
+    # Kodierung beibehalten: JPEG bleibt JPEG, verlustfrei komprimierte Bilder bleiben verlustfrei
+    filters = image.get('/Filter')
+    is_jpeg = filters == '/DCTDecode' or (isinstance(filters, pikepdf.Array) and '/DCTDecode' in list(filters))
+    if is_jpeg:
+        buffer = BytesIO()
+        pil_image.save(buffer, format='JPEG', quality=jpeg_quality, optimize=True)
+        image.write(buffer.getvalue(), filter=pikepdf.Name.DCTDecode)
+    else:
+        image.write(zlib.compress(pil_image.tobytes(), 9), filter=pikepdf.Name.FlateDecode)
+    if '/DecodeParms' in image:
+        del image['/DecodeParms']
+    image.Width, image.Height = new_size
+
+    # Transparenzmaske auf dieselbe Größe bringen
+    smask = image.get('/SMask')
+    if smask is not None and int(smask.get('/BitsPerComponent', 8)) == 8:
+        mask = pikepdf.PdfImage(smask).as_pil_image().convert('L').resize(new_size, Image.LANCZOS)
+        smask.write(zlib.compress(mask.tobytes(), 9), filter=pikepdf.Name.FlateDecode)
+        if '/DecodeParms' in smask:
+            del smask['/DecodeParms']
+        smask.Width, smask.Height = new_size
+    return True
+
+
+def optimize_pdf(path: str, target_dpi: int = PDF_OPTIMIZE_TARGET_DPI,
+                 jpeg_quality: int = PDF_OPTIMIZE_JPEG_QUALITY) -> Dict:
+    """
+    Verkleinert ein PDF in place: Bilder über target_dpi werden heruntergerechnet, Streams neu
+    komprimiert und Objekte in Object-Streams geschrieben. Die Datei wird nur ersetzt, wenn
+    das Ergebnis kleiner ist. Läuft in einem Worker-Prozess.
+    """
+    started = time.monotonic()
+    before = os.path.getsize(path)
+    downsampled = 0
+    skipped = 0
+    tmp_path = path + '.opt.tmp'
+    with pikepdf.open(path) as pdf:
+        placements = {}
+        for page in pdf.pages:
+            try:
+                _collect_placements(page, page.obj.get('/Resources'), _IDENTITY, placements)
+            except Exception as e:
+                logger.debug(f"Content-Stream von {path} konnte nicht analysiert werden: {e}")
+        for image, width_pt, height_pt in placements.values():
+            try:
+                if _resample_image(image, width_pt, height_pt, target_dpi, jpeg_quality):
+                    downsampled += 1
+            except Exception as e:
+                skipped += 1
+                logger.debug(f"Bild in {path} übersprungen: {e}")
+        pdf.save(
+            tmp_path,
+            compress_streams=True,
+            recompress_flate=True,
+            object_stream_mode=pikepdf.ObjectStreamMode.generate,
+        )
+
+    after = os.path.getsize(tmp_path)
+    if after < before:
+        os.replace(tmp_path, path)
+    else:
+        os.remove(tmp_path)
+        after = before
+    return {
+        'before_bytes': before,
+        'after_bytes': after,
+        'images_seen': len(placements),
+        'images_downsampled': downsampled,
+        'images_skipped': skipped,
+        'seconds': round(time.monotonic() - started, 2),
+    }
+
+
+class PdfOptimizer:
+    """Führt optimize_pdf in einem Prozess-Pool aus und sammelt Größenstatistiken."""
+
+    def __init__(self, workers: int = PDF_OPTIMIZE_WORKERS):
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.stats = {'files': 0, 'failures': 0, 'before_bytes': 0, 'after_bytes': 0, 'images_downsampled': 0}
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    async def optimize(self, path: str) -> Optional[Dict]:
+        """Optimiert eine Datei im Pool. Gibt die Metriken zurück oder None bei Fehlern (Datei bleibt unverändert)."""
+        loop = asyncio.get_running_loop()
+        try:
+            metrics = await loop.run_in_executor(self.executor, optimize_pdf, path)
+        except Exception as e:
+            self.stats['failures'] += 1
+            logger.warning(f"PDF konnte nicht optimiert werden: {path}: {e}")
+            return None
+        self.stats['files'] += 1
+        self.stats['before_bytes'] += metrics['before_bytes']
+        self.stats['after_bytes'] += metrics['after_bytes']
+        self.stats['images_downsampled'] += metrics['images_downsampled']
+        return metrics
+
+    def get_stats(self) -> Dict:
+        before, after = self.stats['before_bytes'], self.stats['after_bytes']
+        return {**self.stats, 'workers': self.workers,
+                'saved_ratio': round(1 - after / before, 3) if before else 0.0}
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+
+# ======================= Prozessweiter Optimierer =======================
+
+_pdf_optimizer: Optional[PdfOptimizer] = None
+
+
+def get_pdf_optimizer() -> PdfOptimizer:
+    """Gibt den prozessweiten PDF-Optimierer zurück (Worker starten erst bei Bedarf)."""
+    global _pdf_optimizer
+    if _pdf_optimizer is None:
+        _pdf_optimizer = PdfOptimizer()
+    return _pdf_optimizer
@@ -0,0 +1,270 @@
+# app/processing/pdf_pipeline.py
+
+import asyncio
+import os
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from app.processing.pdf_optimizer import PdfOptimizer
+from app.processing.zip_archive import ZipBundleBuilder
+from app.processing.pdf_merge import IncrementalPdfMerger, PdfMergePool, get_merge_pool, read_merge_progress
+from config import logger, OUTPUT_PDFS_DIR, PIPELINE_REORDER_WINDOW, PIPELINE_QUEUE_SIZE, PDF_FAST_WEB_VIEW_DEFAULT
+
+_DONE = object()
+
+
+class StreamingPdfPipeline:
+    """
+    Streaming-Pipeline Rendern -> Zusammenführen -> ZIP für einen PDF-Job.
+
+    Render-Ergebnisse kommen in beliebiger Reihenfolge über deliver() an und werden in einem
+    Reorder-Puffer gesammelt, bis ihre Vorgänger fertig sind. Danach laufen sie über begrenzte
+    Queues zur Merge-Stufe (kopiert jedes Dokument sofort in die zusammengeführten PDFs) und zur ZIP-Stufe
+    (legt das Einzel-PDF ins ZIP-Bundle und löscht es). Das Bundle enthält die vorbereiteten
+    ZIP-Einträge samt Manifest; das Archiv selbst entsteht erst beim Download (ZipStream). admit() hält das Rendern höchstens
+    window URLs vor der Weiterverarbeitung, damit nicht alle Zwischen-PDFs gleichzeitig auf der Platte liegen.
+    Mit optimizer wird jedes PDF vor dem Einreihen verkleinert (parallel im Prozess-Pool).
+    Wiederholte URLs (deliver_retry) werden nachträglich an ihrer ursprünglichen Position eingefügt.
+    Beim Abschluss ergänzt der Merge-Pool Inhaltsverzeichnis, Seitenbaum und Lesezeichen der
+    zusammengeführten PDFs aller Modi gleichzeitig in eigenen Prozessen; get_merge_progress() liefert dabei den Fortschritt pro Modus. Mit linearize
+    werden sie für die schnelle Anzeige im Browser linearisiert (Fast Web View).
+    """
+
+    def __init__(self, merged_paths: Dict[str, str], bundle_dir: str, base_dir: str = OUTPUT_PDFS_DIR,
+                 window: int = PIPELINE_REORDER_WINDOW, queue_size: int = PIPELINE_QUEUE_SIZE,
+                 optimizer: Optional[PdfOptimizer] = None, merge_pool: Optional[PdfMergePool] = None,
+                 linearize: bool = PDF_FAST_WEB_VIEW_DEFAULT):
+        self.modes = list(merged_paths)
+        self.merged_paths = merged_paths
+        self.bundle_dir = bundle_dir
+        self.base_dir = base_dir
+        self.window = max(1, window)
+        self.optimizer = optimizer
+        self.merge_pool = merge_pool or get_merge_pool()
+        self._mergers = {mode: IncrementalPdfMerger(path, linearize=linearize) for mode, path in merged_paths.items()}
+        self._zip: Optional[ZipBundleBuilder] = None
+        self._zip_tasks = set()
+        self._merge_finishing: Dict[str, float] = {}
+        self._merge_results: Dict[str, Dict] = {}
+        self._merge_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._zip_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._reorder: Dict[int, Dict] = {}
+        self._next_index = 0
+        self._drain_lock = asyncio.Lock()
+        self._admitted = asyncio.Condition()
+        self._path_refs: Counter = Counter()
+        self._workers: List[asyncio.Task] = []
+        self._error: Optional[Exception] = None
+        self._started = time.monotonic()
+        self.stats = {
+            'documents_merged': 0,
+            'files_zipped': 0,
+            'peak_reorder_buffer': 0,
+            'first_merge_seconds': None,
+            'optimized_files': 0,
+            'bytes_before_optimization': 0,
+            'bytes_after_optimization': 0,
+            'retried_documents': 0,
+            'deduplicated_objects': 0,
+            'deduplicated_bytes': 0,
+            'merges': {},
+            'zip': None,
+        }
+
+    async def start(self):
+        self._zip = await asyncio.to_thread(ZipBundleBuilder, self.bundle_dir, self.base_dir)
+        self._workers = [
+            asyncio.create_task(self._merge_stage()),
+            asyncio.create_task(self._zip_stage()),
+        ]
+
+    # ----------------------- Eingang (Render-Stufe) -----------------------
+
+    async def admit(self, index: int):
+        """Wartet, bis index innerhalb des Fensters hinter dem nächsten erwarteten Ergebnis liegt."""
+        async with self._admitted:
+            await self._admitted.wait_for(lambda: index < self._next_index + self.window)
+
+    async def deliver(self, index: int, item):
+        """
+        Nimmt das Ergebnis einer URL entgegen: ein Ergebnis-Dict (ein Modus), ein Dict je Modus
+        oder eine Exception. Gibt in Reihenfolge an die Merge-Stufe weiter, sobald möglich.
+        """
+        item = self._normalize(item)
+        if self.optimizer:
+            await self._optimize(item)
+        self._reorder[index] = item
+        self.stats['peak_reorder_buffer'] = max(self.stats['peak_reorder_buffer'], len(self._reorder))
+        async with self._drain_lock:
+            while self._next_index in self._reorder:
+                results = self._reorder.pop(self._next_index)
+                await self._merge_queue.put((self._next_index, results))
+                self._next_index += 1
+                async with self._admitted:
+                    self._admitted.notify_all()
+
+    async def deliver_retry(self, index: int, item: Dict):
+        """
+        Nimmt ein nach der Wiederholung gelungenes Ergebnis entgegen. Die URL ist bereits durch
+        den Reorder-Puffer gelaufen, das Ergebnis wird daher direkt an der Position index eingefügt.
+        """
+        item = self._normalize(item)
+        if self.optimizer:
+            await self._optimize(item)
+        self.stats['retried_documents'] += 1
+        await self._merge_queue.put((index, item))
+
+    def _normalize(self, item) -> Dict[str, Dict]:
+        if isinstance(item, Exception):
+            return {mode: {"status": "error", "error": str(item)} for mode in self.modes}
+        if len(self.modes) == 1 and 'status' in item:
+            item = {self.modes[0]: item}
+        for result in item.values():
+            if result.get('status') == 'success':
+                self._path_refs[result['path']] += 1
+        return item
+
+    async def _optimize(self, item: Dict[str, Dict]):
+        """Verkleinert die PDFs eines Ergebnisses und hängt die Vorher/Nachher-Größen an."""
+        results = [result for result in item.values() if result.get('status') == 'success']
+        optimizations = await asyncio.gather(*(self.optimizer.optimize(result['path']) for result in results))
+        for result, optimization in zip(results, optimizations):
+            if not optimization:
+                continue
+            result['optimization'] = optimization
+            if isinstance(result.get('metrics'), dict):
+                result['metrics']['optimized_pdf_bytes'] = optimization['after_bytes']
+            self.stats['optimized_files'] += 1
+            self.stats['bytes_before_optimization'] += optimization['before_bytes']
+            self.stats['bytes_after_optimization'] += optimization['after_bytes']
+
+    # ----------------------- Stufen -----------------------
+
+    async def _merge_stage(self):
+        while True:
+            queued = await self._merge_queue.get()
+            if queued is _DONE:
+                await self._zip_queue.put(_DONE)
+                return
+            index, results = queued
+            for mode in self.modes:
+                result = results.get(mode, {})
+                if result.get('status') != 'success':
+                    continue
+                if await asyncio.to_thread(self._mergers[mode].append, result, index):
+                    self.stats['documents_merged'] += 1
+                    if self.stats['first_merge_seconds'] is None:
+                        self.stats['first_merge_seconds'] = round(time.monotonic() - self._started, 2)
+                await self._zip_queue.put(result['path'])
+
+    async def _zip_stage(self):
+        # Mehrere Dateien gleichzeitig im Thread-Pool des Archivs vorbereiten, aber begrenzt,
+        # damit die Queue weiterhin Gegendruck auf das Rendern ausübt
+        while True:
+            path = await self._zip_queue.get()
+            if path is _DONE:
+                break
+            while len(self._zip_tasks) >= 2 * self._zip.workers:
+                await asyncio.wait(self._zip_tasks, return_when=asyncio.FIRST_COMPLETED)
+            task = asyncio.create_task(self._zip_one(path))
+            self._zip_tasks.add(task)
+            task.add_done_callback(self._zip_tasks.discard)
+        if self._zip_tasks:
+            await asyncio.wait(self._zip_tasks)
+
+    async def _zip_one(self, path: str):
+        try:
+            if await asyncio.wrap_future(self._zip.submit(path)):
+                self.stats['files_zipped'] += 1
+        except Exception as e:
+            logger.error(f"Fehler beim Hinzufügen von {path} zum ZIP-Archiv: {e}")
+            self._error = self._error or e
+        self._release_path(path)
+
+    def _release_path(self, path: str):
+        """Löscht ein Einzel-PDF, sobald kein ausstehendes Ergebnis mehr darauf verweist."""
+        self._path_refs[path] -= 1
+        if self._path_refs[path] > 0:
+            return
+        del self._path_refs[path]
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Einzel-PDF konnte nicht entfernt werden: {path}: {e}")
+
+    # ----------------------- Abschluss -----------------------
+
+    async def finish(self) -> Dict:
+        """Schließt die Stufen ab, schreibt die zusammengeführten PDFs ins Archiv und gibt Statistiken zurück."""
+        await self._merge_queue.put(_DONE)
+        await asyncio.gather(*self._workers)
+        if self._error:
+            await self.abort()
+            raise self._error
+        # Die Modi schreiben unabhängige Dateien und laufen daher parallel im Merge-Pool
+        await asyncio.gather(*(self._finish_merge(mode) for mode in self.modes))
+        await asyncio.to_thread(self._zip.close)
+        self.stats['zip'] = self._zip.get_stats()
+        self.stats['total_seconds'] = round(time.monotonic() - self._started, 2)
+        return dict(self.stats)
+
+    async def _finish_merge(self, mode: str):
+        merger = self._mergers[mode]
+        path = self.merged_paths[mode]
+        self._merge_finishing[mode] = time.monotonic()
+        try:
+            result = await self.merge_pool.finish(merger, self._progress_path(mode))
+        finally:
+            # Der Worker hat mit einer Kopie gearbeitet; die Datei dieses Prozesses freigeben
+            merger.close()
+        self._merge_results[mode] = result
+        self.stats['deduplicated_objects'] += result['deduplicated_objects']
+        self.stats['deduplicated_bytes'] += result['deduplicated_bytes']
+        self.stats['merges'][mode] = {
+            'ok': result['ok'],
+            'documents': result['progress']['documents_written'],
+            'pages': result['progress']['pages_written'],
+            'seconds': round(time.monotonic() - self._merge_finishing[mode], 2),
+        }
+        if os.path.exists(path):
+            await asyncio.wrap_future(self._zip.submit(path, os.path.basename(path)))
+            os.remove(path)
+
+    def _progress_path(self, mode: str) -> str:
+        return f"{self.merged_paths[mode]}.progress"
+
+    def get_merge_progress(self) -> Dict[str, Dict]:
+        """
+        Fortschritt der Zusammenführung pro Modus für die Statusseite: während des Renderns die
+        Zahl der angehängten Dokumente (phase collecting), danach der vom Worker gemeldete Stand.
+        Kann aus Flask-Threads aufgerufen werden.
+        """
+        progress = {}
+        for mode, merger in self._mergers.items():
+            if mode in self._merge_results:
+                progress[mode] = dict(self._merge_results[mode]['progress'])
+            elif mode in self._merge_finishing:
+                progress[mode] = read_merge_progress(self._progress_path(mode)) or {
+                    **merger.progress, 'phase': 'starting',
+                    'documents_total': len(merger.toc_entries), 'pages_total': merger.current_page,
+                }
+            else:
+                progress[mode] = {**merger.progress, 'documents_total': len(merger.toc_entries),
+                                  'pages_total': merger.current_page}
+        return progress
+
+    async def abort(self):
+        """Bricht die Pipeline ab (z.B. nach einem Fehler im Job) und gibt das Archiv frei."""
+        for task in [*self._workers, *self._zip_tasks]:
+            task.cancel()
+        await asyncio.gather(*self._workers, *self._zip_tasks, return_exceptions=True)
+        if self._zip:
+            try:
+                await asyncio.to_thread(self._zip.close)
+            except Exception:
+                pass
+        for merger in self._mergers.values():
+            merger.close()
@@ -0,0 +1,158 @@
+# app/processing/preview.py
+
+import asyncio
+import hashlib
+import os
+import time
+from io import BytesIO
+from typing import Callable, Dict, List, Optional
+
+from PIL import Image
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+from app.processing.render_cache import normalize_url
+from app.processing.website_downloader import PDFConverter, error_result
+from config import (
+    logger,
+    PREVIEW_CACHE_DIR,
+    PREVIEW_WIDTH,
+    PREVIEW_JPEG_QUALITY,
+    PREVIEW_NAVIGATION_TIMEOUT_MS,
+    PREVIEW_SETTLE_TIMEOUT_MS,
+    PREVIEW_CACHE_MAX_AGE_HOURS,
+    RENDER_MAX_CONCURRENCY,
+)
+
+
+class PreviewRenderer:
+    """
+    Schnelle Vorschau einer Auswahl: ein Viewport-Screenshot pro URL in niedriger Auflösung,
+    mit derselben Bereinigung wie beim PDF-Job. Nutzt die gepoolten Seiten und den Render-Scheduler,
+    wartet aber weder auf die volle Seitenbereitschaft noch scrollt es. Die Bilder liegen im
+    Vorschau-Cache (Schlüssel aus URL, Modus und Render-Einstellungen); gleichzeitige Anfragen
+    für dasselbe Bild werden zusammengefasst.
+    """
+
+    def __init__(self, converter: Optional[PDFConverter] = None, cache_dir: str = str(PREVIEW_CACHE_DIR),
+                 width: int = PREVIEW_WIDTH, max_age_hours: float = PREVIEW_CACHE_MAX_AGE_HOURS):
+        # Der Converter liefert Browser-Pool, Ressourcen-Policy, Bereinigungsskripte und Scheduler
+        self.converter = converter or PDFConverter(max_concurrent_tasks=RENDER_MAX_CONCURRENCY)
+        self.cache_dir = cache_dir
+        self.width = width
+        self.max_age_seconds = max_age_hours * 3600
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.stats = {'rendered': 0, 'cache_hits': 0, 'failures': 0, 'coalesced': 0, 'render_ms_total': 0}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key_for(self, url: str, expanded: bool) -> str:
+        mode = 'expanded' if expanded else 'collapsed'
+        settings = self.converter.render_settings_hashes[mode]
+        return hashlib.sha256(f"{normalize_url(url)}|{mode}|{settings}|{self.width}".encode('utf-8')).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.jpg")
+
+    def _cached(self, key: str) -> bool:
+        try:
+            return time.time() - os.path.getmtime(self.path_for(key)) < self.max_age_seconds
+        except OSError:
+            return False
+
+    async def render(self, url: str, expanded: bool = False, job=None) -> Dict:
+        """Liefert die Vorschau einer URL ({url, status, key, cached, ms}), aus dem Cache oder neu gerendert."""
+        key = self.key_for(url, expanded)
+        if self._cached(key):
+            self.stats['cache_hits'] += 1
+            return {'url': url, 'status': 'success', 'key': key, 'cached': True, 'ms': 0}
+        if key in self._in_flight:
+            self.stats['coalesced'] += 1
+            return dict(await asyncio.shield(self._in_flight[key]))
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await self._render(url, expanded, key, job)
+            future.set_result(result)
+            return result
+        finally:
+            del self._in_flight[key]
+            if not future.done():
+                future.cancel()
+
+    async def _render(self, url: str, expanded: bool, key: str, job=None) -> Dict:
+        started = time.monotonic()
+        try:
+            if job is not None:
+                async with self.converter.scheduler.slot(job):
+                    screenshot = await self._screenshot(url, expanded)
+            else:
+                screenshot = await self._screenshot(url, expanded)
+            await asyncio.to_thread(self._store, key, screenshot)
+        except Exception as e:
+            self.stats['failures'] += 1
+            logger.warning(f"Vorschau für {url} fehlgeschlagen: {e}")
+            return {**error_result(url, e), 'key': key}
+        ms = int((time.monotonic() - started) * 1000)
+        self.stats['rendered'] += 1
+        self.stats['render_ms_total'] += ms
+        return {'url': url, 'status': 'success', 'key': key, 'cached': False, 'ms': ms}
+
+    async def _screenshot(self, url: str, expanded: bool) -> bytes:
+        # Der Kontext geht nach dem Screenshot zurück in den Pool (das Zurücksetzen löscht Routen,
+        # Cookies und Storage); bei Fehlern verwirft lease_page ihn selbst
+        async with self.converter.browser_pool.lease_page() as pooled_context:
+            page = pooled_context.page
+            await self.converter.resource_policy.install(page)
+            await page.goto(url, timeout=PREVIEW_NAVIGATION_TIMEOUT_MS, wait_until='domcontentloaded')
+            try:
+                await page.wait_for_load_state('networkidle', timeout=PREVIEW_SETTLE_TIMEOUT_MS)
+            except PlaywrightTimeoutError:
+                pass
+            await self.converter._apply_cleanup(page, expanded)
+            return await page.screenshot(type='jpeg', quality=PREVIEW_JPEG_QUALITY, full_page=False)
+
+    def _store(self, key: str, screenshot: bytes):
+        """Verkleinert den Screenshot auf die Vorschaubreite und legt ihn atomar im Cache ab."""
+        image = Image.open(BytesIO(screenshot)).convert('RGB')
+        if image.width > self.width:
+            image = image.resize((self.width, max(1, round(image.height * self.width / image.width))),
+                                 Image.LANCZOS)
+        tmp_path = self.path_for(key) + '.tmp'
+        image.save(tmp_path, format='JPEG', quality=PREVIEW_JPEG_QUALITY, optimize=True)
+        os.replace(tmp_path, self.path_for(key))
+
+    async def render_many(self, job_id: str, urls: List[str], expanded: bool = False,
+                          on_result: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
+        """
+        Rendert die Vorschauen einer Auswahl über den Render-Scheduler (kleine Aufträge werden
+        vor laufenden Batch-Jobs bedient). on_result wird pro fertiger Vorschau aufgerufen,
+        damit die Oberfläche die Bilder anzeigen kann, bevor der ganze Auftrag fertig ist.
+        """
+        scheduler = self.converter.scheduler
+        async with scheduler.job(job_id, len(urls), self.converter.max_concurrent_tasks) as job:
+
+            async def one(url):
+                result = await self.render(url, expanded, job)
+                if on_result:
+                    on_result(result)
+                return result
+
+            return await asyncio.gather(*(one(url) for url in urls))
+
+    def get_stats(self) -> Dict:
+        rendered = self.stats['rendered']
+        return {**self.stats, 'in_flight': len(self._in_flight),
+                'avg_render_ms': round(self.stats['render_ms_total'] / rendered) if rendered else None}
+
+
+# ======================= Prozessweiter Vorschau-Renderer =======================
+
+_preview_renderer: Optional[PreviewRenderer] = None
+
+
+def get_preview_renderer() -> PreviewRenderer:
+    """Gibt den prozessweiten Vorschau-Renderer zurück (läuft auf dem gemeinsamen Render-Loop)."""
+    global _preview_renderer
+    if _preview_renderer is None:
+        _preview_renderer = PreviewRenderer()
+    return _preview_renderer
@@ -0,0 +1,405 @@
+# app/processing/render_cache.py
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+try:
+    import fcntl  # Prozessübergreifende Sperre (Render-Farm-Worker teilen sich den Index)
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+from config import logger, RENDER_CACHE_DIR, RENDER_CACHE_MAX_MB, RENDER_CACHE_MAX_AGE_HOURS, WORKSPACE_STALE_HOURS
+
+# Zugriffszeiten aus get() werden gesammelt und spätestens nach so vielen Treffern bzw. Sekunden
+# in den Index geschrieben (sonst gingen sie beim nächsten Neuladen verloren und LRU würde zu FIFO)
+ACCESS_FLUSH_EVERY = 32
+ACCESS_FLUSH_SECONDS = 30
+
+
+def normalize_url(url: str) -> str:
+    """Normalisiert eine URL für den Cache-Schlüssel (Schema/Host klein, ohne Fragment, sortierte Query)."""
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    netloc = parsed.netloc.lower()
+    if (scheme == 'http' and netloc.endswith(':80')) or (scheme == 'https' and netloc.endswith(':443')):
+        netloc = netloc.rsplit(':', 1)[0]
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return urlunparse((scheme, netloc, parsed.path or '/', parsed.params, query, ''))
+
+
+def hash_settings(*parts) -> str:
+    """Stabiler Hash über Render-Einstellungen (Viewport, PDF-Optionen, Bereinigungsskript, ...)."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def link_or_copy(source: str, target: str) -> bool:
+    """
+    Legt target als Hardlink auf source an (ersetzt eine vorhandene Datei atomar). Liegen beide
+    nicht im selben Dateisystem, wird kopiert. Gibt True zurück, wenn ein Hardlink entstanden ist.
+    Hardlinks teilen sich den Inhalt: Dateien aus dem Speicher dürfen nur per os.replace ersetzt,
+    nie an Ort und Stelle überschrieben werden.
+    """
+    tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.link"
+    try:
+        os.link(source, tmp_path)
+        linked = True
+    except OSError:
+        shutil.copyfile(source, tmp_path)
+        linked = False
+    os.replace(tmp_path, target)
+    return linked
+
+
+class RenderCache:
+    """
+    Inhaltsadressierter Speicher für gerenderte PDFs, den sich alle Jobs teilen.
+
+    Schlüssel = Hash aus normalisierter URL, Modus, Render-Einstellungen und einem
+    Inhalts-Fingerprint (ETag/Last-Modified oder DOM-Hash). Die PDFs selbst liegen
+    nach ihrem SHA-256 benannt im Cache-Verzeichnis, sodass mehrere Schlüssel auf
+    dieselbe Datei zeigen können. Jobs erhalten Hardlinks statt Kopien und halten pro
+    genutztem Blob eine Referenz (Lease), bis release_job() sie freigibt. Die Gesamtgröße
+    ist begrenzt (LRU-Verdrängung); Blobs mit Referenzen werden dabei übersprungen und erst
+    nach der Freigabe gelöscht. Leases abgestürzter Jobs verfallen nach lease_seconds.
+    """
+
+    def __init__(self, cache_dir: Path = RENDER_CACHE_DIR, max_bytes: int = RENDER_CACHE_MAX_MB * 1024 ** 2,
+                 max_age_seconds: float = RENDER_CACHE_MAX_AGE_HOURS * 3600,
+                 lease_seconds: float = WORKSPACE_STALE_HOURS * 3600):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.cache_dir / 'index.json'
+        self.lock_path = self.cache_dir / 'index.lock'
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._urls: set = set()
+        self._index_stamp = None  # (mtime, Größe) der zuletzt geladenen index.json
+        self._set_index(self._load_index())
+        # Noch nicht gespeicherte Zugriffe {key: Zeitpunkt} und abgelaufene Schlüssel aus get()
+        self._pending_access: Dict[str, float] = {}
+        self._pending_drops: set = set()
+        self._last_flush = time.monotonic()
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'deduplicated': 0, 'linked': 0, 'copied': 0,
+                      'evictions': 0, 'evictions_skipped': 0, 'released_jobs': 0}
+
+    def _stat_index(self):
+        try:
+            stat = self.index_path.stat()
+            return stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
+
+    def _load_index(self) -> Dict:
+        # Vor dem Lesen festhalten: ändert ein anderer Prozess die Datei währenddessen, lädt der nächste Zugriff neu
+        self._index_stamp = self._stat_index()
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            return {'keys': index.get('keys', {}), 'blobs': index.get('blobs', {}),
+                    'leases': index.get('leases', {})}
+        except (FileNotFoundError, ValueError):
+            return {'keys': {}, 'blobs': {}, 'leases': {}}
+
+    def _refresh_index(self):
+        """Lädt den Index neu, wenn ein anderer Prozess ihn seit dem letzten Laden geändert hat. Unter self._lock."""
+        if self._stat_index() != self._index_stamp:
+            self._set_index(self._load_index())
+
+    def _set_index(self, index: Dict):
+        """Übernimmt einen geladenen Index samt Nachschlagetabelle (normalisierte URL, Modus)."""
+        self._index = index
+        self._urls = {(normalize_url(entry['url']), entry['mode']) for entry in index['keys'].values()}
+
+    @contextmanager
+    def _locked_index(self):
+        """
+        Schreibzugriff auf den Index: sperrt ihn auch gegenüber anderen Prozessen,
+        lädt den aktuellen Stand von der Platte und speichert ihn danach wieder.
+        """
+        with self._lock, open(self.lock_path, 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._set_index(self._load_index())
+                self._apply_pending()
+                yield self._index
+                self._save_index()
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _apply_pending(self):
+        """Überträgt gesammelte Zugriffe und Abläufe aus get() in den frisch geladenen Index."""
+        now = time.time()
+        for key, accessed in self._pending_access.items():
+            entry = self._index['keys'].get(key)
+            if entry and accessed > entry['last_access']:
+                entry['last_access'] = accessed
+        for key in self._pending_drops:
+            entry = self._index['keys'].get(key)
+            # Ein anderer Prozess kann den Schlüssel inzwischen neu abgelegt haben
+            if entry and (now - entry['created'] > self.max_age_seconds
+                          or not self._blob_path(entry['blob']).exists()):
+                self._drop_key(key)
+        self._pending_access.clear()
+        self._pending_drops.clear()
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        """Schreibt gesammelte Zugriffszeiten und Abläufe in den Index."""
+        with self._locked_index():
+            pass
+
+    def _save_index(self):
+        tmp_path = self.index_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.index_path)
+        self._index_stamp = self._stat_index()
+
+    @staticmethod
+    def make_key(url: str, mode: str, settings_hash: str, fingerprint: str) -> str:
+        raw = '\n'.join([normalize_url(url), mode, settings_hash, fingerprint])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _blob_path(self, blob: str) -> Path:
+        return self.cache_dir / f"{blob}.pdf"
+
+    def knows(self, url: str, mode: str) -> bool:
+        """Ob für URL und Modus überhaupt ein Eintrag existiert (unabhängig von Einstellungen und Fingerprint)."""
+        with self._lock:
+            self._refresh_index()
+            return (normalize_url(url), mode) in self._urls
+
+    def get(self, keys: Iterable[Optional[str]], count_miss: bool = True) -> Optional[Dict]:
+        """
+        Sucht den ersten gültigen Eintrag zu den Schlüsseln. Gibt {'path', 'title', 'key'} zurück.
+        Mit count_miss=False zählt ein Fehlschlag nicht in die Statistik (Vorab-Prüfung per ETag).
+        """
+        now = time.time()
+        hit = None
+        with self._lock:
+            self._refresh_index()
+            for key in keys:
+                entry = self._index['keys'].get(key) if key else None
+                if not entry:
+                    continue
+                blob_path = self._blob_path(entry['blob'])
+                if now - entry['created'] > self.max_age_seconds or not blob_path.exists():
+                    # Entfernt wird erst unter der Index-Sperre (andere Prozesse teilen sich den Index)
+                    self._pending_drops.add(key)
+                    continue
+                entry['last_access'] = now
+                self._pending_access[key] = now
+                self.stats['hits'] += 1
+                hit = {'path': str(blob_path), 'title': entry.get('title'), 'key': key, 'blob': entry['blob']}
+                break
+            if not hit and count_miss:
+                self.stats['misses'] += 1
+            flush = (len(self._pending_access) + len(self._pending_drops) >= ACCESS_FLUSH_EVERY
+                     or (self._pending_access or self._pending_drops)
+                     and time.monotonic() - self._last_flush >= ACCESS_FLUSH_SECONDS)
+        if flush:
+            self.flush()
+        return hit
+
+    def restore(self, keys: Iterable[Optional[str]], target_path: str, count_miss: bool = True,
+                job_id: Optional[str] = None) -> Optional[Dict]:
+        """
+        Verlinkt ein gespeichertes PDF nach target_path (Kopie nur über Dateisystemgrenzen hinweg)
+        und hält es für job_id fest. Gibt den Eintrag oder None zurück.
+        """
+        hit = self.get(keys, count_miss=count_miss)
+        if not hit:
+            return None
+        try:
+            if job_id:
+                # Unter der Index-Sperre, damit kein anderer Prozess den Blob dazwischen verdrängt
+                with self._locked_index():
+                    if hit['blob'] not in self._index['blobs']:
+                        raise FileNotFoundError(hit['path'])
+                    self._link(hit['path'], target_path)
+                    self._acquire(job_id, hit['blob'])
+            else:
+                self._link(hit['path'], target_path)
+            return hit
+        except OSError as e:
+            logger.warning(f"Gespeichertes PDF konnte nicht übernommen werden: {e}")
+            return None
+
+    def lease(self, job_id: str, blob: str) -> bool:
+        """Hält einen Blob für job_id fest (z.B. für eine zusammengefasste Anfrage eines anderen Jobs)."""
+        with self._locked_index():
+            if blob not in self._index['blobs']:
+                return False
+            self._acquire(job_id, blob)
+            return True
+
+    def release_job(self, job_id: str):
+        """Gibt alle Referenzen eines Jobs frei; nicht mehr verwendete Blobs werden dabei gelöscht."""
+        with self._locked_index():
+            if self._index['leases'].pop(job_id, None) is None:
+                return
+            self.stats['released_jobs'] += 1
+            self._collect_orphans()
+            self._evict()
+
+    def _link(self, source: str, target: str):
+        if link_or_copy(source, target):
+            self.stats['linked'] += 1
+        else:
+            self.stats['copied'] += 1
+
+    def _acquire(self, job_id: str, blob: str):
+        """Vermerkt die Referenz eines Jobs auf einen Blob. Unter der Index-Sperre."""
+        lease = self._index['leases'].setdefault(job_id, {'blobs': [], 'updated': 0})
+        if blob not in lease['blobs']:
+            lease['blobs'].append(blob)
+        lease['updated'] = time.time()
+
+    def _leased_blobs(self) -> Dict[str, int]:
+        """Referenzzähler pro Blob; verfallene Leases (abgestürzte Jobs) werden dabei entfernt."""
+        now = time.time()
+        counts: Dict[str, int] = {}
+        for job_id, lease in list(self._index['leases'].items()):
+            if now - lease['updated'] > self.lease_seconds:
+                del self._index['leases'][job_id]
+                continue
+            for blob in lease['blobs']:
+                counts[blob] = counts.get(blob, 0) + 1
+        return counts
+
+    def put(self, keys: Iterable[Optional[str]], pdf_path: str, url: str, mode: str, title: str,
+            job_id: Optional[str] = None) -> Optional[str]:
+        """
+        Legt ein gerendertes PDF unter allen angegebenen Schlüsseln ab und gibt den Blob zurück.
+        Neue Blobs entstehen als Hardlink auf pdf_path; existiert der Inhalt schon, wird pdf_path
+        durch einen Link auf den vorhandenen Blob ersetzt, sodass er nur einmal auf der Platte liegt.
+        """
+        keys = [key for key in keys if key]
+        if not keys:
+            return None
+        sha = hashlib.sha256()
+        with open(pdf_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(chunk)
+        blob = sha.hexdigest()
+        blob_path = self._blob_path(blob)
+        now = time.time()
+        with self._locked_index():
+            if blob not in self._index['blobs'] or not blob_path.exists():
+                self._link(pdf_path, str(blob_path))
+                self._index['blobs'][blob] = {'size': blob_path.stat().st_size}
+            elif not os.path.samefile(pdf_path, blob_path):
+                self._link(str(blob_path), pdf_path)
+                self.stats['deduplicated'] += 1
+            for key in keys:
+                self._index['keys'][key] = {
+                    'blob': blob, 'url': url, 'mode': mode, 'title': title,
+                    'created': now, 'last_access': now,
+                }
+            self._urls.add((normalize_url(url), mode))
+            if job_id:
+                self._acquire(job_id, blob)
+            self.stats['stores'] += 1
+            self._evict()
+        return blob
+
+    def _drop_key(self, key: str, leased: Optional[Dict[str, int]] = None,
+                  key_counts: Optional[Counter] = None) -> int:
+        """
+        Entfernt einen Schlüssel und löscht das PDF, wenn weder ein anderer Schlüssel noch ein
+        laufender Job darauf verweist (sonst übernimmt das release_job()). Gibt die freigegebenen
+        Bytes zurück. Die Verdrängung übergibt leased und key_counts, um sie nicht pro Schlüssel
+        neu zu berechnen.
+        """
+        entry = self._index['keys'].pop(key, None)
+        if not entry:
+            return 0
+        blob = entry['blob']
+        if key_counts is not None:
+            key_counts[blob] -= 1
+            referenced = key_counts[blob] > 0
+        else:
+            referenced = any(e['blob'] == blob for e in self._index['keys'].values())
+        if leased is None:
+            leased = self._leased_blobs()
+        if referenced or blob in leased:
+            return 0
+        return self._remove_blob(blob)
+
+    def _remove_blob(self, blob: str) -> int:
+        size = self._index['blobs'].pop(blob, {}).get('size', 0)
+        try:
+            self._blob_path(blob).unlink()
+        except FileNotFoundError:
+            pass
+        return size
+
+    def _collect_orphans(self):
+        """Löscht Blobs ohne Schlüssel und ohne Referenz. Unter der Index-Sperre."""
+        referenced = {entry['blob'] for entry in self._index['keys'].values()}
+        leased = self._leased_blobs()
+        for blob in list(self._index['blobs']):
+            if blob not in referenced and blob not in leased:
+                self._remove_blob(blob)
+
+    def _total_bytes(self) -> int:
+        return sum(blob['size'] for blob in self._index['blobs'].values())
+
+    def _evict(self):
+        """
+        LRU-Verdrängung, bis die Gesamtgröße unter dem Limit liegt. Blobs, die ein laufender Job
+        referenziert, bleiben stehen (ihr Platz würde durch die Hardlinks ohnehin nicht frei).
+        Unter der Index-Sperre.
+        """
+        total = self._total_bytes()
+        if total <= self.max_bytes:
+            return
+        leased = self._leased_blobs()
+        key_counts = Counter(entry['blob'] for entry in self._index['keys'].values())
+        for key, entry in sorted(self._index['keys'].items(), key=lambda item: item[1]['last_access']):
+            if entry['blob'] in leased:
+                self.stats['evictions_skipped'] += 1
+                continue
+            total -= self._drop_key(key, leased, key_counts)
+            self.stats['evictions'] += 1
+            if total <= self.max_bytes:
+                break
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'hit_rate': round(self.stats['hits'] / lookups, 3) if lookups else 0.0,
+                'entries': len(self._index['keys']),
+                'blobs': len(self._index['blobs']),
+                'leased_blobs': len({blob for lease in self._index['leases'].values() for blob in lease['blobs']}),
+                'jobs_with_leases': len(self._index['leases']),
+                'size_mb': round(self._total_bytes() / 1024 ** 2, 1),
+            }
+
+
+# ======================= Prozessweiter Cache =======================
+
+_render_cache: Optional[RenderCache] = None
+
+
+def get_render_cache() -> RenderCache:
+    """Gibt den prozessweiten Render-Cache zurück."""
+    global _render_cache
+    if _render_cache is None:
+        _render_cache = RenderCache()
+    return _render_cache
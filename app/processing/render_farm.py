@@ -0,0 +1,207 @@
+# app/processing/render_farm.py
+
+import asyncio
+import math
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from app.processing.render_scheduler import get_render_scheduler
+from config import (
+    logger,
+    RENDER_FARM_WORKERS,
+    RENDER_FARM_MIN_URLS,
+    RENDER_FARM_WORKER_CONCURRENCY,
+    RENDER_MAX_CONCURRENCY,
+)
+
+# Mehrere Teilstücke pro Worker, damit langsame Seiten nicht einen Prozess allein ausbremsen
+CHUNKS_PER_WORKER = 4
+
+# ======================= Worker-Prozess =======================
+
+_worker_converter = None
+
+
+def _init_worker():
+    """
+    Initialisiert einen Worker-Prozess: eigener Render-Loop, eigener Browser und ein
+    PDFConverter, der über alle Teilstücke hinweg bestehen bleibt (warmer Browser).
+    """
+    global _worker_converter
+    from app.processing.adaptive_concurrency import AdaptiveConcurrencyLimiter
+    from app.processing.browser_pool import BrowserPool
+    from app.processing.render_scheduler import RenderScheduler
+    from app.processing.website_downloader import PDFConverter
+
+    _worker_converter = PDFConverter(
+        max_concurrent_tasks=RENDER_FARM_WORKER_CONCURRENCY,
+        browser_pool=BrowserPool(size=1),
+        scheduler=RenderScheduler(AdaptiveConcurrencyLimiter(max_limit=RENDER_FARM_WORKER_CONCURRENCY)),
+    )
+    logger.info(f"Render-Farm-Worker gestartet (PID {os.getpid()}).")
+
+
+def _render_chunk(urls: List[str], mode: str, output_dir: Optional[str] = None, lease_owner: Optional[str] = None,
+                  max_concurrent: int = RENDER_FARM_WORKER_CONCURRENCY):
+    """
+    Rendert ein Teilstück im Worker. mode ist 'collapsed', 'expanded' oder 'both'. Die PDFs
+    landen im Arbeitsverzeichnis output_dir des Jobs (ein Worker bearbeitet immer nur ein Teilstück),
+    die genutzten Blobs im Render-Cache werden dem Job lease_owner zugerechnet. Es laufen höchstens
+    max_concurrent Seiten gleichzeitig (so viele Slots hat der Hauptprozess dafür zugeteilt).
+    """
+    from app.processing.render_loop import render_loop
+    from config import OUTPUT_PDFS_DIR
+
+    _worker_converter.set_output_dir(output_dir or OUTPUT_PDFS_DIR)
+    _worker_converter.lease_owner = lease_owner or _worker_converter.job_id
+    _worker_converter.max_concurrent_tasks = max(1, min(max_concurrent, RENDER_FARM_WORKER_CONCURRENCY))
+
+    async def run():
+        await _worker_converter.initialize()
+        if mode == 'both':
+            return await _worker_converter.convert_urls_to_pdfs_both(urls)
+        return await _worker_converter.convert_urls_to_pdfs(urls, expanded=(mode == 'expanded'))
+
+    return render_loop.run(run())
+
+
+# ======================= Farm (Hauptprozess) =======================
+
+class RenderFarm:
+    """
+    Verteilt die URLs eines Jobs auf mehrere Worker-Prozesse, die jeweils einen eigenen
+    Chromium und Event-Loop besitzen. So laufen PDF-Serialisierung und Python-Overhead
+    auf allen Kernen. Die Ergebnisse werden in der ursprünglichen URL-Reihenfolge zurückgegeben.
+    Der Job ist beim globalen Render-Scheduler angemeldet: Vor jedem Teilstück belegt er dort so
+    viele Slots, wie der Worker Seiten gleichzeitig rendern darf. Damit gelten die globale
+    Obergrenze, das Job-Gewicht und der Warteschlangenstatus auch für Farm-Jobs.
+    """
+
+    def __init__(self, workers: int = RENDER_FARM_WORKERS, min_urls: int = RENDER_FARM_MIN_URLS):
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.min_urls = min_urls
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.stats = {'jobs': 0, 'chunks': 0, 'urls': 0, 'worker_failures': 0}
+
+    def should_use(self, url_count: int, requested: Optional[bool] = None) -> bool:
+        """Explizite Job-Option hat Vorrang, sonst ab min_urls URLs (bei mehr als einem Worker)."""
+        if self.workers < 2:
+            return False
+        if requested is not None:
+            return requested
+        return 0 < self.min_urls <= url_count
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn statt fork: geforkte Prozesse würden Threads und Playwright-Zustand erben
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                )
+                logger.info(f"Render-Farm mit {self.workers} Worker-Prozessen gestartet.")
+            return self._executor
+
+    def _shard(self, urls: List[str], window: Optional[int] = None) -> List[List[str]]:
+        """
+        Teilt die URLs in Teilstücke. Mit einem Reorder-Fenster (sink.window) werden die Teilstücke
+        so klein, dass alle Worker gleichzeitig ein zugelassenes Teilstück bearbeiten können.
+        """
+        chunk_size = max(1, math.ceil(len(urls) / (self.workers * CHUNKS_PER_WORKER)))
+        if window:
+            chunk_size = min(chunk_size, max(1, window // self.workers))
+        return [urls[i:i + chunk_size] for i in range(0, len(urls), chunk_size)]
+
+    async def _map(self, urls: List[str], mode: str, sink=None, output_dir: Optional[str] = None,
+                   lease_owner: Optional[str] = None, job_weight: float = 1.0) -> List:
+        """
+        Rendert alle Teilstücke und gibt pro URL ein Ergebnis in URL-Reihenfolge zurück
+        (bei mode 'both' jeweils {'collapsed': ..., 'expanded': ...}). Ein sink erhält die
+        Ergebnisse eines Teilstücks, sobald es fertig ist. Vorübergehend gescheiterte URLs
+        wiederholt der Worker selbst am Ende seines Teilstücks.
+        """
+        chunks = self._shard(urls, getattr(sink, 'window', None))
+        loop = asyncio.get_running_loop()
+        self.stats['jobs'] += 1
+        self.stats['chunks'] += len(chunks)
+        self.stats['urls'] += len(urls)
+        logger.info(f"Render-Farm: {len(urls)} URLs in {len(chunks)} Teilstücke aufgeteilt ({mode}).")
+
+        scheduler = get_render_scheduler()
+        job_id = lease_owner or uuid.uuid4().hex
+
+        async def run_chunk(job, start: int, chunk: List[str]) -> List:
+            if sink:
+                await sink.admit(start)
+            try:
+                # Nicht mehr Slots verlangen, als Job- und aktuelles globales Limit zulassen
+                count = max(1, min(len(chunk), RENDER_FARM_WORKER_CONCURRENCY, job.max_active,
+                                   scheduler.limiter.limit))
+                async with scheduler.slots(job, count, urls=len(chunk)):
+                    result = await loop.run_in_executor(self.executor, _render_chunk, chunk, mode, output_dir,
+                                                        lease_owner, count)
+                if mode == 'both':
+                    items = [{'collapsed': c, 'expanded': e} for c, e in zip(*result)]
+                else:
+                    items = list(result)
+            except Exception as e:
+                self.stats['worker_failures'] += 1
+                logger.error(f"Render-Farm-Worker fehlgeschlagen ({len(chunk)} URLs): {e}")
+                errors = [{"url": url, "status": "error", "error": str(e)} for url in chunk]
+                if mode == 'both':
+                    items = [{'collapsed': error, 'expanded': dict(error)} for error in errors]
+                else:
+                    items = errors
+            if sink:
+                await asyncio.gather(*(sink.deliver(start + offset, item) for offset, item in enumerate(items)))
+            return items
+
+        starts = [0]
+        for chunk in chunks[:-1]:
+            starts.append(starts[-1] + len(chunk))
+        async with scheduler.job(job_id, len(urls), RENDER_MAX_CONCURRENCY, job_weight) as job:
+            chunk_items = await asyncio.gather(*(run_chunk(job, start, chunk)
+                                                 for start, chunk in zip(starts, chunks)))
+        return [item for items in chunk_items for item in items]
+
+    async def convert_urls_to_pdfs(self, urls: List[str], expanded: bool = False, sink=None,
+                                   output_dir: Optional[str] = None, lease_owner: Optional[str] = None,
+                                   job_weight: float = 1.0) -> List[Dict]:
+        return await self._map(urls, 'expanded' if expanded else 'collapsed', sink, output_dir, lease_owner,
+                               job_weight)
+
+    async def convert_urls_to_pdfs_both(self, urls: List[str], sink=None, output_dir: Optional[str] = None,
+                                        lease_owner: Optional[str] = None,
+                                        job_weight: float = 1.0) -> Tuple[List[Dict], List[Dict]]:
+        items = await self._map(urls, 'both', sink, output_dir, lease_owner, job_weight)
+        return [item['collapsed'] for item in items], [item['expanded'] for item in items]
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, 'workers': self.workers, 'min_urls': self.min_urls,
+                'running': self._executor is not None}
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+
+# ======================= Prozessweite Farm =======================
+
+_render_farm: Optional[RenderFarm] = None
+
+
+def get_render_farm() -> RenderFarm:
+    """Gibt die prozessweite Render-Farm zurück (Worker werden erst bei Bedarf gestartet)."""
+    global _render_farm
+    if _render_farm is None:
+        _render_farm = RenderFarm()
+    return _render_farm
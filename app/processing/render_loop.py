@@ -0,0 +1,57 @@
+# app/processing/render_loop.py
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Coroutine, Any
+
+from config import logger
+
+
+class RenderLoop:
+    """
+    Prozessweiter Event-Loop in einem eigenen Daemon-Thread.
+
+    Playwright-Objekte sind an den Event-Loop gebunden, in dem sie erzeugt wurden.
+    Damit sich alle PDF-Jobs (die jeweils in einem eigenen Thread laufen) einen
+    Browser-Pool teilen können, laufen sämtliche Render-Coroutinen auf diesem Loop.
+    """
+
+    def __init__(self, name: str = 'render-loop'):
+        self.name = name
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Gibt den laufenden Loop zurück und startet ihn bei Bedarf."""
+        with self._lock:
+            if self._loop is None or not self._thread.is_alive():
+                ready = threading.Event()
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._run, args=(self._loop, ready), name=self.name, daemon=True
+                )
+                self._thread.start()
+                ready.wait()
+                logger.info(f"Render-Loop gestartet ({self.name}).")
+            return self._loop
+
+    @staticmethod
+    def _run(loop: asyncio.AbstractEventLoop, ready: threading.Event):
+        asyncio.set_event_loop(loop)
+        loop.call_soon(ready.set)
+        loop.run_forever()
+
+    def submit(self, coro: Coroutine) -> Future:
+        """Plant eine Coroutine auf dem Render-Loop ein und gibt ein concurrent.futures.Future zurück."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine) -> Any:
+        """Führt eine Coroutine auf dem Render-Loop aus und blockiert bis zum Ergebnis."""
+        return self.submit(coro).result()
+
+
+# Gemeinsamer Render-Loop für den gesamten Prozess
+render_loop = RenderLoop()
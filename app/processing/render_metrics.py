@@ -0,0 +1,177 @@
+# app/processing/render_metrics.py
+
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterable, List, Optional
+
+from playwright.async_api import Page
+
+from config import logger
+
+# Reihenfolge der Phasen in Auswertungen
+PHASES = ('context_setup', 'cache_lookup', 'goto', 'readiness', 'fingerprint', 'cleanup', 'scroll', 'pdf', 'total')
+# Zähler pro Seite, die zusätzlich zu den Phasen ausgewertet werden
+COUNTERS = ('requests', 'failed_requests', 'bytes_transferred', 'pdf_bytes', 'optimized_pdf_bytes')
+PERCENTILES = (50, 90, 99)
+
+
+class PhaseTimer:
+    """Misst die Dauer einzelner Render-Phasen in Millisekunden (mehrfache Phasen werden addiert)."""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - t0) * 1000)
+
+    def add(self, name: str, ms: float):
+        self.phases[name] = self.phases.get(name, 0.0) + ms
+
+    def fork(self) -> 'PhaseTimer':
+        """Kopie mit gleichem Startzeitpunkt, z.B. für zwei Ausgaben nach einem gemeinsamen Seitenaufruf."""
+        forked = PhaseTimer()
+        forked.phases = dict(self.phases)
+        forked._started = self._started
+        return forked
+
+    def as_dict(self) -> Dict[str, float]:
+        phases = {name: round(ms, 1) for name, ms in self.phases.items()}
+        phases['total'] = round((time.perf_counter() - self._started) * 1000, 1)
+        return phases
+
+
+class NetworkMeter:
+    """
+    Zählt Requests und übertragene Bytes einer Seite über die Network-Domain des
+    Chrome DevTools Protocol (encodedDataLength = tatsächlich übertragene Bytes).
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.failed_requests = 0
+        self.bytes_transferred = 0
+        self._session = None
+
+    async def start(self, page: Page):
+        try:
+            self._session = await page.context.new_cdp_session(page)
+            self._session.on('Network.requestWillBeSent', self._on_request)
+            self._session.on('Network.loadingFinished', self._on_finished)
+            self._session.on('Network.loadingFailed', self._on_failed)
+            await self._session.send('Network.enable')
+        except Exception as e:
+            logger.debug(f"Netzwerkmessung nicht verfügbar: {e}")
+            self._session = None
+
+    def _on_request(self, params: Dict):
+        self.requests += 1
+
+    def _on_finished(self, params: Dict):
+        self.bytes_transferred += int(params.get('encodedDataLength') or 0)
+
+    def _on_failed(self, params: Dict):
+        self.failed_requests += 1
+
+    async def stop(self):
+        if self._session is None:
+            return
+        try:
+            await self._session.detach()
+        except Exception:
+            pass
+        self._session = None
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            'requests': self.requests,
+            'failed_requests': self.failed_requests,
+            'bytes_transferred': self.bytes_transferred,
+        }
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Perzentil nach Nearest-Rank auf einer sortierten Liste."""
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, math.ceil(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+def summarize(samples: Iterable[Dict]) -> Dict:
+    """Verdichtet die Metriken mehrerer Seiten zu Perzentilen je Phase und Zähler."""
+    series: Dict[str, List[float]] = {}
+    for sample in samples:
+        for name, value in sample.get('phases', {}).items():
+            series.setdefault(name, []).append(value)
+        for name in COUNTERS:
+            if sample.get(name) is not None:
+                series.setdefault(name, []).append(sample[name])
+
+    summary = {}
+    for name in sorted(series, key=lambda n: (PHASES + COUNTERS).index(n) if n in PHASES + COUNTERS else 99):
+        values = sorted(series[name])
+        summary[name] = {
+            'count': len(values),
+            'mean': round(sum(values) / len(values), 1),
+            **{f"p{pct}": round(percentile(values, pct), 1) for pct in PERCENTILES},
+            'max': round(values[-1], 1),
+        }
+    return summary
+
+
+def collect_page_metrics(results: Iterable[Dict], mode: str) -> List[Dict]:
+    """Holt die Metriken erfolgreicher Renders aus den Ergebnissen eines Jobs."""
+    return [
+        {'url': result['url'], 'mode': mode, 'cache': result.get('cache'), **result['metrics']}
+        for result in results
+        if result.get('status') == 'success' and result.get('metrics')
+    ]
+
+
+class RenderMetricsRegistry:
+    """Prozessweiter Ringpuffer der letzten Seitenmetriken für jobübergreifende Perzentile."""
+
+    def __init__(self, max_samples: int = 2000):
+        self._samples: Deque[Dict] = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+        self.pages_recorded = 0
+
+    def record(self, page_metrics: Iterable[Dict]):
+        with self._lock:
+            for sample in page_metrics:
+                self._samples.append(sample)
+                self.pages_recorded += 1
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            samples = list(self._samples)
+        # Cache-Treffer und zusammengefasste Renders verzerren die Laufzeiten, daher getrennt auswerten
+        rendered = [s for s in samples if s.get('cache') not in ('hit', 'coalesced')]
+        return {
+            'pages_recorded': self.pages_recorded,
+            'window': len(samples),
+            'rendered': summarize(rendered),
+            'cache_hits': len(samples) - len(rendered),
+        }
+
+
+# ======================= Prozessweite Registry =======================
+
+_metrics_registry: Optional[RenderMetricsRegistry] = None
+
+
+def get_metrics_registry() -> RenderMetricsRegistry:
+    """Gibt die prozessweite Metrik-Registry zurück."""
+    global _metrics_registry
+    if _metrics_registry is None:
+        _metrics_registry = RenderMetricsRegistry()
+    return _metrics_registry
@@ -0,0 +1,252 @@
+# app/processing/render_scheduler.py
+
+import asyncio
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Deque, Dict, Optional
+
+from app.processing.adaptive_concurrency import AdaptiveConcurrencyLimiter, get_render_limiter
+from config import logger, RENDER_SMALL_JOB_MAX_URLS
+
+
+class JobState:
+    """Warteschlange und Zähler eines Jobs im Scheduler."""
+
+    def __init__(self, job_id: str, url_count: int, max_active: int, weight: float, interactive: bool, seq: int):
+        self.job_id = job_id
+        self.url_count = url_count
+        self.max_active = max(1, max_active)
+        self.weight = max(0.1, weight)
+        self.interactive = interactive
+        self.seq = seq
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.active = 0
+        self.completed = 0
+        self.current_weight = 0.0
+        self.registered_at = time.monotonic()
+        self.first_slot_at: Optional[float] = None
+
+
+class SlotLease:
+    """
+    Vom Scheduler zugeteilter Slot. Der Halter setzt rendered=True, wenn im Slot tatsächlich
+    gerendert wurde; nur dann fließt die Dauer in die Latenzmessung des Limiters ein.
+    """
+
+    __slots__ = ('rendered',)
+
+    def __init__(self):
+        self.rendered = False
+
+
+class RenderScheduler:
+    """
+    Globaler, fairer Scheduler für Render-Slots über alle PDF-Jobs.
+
+    Die Gesamtzahl gleichzeitiger Renders begrenzt der adaptive Limiter (globale Obergrenze).
+    Wird ein Slot frei, wählt der Scheduler den nächsten Job per gewichtetem Round-Robin
+    (Smooth Weighted Round-Robin) statt nach Ankunftsreihenfolge. Kleine, interaktive Jobs
+    (bis RENDER_SMALL_JOB_MAX_URLS URLs) werden vor Batch-Jobs bedient. Zusätzlich hat jeder
+    Job eine eigene Obergrenze (max_active).
+    """
+
+    def __init__(self, limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+                 small_job_max_urls: int = RENDER_SMALL_JOB_MAX_URLS):
+        self.limiter = limiter or get_render_limiter()
+        self.small_job_max_urls = small_job_max_urls
+        self._jobs: Dict[str, JobState] = {}
+        self._jobs_lock = threading.Lock()  # Status-Abfragen kommen aus Flask-Threads
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._bulk_lock: Optional[asyncio.Lock] = None
+        self.stats = {'jobs': 0, 'slots_granted': 0, 'interactive_slots': 0}
+
+    # ----------------------- Jobs -----------------------
+
+    @asynccontextmanager
+    async def job(self, job_id: str, url_count: int, max_active: int, weight: float = 1.0):
+        """Meldet einen Job für die Dauer des Blocks beim Scheduler an."""
+        state = self._register(job_id, url_count, max_active, weight)
+        try:
+            yield state
+        finally:
+            with self._jobs_lock:
+                self._jobs.pop(state.job_id, None)
+            self._wake()
+
+    def _register(self, job_id: str, url_count: int, max_active: int, weight: float) -> JobState:
+        self._ensure_dispatcher()
+        interactive = 0 < url_count <= self.small_job_max_urls
+        with self._jobs_lock:
+            key = job_id
+            while key in self._jobs:
+                key = f"{job_id}#{next(self._seq)}"
+            state = JobState(key, url_count, max_active, weight, interactive, next(self._seq))
+            self._jobs[key] = state
+        self.stats['jobs'] += 1
+        logger.debug(f"Job {key} im Render-Scheduler angemeldet ({url_count} URLs, interaktiv: {interactive}).")
+        return state
+
+    # ----------------------- Slots -----------------------
+
+    @asynccontextmanager
+    async def slot(self, job: JobState):
+        """Belegt einen Render-Slot für den Job, sobald der Scheduler ihn zuteilt. Liefert einen SlotLease."""
+        await self._acquire(job)
+        lease = SlotLease()
+        started = time.monotonic()
+        try:
+            yield lease
+        finally:
+            job.active -= 1
+            job.completed += 1
+            self.limiter.release(time.monotonic() - started if lease.rendered else None)
+            self._wake()
+
+    @asynccontextmanager
+    async def slots(self, job: JobState, count: int, urls: Optional[int] = None):
+        """
+        Belegt count Slots auf einmal, z.B. für ein Render-Farm-Teilstück, das im Worker count Seiten
+        gleichzeitig rendert. Die Slots werden nacheinander unter einer gemeinsamen Sperre belegt,
+        damit sich zwei Teilstücke nicht mit jeweils halb belegten Slots gegenseitig blockieren.
+        urls ist die Zahl der danach fertigen URLs (für den Fortschritt), standardmäßig count.
+        """
+        if self._bulk_lock is None:
+            self._bulk_lock = asyncio.Lock()
+        async with AsyncExitStack() as stack:
+            async with self._bulk_lock:
+                for _ in range(count):
+                    await stack.enter_async_context(self.slot(job))
+            yield
+        job.completed += max(0, (urls if urls is not None else count) - count)
+
+    async def _acquire(self, job: JobState):
+        future = asyncio.get_running_loop().create_future()
+        job.waiters.append(future)
+        self._wake()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future in job.waiters:
+                job.waiters.remove(future)
+            elif future.done() and not future.cancelled():
+                # Slot wurde bereits zugeteilt, aber nicht mehr gebraucht
+                job.active -= 1
+                self.limiter.release()
+                self._wake()
+            raise
+
+    def _wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _ensure_dispatcher(self):
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch_loop())
+
+    def _pick(self) -> Optional[JobState]:
+        """Wählt den nächsten Job: erst interaktive Jobs, innerhalb der Stufe Smooth Weighted Round-Robin."""
+        eligible = [job for job in self._jobs.values() if job.waiters and job.active < job.max_active]
+        if not eligible:
+            return None
+        candidates = [job for job in eligible if job.interactive] or eligible
+        total_weight = sum(job.weight for job in candidates)
+        for job in candidates:
+            job.current_weight += job.weight
+        chosen = max(candidates, key=lambda job: (job.current_weight, -job.seq))
+        chosen.current_weight -= total_weight
+        return chosen
+
+    def _has_eligible(self) -> bool:
+        return any(job.waiters and job.active < job.max_active for job in self._jobs.values())
+
+    async def _dispatch_loop(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                while self._has_eligible():
+                    # Erst globale Kapazität abwarten, dann den zu diesem Zeitpunkt besten Job wählen
+                    await self.limiter.acquire()
+                    job = self._pick()
+                    if job is None:
+                        self.limiter.release()
+                        break
+                    # Abgebrochene Wartende überspringen, sonst bleiben Limiter-Slot und job.active belegt
+                    future = job.waiters.popleft()
+                    while future.done() and job.waiters:
+                        future = job.waiters.popleft()
+                    if future.done():
+                        self.limiter.release()
+                        continue
+                    job.active += 1
+                    if job.first_slot_at is None:
+                        job.first_slot_at = time.monotonic()
+                    self.stats['slots_granted'] += 1
+                    if job.interactive:
+                        self.stats['interactive_slots'] += 1
+                    future.set_result(None)
+            except Exception as e:
+                logger.error(f"Fehler im Render-Scheduler: {e}")
+
+    # ----------------------- Status -----------------------
+
+    def get_job_status(self, job_id: str) -> Optional[Dict]:
+        """
+        Status eines Jobs für die Statusseite: Position unter den Jobs mit wartenden Seiten
+        (interaktive zuerst, dann nach Anmeldung), Fortschritt und laufende Renders.
+        """
+        with self._jobs_lock:
+            jobs = list(self._jobs.values())
+        job = next((j for j in jobs if j.job_id == job_id), None)
+        if job is None:
+            return None
+        waiting = sorted((j for j in jobs if j.waiters), key=lambda j: (not j.interactive, j.seq))
+        position = next((i + 1 for i, j in enumerate(waiting) if j is job), 0)
+        return {
+            'queue_position': position,
+            'jobs_waiting': len(waiting),
+            'jobs_running': len(jobs),
+            'interactive': job.interactive,
+            'active_renders': job.active,
+            'waiting_urls': len(job.waiters),
+            'completed_urls': job.completed,
+            'total_urls': job.url_count,
+        }
+
+    def get_stats(self) -> Dict:
+        with self._jobs_lock:
+            jobs = list(self._jobs.values())
+        return {
+            **self.stats,
+            'jobs_registered': len(jobs),
+            'global_limit': self.limiter.limit,
+            'jobs': [
+                {
+                    'job_id': job.job_id, 'interactive': job.interactive, 'weight': job.weight,
+                    'active': job.active, 'waiting': len(job.waiters),
+                    'completed': job.completed, 'total': job.url_count,
+                    'wait_for_first_slot_seconds': round(job.first_slot_at - job.registered_at, 2)
+                    if job.first_slot_at else None,
+                }
+                for job in jobs
+            ],
+        }
+
+
+# ======================= Prozessweiter Scheduler =======================
+
+_render_scheduler: Optional[RenderScheduler] = None
+
+
+def get_render_scheduler() -> RenderScheduler:
+    """Gibt den prozessweiten Scheduler zurück, über den alle Jobs ihre Render-Slots beziehen."""
+    global _render_scheduler
+    if _render_scheduler is None:
+        _render_scheduler = RenderScheduler()
+    return _render_scheduler
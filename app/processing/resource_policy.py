@@ -0,0 +1,249 @@
+# app/processing/resource_policy.py
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+from playwright.async_api import Page, Route, Request
+
+from config import logger, RESOURCE_POLICY_JSON_PATH, HTTP_CACHE_DIR
+
+# Header, die nach dem Dekodieren des Bodys nicht mehr stimmen
+_DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+
+
+class HttpCache:
+    """
+    Einfacher, prozessübergreifend nutzbarer Disk-Cache für statische Assets.
+    Pro URL werden Body und Metadaten (Status, Header, Ablaufzeit) als Dateien abgelegt.
+    Überschreitet der Cache max_total_bytes, werden die ältesten Einträge entfernt.
+    """
+
+    def __init__(self, cache_dir: Path, default_ttl: int, max_entry_bytes: int, max_total_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.default_ttl = default_ttl
+        self.max_entry_bytes = max_entry_bytes
+        self.max_total_bytes = max_total_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None  # Wird beim ersten Schreiben ermittelt
+
+    def _paths(self, url: str):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return self.cache_dir / f"{key}.body", self.cache_dir / f"{key}.json"
+
+    def get(self, url: str) -> Optional[Dict]:
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('expires', 0) < time.time():
+                return None
+            with open(body_path, 'rb') as f:
+                body = f.read()
+            os.utime(meta_path)  # Für die LRU-Verdrängung als kürzlich genutzt markieren
+            return {'status': meta['status'], 'headers': meta['headers'], 'body': body}
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def ttl_for(self, headers: Dict[str, str]) -> Optional[int]:
+        """
+        Ermittelt die Cache-Dauer aus Cache-Control. None bedeutet: nicht cachen.
+        Revalidierung beherrscht der Cache nicht, daher werden no-cache und must-revalidate ohne
+        Lebensdauer nicht gecacht. Der Schlüssel ist nur die URL: Antworten mit Vary (außer
+        Accept-Encoding, der Body wird dekodiert abgelegt) werden ebenfalls nicht gecacht.
+        """
+        vary = {field.strip().lower() for field in headers.get('vary', '').split(',') if field.strip()}
+        if vary - {'accept-encoding'}:
+            return None
+        cache_control = headers.get('cache-control', '').lower()
+        directives = {directive.split('=', 1)[0].strip() for directive in cache_control.split(',')}
+        if directives & {'no-store', 'private', 'no-cache'}:
+            return None
+        match = re.search(r'(?:^|[,\s])max-age\s*=\s*"?(\d+)', cache_control)
+        if match:
+            max_age = int(match.group(1))
+            return max_age if max_age > 0 else None
+        if directives & {'must-revalidate', 'proxy-revalidate'}:
+            return None
+        return self.default_ttl
+
+    def put(self, url: str, status: int, headers: Dict[str, str], body: bytes):
+        ttl = self.ttl_for(headers)
+        if ttl is None or len(body) > self.max_entry_bytes:
+            return
+        body_path, meta_path = self._paths(url)
+        meta = {
+            'url': url,
+            'status': status,
+            'headers': {k: v for k, v in headers.items() if k.lower() not in _DROPPED_HEADERS},
+            'expires': time.time() + ttl,
+        }
+        try:
+            tmp_body = body_path.with_suffix('.body.tmp')
+            with open(tmp_body, 'wb') as f:
+                f.write(body)
+            # Ein überschriebener Eintrag zählt nur mit der Größendifferenz
+            try:
+                previous_size = body_path.stat().st_size
+            except FileNotFoundError:
+                previous_size = 0
+            os.replace(tmp_body, body_path)
+            tmp_meta = meta_path.with_suffix('.json.tmp')
+            with open(tmp_meta, 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            os.replace(tmp_meta, meta_path)
+        except OSError as e:
+            logger.debug(f"HTTP-Cache-Eintrag für {url} konnte nicht geschrieben werden: {e}")
+            return
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            else:
+                self._total_bytes += len(body) - previous_size
+            if self._total_bytes > self.max_total_bytes:
+                self._evict()
+
+    def _scan_size(self) -> int:
+        return sum(p.stat().st_size for p in self.cache_dir.glob('*.body'))
+
+    def _evict(self):
+        """Entfernt die am längsten nicht genutzten Einträge, bis 80 % des Limits erreicht sind."""
+        entries = []
+        for meta_path in self.cache_dir.glob('*.json'):
+            body_path = meta_path.with_suffix('.body')
+            try:
+                entries.append((meta_path.stat().st_mtime, meta_path, body_path, body_path.stat().st_size))
+            except FileNotFoundError:
+                continue
+        entries.sort()
+        target = self.max_total_bytes * 0.8
+        total = sum(entry[3] for entry in entries)
+        for _, meta_path, body_path, size in entries:
+            if total <= target:
+                break
+            for path in (meta_path, body_path):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+            total -= size
+        self._total_bytes = total
+        logger.debug(f"HTTP-Cache bereinigt, neue Größe: {total / (1024 ** 2):.1f} MB")
+
+
+class ResourcePolicy:
+    """
+    Request-Interception für das Rendern: blockiert Ressourcentypen und Domains
+    (Werbung, Analytics, Videos, Tracking-Iframes) und bedient statische Assets
+    aus einem gemeinsamen Disk-Cache, der über alle Kontexte und Jobs geteilt wird.
+    """
+
+    def __init__(
+        self,
+        block_resource_types: Iterable[str] = (),
+        block_domains: Iterable[str] = (),
+        cache_resource_types: Iterable[str] = (),
+        cache: Optional[HttpCache] = None,
+    ):
+        self.block_resource_types = set(block_resource_types)
+        self.block_domains = tuple(domain.lower().lstrip('.') for domain in block_domains)
+        self.cache_resource_types = set(cache_resource_types)
+        self.cache = cache
+        self.stats = {
+            'blocked_requests': 0,
+            'cache_hits': 0,
+            'cache_misses': 0,
+            'bytes_from_cache': 0,
+        }
+
+    @classmethod
+    def from_config(cls, path: Path = RESOURCE_POLICY_JSON_PATH) -> 'ResourcePolicy':
+        """Lädt die Policy aus dem Config-Verzeichnis. Fehlt die Datei, wird nichts blockiert."""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            logger.info(f"Loaded resource policy from {path}")
+        except Exception as e:
+            logger.error(f"Failed to load resource policy: {e}")
+            config = {}
+
+        cache = None
+        if config.get('cache_resource_types'):
+            cache = HttpCache(
+                HTTP_CACHE_DIR,
+                default_ttl=int(config.get('cache_default_ttl_seconds', 86400)),
+                max_entry_bytes=int(config.get('cache_max_entry_mb', 10) * 1024 ** 2),
+                max_total_bytes=int(config.get('cache_max_total_mb', 512) * 1024 ** 2),
+            )
+        return cls(
+            block_resource_types=config.get('block_resource_types', []),
+            block_domains=config.get('block_domains', []),
+            cache_resource_types=config.get('cache_resource_types', []),
+            cache=cache,
+        )
+
+    def is_blocked(self, url: str, resource_type: str) -> bool:
+        if resource_type in self.block_resource_types:
+            return True
+        host = (urlparse(url).hostname or '').lower()
+        return any(host == domain or host.endswith('.' + domain) for domain in self.block_domains)
+
+    async def install(self, page: Page):
+        """Registriert die Policy als Route-Handler auf der Seite."""
+        await page.route('**/*', self._handle_route)
+
+    async def _handle_route(self, route: Route, request: Request):
+        try:
+            if self.is_blocked(request.url, request.resource_type):
+                self.stats['blocked_requests'] += 1
+                await route.abort('blockedbyclient')
+                return
+
+            if self.cache and request.method == 'GET' and request.resource_type in self.cache_resource_types:
+                cached = await asyncio.to_thread(self.cache.get, request.url)
+                if cached:
+                    self.stats['cache_hits'] += 1
+                    self.stats['bytes_from_cache'] += len(cached['body'])
+                    await route.fulfill(status=cached['status'], headers=cached['headers'], body=cached['body'])
+                    return
+
+                self.stats['cache_misses'] += 1
+                response = await route.fetch()
+                body = await response.body()
+                if response.status == 200:
+                    await asyncio.to_thread(self.cache.put, request.url, response.status, response.headers, body)
+                await route.fulfill(response=response, body=body)
+                return
+
+            await route.continue_()
+        except Exception as e:
+            # Seite wurde z.B. bereits geschlossen; Request ohne Policy weiterlaufen lassen
+            logger.debug(f"Route-Handler-Fehler für {request.url}: {e}")
+            try:
+                await route.continue_()
+            except Exception:
+                pass
+
+    def get_stats(self) -> Dict:
+        return dict(self.stats)
+
+
+# ======================= Prozessweite Policy =======================
+
+_resource_policy: Optional[ResourcePolicy] = None
+
+
+def get_resource_policy() -> ResourcePolicy:
+    """Gibt die prozessweite Resource-Policy zurück (teilt sich den Disk-Cache über alle Jobs)."""
+    global _resource_policy
+    if _resource_policy is None:
+        _resource_policy = ResourcePolicy.from_config()
+    return _resource_policy
@@ -0,0 +1,173 @@
+# app/processing/snapshot_store.py
+
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from playwright.async_api import Page, Route, Request
+
+from app.processing.render_cache import normalize_url
+from config import logger, SNAPSHOT_DIR, SNAPSHOT_MAX_AGE_HOURS
+
+# Nach so vielen Schreibvorgängen werden abgelaufene Snapshots entfernt
+PRUNE_EVERY_PUTS = 200
+
+
+class SnapshotStore:
+    """
+    Inhaltsadressierter Speicher für das beim Crawlen geladene HTML.
+
+    Die Dokumente liegen gzip-komprimiert unter ihrem SHA-256 (blobs/ab/abcdef....html.gz), pro URL
+    verweist eine kleine Referenzdatei (refs/<hash der URL>.json) auf den Blob. Gleiches HTML
+    unter mehreren URLs wird so nur einmal gespeichert. Referenzen werden atomar ersetzt, damit
+    Crawler, Render-Loop und Render-Farm-Worker ohne gemeinsame Sperre lesen und schreiben können.
+    Beim Rendern bedient install() das Hauptdokument einer Seite aus dem Snapshot, alle übrigen
+    Requests laufen wie gewohnt über das Netz bzw. die Resource-Policy.
+    """
+
+    def __init__(self, root: Path = SNAPSHOT_DIR, max_age_hours: float = SNAPSHOT_MAX_AGE_HOURS):
+        self.root = Path(root)
+        self.blob_dir = self.root / 'blobs'
+        self.ref_dir = self.root / 'refs'
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.ref_dir.mkdir(parents=True, exist_ok=True)
+        self.max_age_seconds = max_age_hours * 3600
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.stats = {'stored': 0, 'deduplicated': 0, 'hits': 0, 'misses': 0, 'bytes_served': 0, 'pruned': 0}
+
+    def _ref_path(self, url: str) -> Path:
+        return self.ref_dir / f"{hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()}.json"
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.blob_dir / digest[:2] / f"{digest}.html.gz"
+
+    def put(self, url: str, html: str, content_type: str = 'text/html; charset=utf-8'):
+        """Legt das HTML einer URL ab (blockierend, aus async-Code über asyncio.to_thread aufrufen)."""
+        body = html.encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()
+        blob_path = self._blob_path(digest)
+        try:
+            if blob_path.exists():
+                self.stats['deduplicated'] += 1
+            else:
+                blob_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_blob = blob_path.with_name(f"{blob_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+                with open(tmp_blob, 'wb') as f:
+                    f.write(gzip.compress(body, compresslevel=6))
+                os.replace(tmp_blob, blob_path)
+            # Das HTML wurde als Text dekodiert und wird als UTF-8 ausgeliefert
+            mime = content_type.split(';', 1)[0].strip() or 'text/html'
+            ref = {
+                'url': normalize_url(url),
+                'digest': digest,
+                'content_type': f"{mime}; charset=utf-8",
+                'size': len(body),
+                'stored_at': time.time(),
+            }
+            ref_path = self._ref_path(url)
+            tmp_ref = ref_path.with_name(f"{ref_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_ref, 'w', encoding='utf-8') as f:
+                json.dump(ref, f)
+            os.replace(tmp_ref, ref_path)
+        except OSError as e:
+            logger.debug(f"Snapshot für {url} konnte nicht geschrieben werden: {e}")
+            return
+        self.stats['stored'] += 1
+        with self._lock:
+            self._puts += 1
+            prune = self._puts % PRUNE_EVERY_PUTS == 0
+        if prune:
+            self.prune()
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Liefert {body, content_type, age_seconds} oder None, falls kein frischer Snapshot existiert."""
+        try:
+            with open(self._ref_path(url), 'r', encoding='utf-8') as f:
+                ref = json.load(f)
+            age = time.time() - ref['stored_at']
+            if age > self.max_age_seconds:
+                return None
+            with open(self._blob_path(ref['digest']), 'rb') as f:
+                body = gzip.decompress(f.read())
+        except (OSError, ValueError, KeyError):
+            return None
+        return {'body': body, 'content_type': ref['content_type'], 'age_seconds': age}
+
+    def prune(self):
+        """Entfernt abgelaufene Referenzen und Blobs, auf die keine Referenz mehr zeigt."""
+        now = time.time()
+        referenced = set()
+        for ref_path in self.ref_dir.glob('*.json'):
+            try:
+                with open(ref_path, 'r', encoding='utf-8') as f:
+                    ref = json.load(f)
+                if now - ref['stored_at'] > self.max_age_seconds:
+                    ref_path.unlink()
+                    continue
+                referenced.add(ref['digest'])
+            except (OSError, ValueError, KeyError):
+                continue
+        removed = 0
+        for blob_path in self.blob_dir.glob('*/*.html.gz'):
+            # Frisch geschriebene Blobs, deren Referenz evtl. gerade entsteht, nicht anfassen
+            try:
+                if blob_path.name[:-len('.html.gz')] not in referenced \
+                        and now - blob_path.stat().st_mtime > 60:
+                    blob_path.unlink()
+                    removed += 1
+            except OSError:
+                continue
+        self.stats['pruned'] += removed
+        logger.debug(f"Snapshot-Speicher bereinigt: {removed} Blobs entfernt.")
+
+    async def install(self, page: Page, url: str):
+        """
+        Bedient die Navigation zu url einmalig aus dem Snapshot. Muss nach der Resource-Policy
+        registriert werden, damit dieser Handler zuerst greift; ohne Snapshot oder für andere
+        Requests wird an die Policy weitergereicht.
+        """
+        target = normalize_url(url)
+        await page.route(lambda request_url: normalize_url(request_url) == target,
+                         self._handle_document, times=1)
+
+    async def _handle_document(self, route: Route, request: Request):
+        try:
+            if request.resource_type == 'document' and request.method == 'GET' \
+                    and request.frame.parent_frame is None:
+                snapshot = await asyncio.to_thread(self.get, request.url)
+                if snapshot:
+                    self.stats['hits'] += 1
+                    self.stats['bytes_served'] += len(snapshot['body'])
+                    await route.fulfill(status=200, content_type=snapshot['content_type'], body=snapshot['body'])
+                    return
+                self.stats['misses'] += 1
+            await route.fallback()
+        except Exception as e:
+            logger.debug(f"Snapshot-Handler-Fehler für {request.url}: {e}")
+            try:
+                await route.fallback()
+            except Exception:
+                pass
+
+    def get_stats(self) -> Dict:
+        return dict(self.stats)
+
+
+# ======================= Prozessweiter Snapshot-Speicher =======================
+
+_snapshot_store: Optional[SnapshotStore] = None
+
+
+def get_snapshot_store() -> SnapshotStore:
+    """Gibt den prozessweiten Snapshot-Speicher zurück (Crawler schreibt, Renderer liest)."""
+    global _snapshot_store
+    if _snapshot_store is None:
+        _snapshot_store = SnapshotStore()
+    return _snapshot_store
@@ -2,40 +2,71 @@ from playwright.async_api import Page
 
 from config import logger
 
+# Elemente, die in beiden Modi entfernt werden
+UNWANTED_SELECTORS = [
+    'script',
+    'noscript',
+    'style',
+    'iframe',
+    'footer',
+    'div.ads',
+    # Add more unwanted elements
+]
+
+# Zusätzliche Elemente für den expanded Modus
+EXPANDED_UNWANTED_SELECTORS = [
+    # Removed 'header' from here
+    'nav',
+    '.sidebar',
+    '#navigation',
+    '.mdl-anchornav',
+    '#header',
+    '.mdl-header',
+    '#toc',
+    '.mdl-footer',
+    '#footer',
+    # Add more selectors specific for Navbar and Sidebar
+]
+
+# Entfernt alle Elemente zu einer Liste von Selektoren in einem einzigen Aufruf
+REMOVE_SELECTORS_JS = """
+    (selectors) => {
+        selectors.forEach(selector => {
+            document.querySelectorAll(selector).forEach(el => el.remove());
+        });
+    }
+"""
+
+# Versteckt Navigation und Sidebars, lässt den Header aber stehen
+HIDE_NAVIGATION_JS = """
+    () => {
+        // Remove navigation bars (excluding header)
+        const navs = document.querySelectorAll('nav');
+        navs.forEach(nav => {
+            nav.style.display = 'none';
+        });
+
+        // Remove all sidebars with the class 'mdl-anchornav' or similar classes
+        const sidebars = document.querySelectorAll('div.mdl-anchornav, aside.sidebar, .sidebar');
+        sidebars.forEach(sidebar => {
+            sidebar.style.display = 'none';
+        });
+    }
+"""
+
+
+def get_unwanted_selectors(expanded: bool = False):
+    """Gibt die Selektoren der zu entfernenden Elemente für den jeweiligen Modus zurück."""
+    if expanded:
+        return UNWANTED_SELECTORS + EXPANDED_UNWANTED_SELECTORS
+    return list(UNWANTED_SELECTORS)
+
 
 async def remove_unwanted_elements(page: Page, expanded: bool = False):
     """Removes unwanted elements from the page."""
     try:
-        selectors = [
-            'script',
-            'noscript',
-            'style',
-            'iframe',
-            'footer',
-            'div.ads',
-            # Add more unwanted elements
-        ]
-
-        if expanded:
-            selectors.extend([
-                # Removed 'header' from here
-                'nav',
-                '.sidebar',
-                '#navigation',
-                '.mdl-anchornav',
-                '#header',
-                '.mdl-header',
-                '#toc',
-                '.mdl-footer',
-                '#footer',
-                # Add more selectors specific for Navbar and Sidebar
-            ])
-
-        for selector in selectors:
-            await page.evaluate(f'''
-                const elements = document.querySelectorAll('{selector}');
-                elements.forEach(el => el.remove());
-            ''')
+        selectors = get_unwanted_selectors(expanded)
+        await page.evaluate(REMOVE_SELECTORS_JS, selectors)
         logger.debug(f"Removed unwanted elements: {selectors}")
     except Exception as e:
         logger.error(f"Error removing unwanted elements: {e}")
@@ -49,19 +80,7 @@ async def remove_navigation_and_sidebars(page: Page):
     """
     logger.info("Removing the navigation bar and sidebars.")
     try:
-        await page.evaluate("""
-            // Remove navigation bars (excluding header)
-            const navs = document.querySelectorAll('nav');
-            navs.forEach(nav => {
-                nav.style.display = 'none';
-            });
-
-            // Remove all sidebars with the class 'mdl-anchornav' or similar classes
-            const sidebars = document.querySelectorAll('div.mdl-anchornav, aside.sidebar, .sidebar');
-            sidebars.forEach(sidebar => {
-                sidebar.style.display = 'none';
-            });
-        """)
+        await page.evaluate(HIDE_NAVIGATION_JS)
         logger.debug("Navigation bar and sidebars successfully removed.")
     except Exception as e:
         logger.error(f"Error removing navigation bar and sidebars: {e}")
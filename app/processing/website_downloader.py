@@ -2,24 +2,32 @@
 
 import os
 import asyncio
+import hashlib
 import logging
 import json  # Hinzugefügt
-from typing import List, Dict
-from playwright.async_api import async_playwright, Page
-from pypdf import PdfReader, PdfWriter
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from io import BytesIO
+from typing import List, Dict, Optional, Tuple
+from playwright.async_api import Page, TimeoutError as PlaywrightTimeoutError
 import shutil
+import uuid
 
 from app.create_package.create_zipfile import create_zip_archive
-from app.processing.website_cleaner import remove_unwanted_elements, remove_fixed_elements, \
-    remove_navigation_and_sidebars
-from app.processing.website_handler import expand_hidden_elements, scroll_page
-from app.processing.website_utils import load_js_file, extract_domain, setup_directories, inject_custom_css
+from app.processing.render_scheduler import RenderScheduler, get_render_scheduler
+from app.processing.pdf_merge import merge_pdfs_with_bookmarks
+from app.processing.browser_pool import BrowserPool, get_browser_pool
+from app.processing.circuit_breaker import HostCircuitBreaker, get_circuit_breaker
+from app.processing.context_pool import CONTEXT_OPTIONS
+from app.processing.render_cache import RenderCache, get_render_cache, hash_settings, link_or_copy, normalize_url
+from app.processing.render_metrics import PhaseTimer, NetworkMeter
+from app.processing.resource_policy import ResourcePolicy, get_resource_policy
+from app.processing.snapshot_store import SnapshotStore, get_snapshot_store
+from app.processing.cleanup_script import compile_cleanup_script
+from app.processing.website_handler import scroll_page, wait_for_page_ready, READINESS_OPTIONS
+from app.processing.website_utils import load_js_file, extract_domain, setup_directories
 from app.utils.naming_utils import sanitize_filename
 
-from config import ELEMENTS_COLLAPSED_CONFIG, ELEMENTS_EXPANDED_CONFIG
+from config import ELEMENTS_COLLAPSED_CONFIG, ELEMENTS_EXPANDED_CONFIG, RENDER_CACHE_ENABLED, SNAPSHOT_STORE_ENABLED, \
+    RENDER_NAVIGATION_TIMEOUT_MS, RENDER_SETTLE_TIMEOUT_MS, RENDER_PRINT_TIMEOUT_MS, RENDER_RETRY_TIMEOUT_FACTOR, \
+    RENDER_CACHE_VALIDATOR_TIMEOUT_MS
 
 # ======================= Konfiguration =======================
 
@@ -55,89 +63,96 @@ if not logger.handlers:
     logger.addHandler(ch)
     logger.addHandler(fh)
 
-# ======================= Hilfsfunktionen =======================
-
-def create_table_of_contents(toc_entries: List[Dict]) -> BytesIO:
-    """
-    Erstellt eine Inhaltsverzeichnis-Seite und gibt sie als BytesIO-Objekt zurück.
-    """
-    packet = BytesIO()
-    can = canvas.Canvas(packet, pagesize=A4)
-    width, height = A4
-    can.setFont("Helvetica-Bold", 16)
-    can.drawString(100, height - 50, "Inhaltsverzeichnis")
-    can.setFont("Helvetica", 12)
-    y_position = height - 80
-    for entry in toc_entries:
-        title = entry['title']
-        page_number = entry['page_number'] + 1  # 1-basierte Seitennummerierung
-        can.drawString(100, y_position, f"{title} ...... {page_number}")
-        y_position -= 20
-        if y_position < 50:
-            can.showPage()
-            y_position = height - 50
-    can.save()
-    packet.seek(0)
-    return packet
-
-def merge_pdfs_with_bookmarks(pdf_entries: List[Dict], output_path: str):
-    """
-    Fasst mehrere PDFs zu einem zusammen, fügt ein Inhaltsverzeichnis hinzu und setzt Lesezeichen.
-    """
-    writer = PdfWriter()
-    toc_entries = []
-    current_page = 0
-
-    # Sammle die Titel und Pfade der erfolgreichen PDFs
-    successful_pdfs = [
-        entry for entry in pdf_entries if entry['status'] == 'success'
-    ]
-
-    for entry in successful_pdfs:
-        try:
-            reader = PdfReader(entry['path'])
-            for page in reader.pages:
-                writer.add_page(page)
-            toc_entries.append({
-                'title': entry['title'],
-                'page_number': current_page
-            })
-            current_page += len(reader.pages)
-        except Exception as e:
-            logger.error(f"Fehler beim Lesen der PDF {entry['path']}: {e}")
-
-    if toc_entries:
-        # Erstelle das Inhaltsverzeichnis
-        toc_pdf = create_table_of_contents(toc_entries)
-        toc_reader = PdfReader(toc_pdf)
-        toc_page = toc_reader.pages[0]
-        writer.insert_page(toc_page, index=0)
-
-        # Füge Lesezeichen hinzu
-        for entry in toc_entries:
-            writer.add_outline_item(entry['title'], entry['page_number'] + 1)  # Inhaltsverzeichnis ist Seite 1
-
-    # Schreibe das zusammengeführte PDF
-    try:
-        with open(output_path, 'wb') as f_out:
-            writer.write(f_out)
-        logger.info(f"Alle PDFs wurden zu einem zusammengeführt: {output_path}")
-    except Exception as e:
-        logger.error(f"Fehler beim Schreiben des zusammengeführten PDFs: {e}")
-
 # ======================= PDFConverter Klasse =======================
 
+# Druckoptionen für page.pdf (fließen auch in den Render-Cache-Schlüssel ein)
+PDF_OPTIONS = {
+    'format': 'A3',
+    'print_background': True,
+    'margin': {"top": "10mm", "bottom": "10mm", "left": "10mm", "right": "10mm"},
+    'prefer_css_page_size': False,
+    'scale': 1,
+    'display_header_footer': False,
+}
+
+# Gestufte Timeouts: Navigation (bis DOMContentLoaded), Beruhigung (networkidle, nicht fatal), Drucken
+RENDER_TIMEOUTS = {
+    'navigation': RENDER_NAVIGATION_TIMEOUT_MS,
+    'settle': RENDER_SETTLE_TIMEOUT_MS,
+    'print': RENDER_PRINT_TIMEOUT_MS,
+    'validator': min(RENDER_CACHE_VALIDATOR_TIMEOUT_MS, RENDER_NAVIGATION_TIMEOUT_MS),
+}
+# Großzügigere Timeouts für den einmaligen Wiederholungsversuch am Ende eines Jobs
+# Die Wiederholung lädt das Hauptdokument live, falls der Snapshot selbst die Ursache war
+RELAXED_RENDER_TIMEOUTS = {
+    **{name: int(ms * RENDER_RETRY_TIMEOUT_FACTOR) for name, ms in RENDER_TIMEOUTS.items()},
+    'live': True,
+}
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Timeouts und Netzwerkfehler sind vorübergehend und zählen für den Circuit-Breaker."""
+    return isinstance(error, (PlaywrightTimeoutError, asyncio.TimeoutError)) or 'net::ERR_' in str(error)
+
+
+def error_result(url: str, error: Exception) -> Dict:
+    return {"url": url, "status": "error", "error": str(error) or type(error).__name__,
+            "retryable": is_retryable_error(error)}
+
+
+# Liefert einen SHA-256 über das DOM (im Browser, falls verfügbar, sonst das HTML selbst)
+DOM_FINGERPRINT_JS = """
+    async () => {
+        const html = document.documentElement.outerHTML;
+        if (window.crypto && crypto.subtle) {
+            const buffer = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(html));
+            return Array.from(new Uint8Array(buffer)).map(b => b.toString(16).padStart(2, '0')).join('');
+        }
+        return html;
+    }
+"""
+
+# Maximale Länge des lesbaren Teils der Einzel-PDF-Namen (der URL-Hash macht sie eindeutig)
+PDF_NAME_MAX_CHARS = 100
+
+# Laufende Renders im Prozess, Schlüssel (normalisierte URL, Modus, Einstellungs-Hash). Weitere
+# Anfragen für dieselbe Seite (auch aus anderen Jobs) warten auf das Ergebnis und verlinken es,
+# statt die Seite ein zweites Mal zu rendern.
+_render_flights: Dict[Tuple[str, str, str], Dict] = {}
+_flight_stats = {'led': 0, 'coalesced': 0, 'coalesce_failures': 0}
+
+
+def get_render_flight_stats() -> Dict:
+    return {**_flight_stats, 'in_flight': len(_render_flights)}
+
+
 class PDFConverter:
     """Verwaltet die Konvertierung von URLs in PDFs mit Playwright."""
 
-    def __init__(self, max_concurrent_tasks: int = 5):
+    def __init__(self, max_concurrent_tasks: int = 5, browser_pool: BrowserPool = None,
+                 resource_policy: ResourcePolicy = None, render_cache: RenderCache = None,
+                 scheduler: RenderScheduler = None, job_id: str = None, job_weight: float = 1.0,
+                 circuit_breaker: HostCircuitBreaker = None, snapshot_store: SnapshotStore = None,
+                 output_dir: str = None):
+        # Obergrenze pro Job; Slots teilt der prozessweite Scheduler fair zwischen den Jobs zu
         self.max_concurrent_tasks = max_concurrent_tasks
-        self.playwright = None
-        self.browser = None
-        self.output_dir_collapsed = os.path.join(OUTPUT_PDFS_DIR, 'individual_pdfs_collapsed')
-        self.output_dir_expanded = os.path.join(OUTPUT_PDFS_DIR, 'individual_pdfs_expanded')
-        os.makedirs(self.output_dir_collapsed, exist_ok=True)
-        os.makedirs(self.output_dir_expanded, exist_ok=True)
+        self.scheduler = scheduler or get_render_scheduler()
+        self.job_id = job_id or uuid.uuid4().hex
+        # Job, dem die verwendeten Blobs im Render-Cache zugerechnet werden (Render-Farm: der Haupt-Job)
+        self.lease_owner = self.job_id
+        self.job_weight = job_weight
+        # Hosts mit wiederholten Timeouts vorübergehend überspringen
+        self.circuit_breaker = circuit_breaker or get_circuit_breaker()
+        # Prozessweiter Pool warmer Browser, sofern kein eigener übergeben wird
+        self.browser_pool = browser_pool or get_browser_pool()
+        # Blockiert Werbung/Tracking und bedient statische Assets aus dem gemeinsamen Disk-Cache
+        self.resource_policy = resource_policy or get_resource_policy()
+        # Bereits gerenderte PDFs unveränderter Seiten wiederverwenden
+        self.render_cache = render_cache or (get_render_cache() if RENDER_CACHE_ENABLED else None)
+        # Hauptdokument aus dem beim Crawlen gespeicherten HTML bedienen (spart einen Abruf pro Seite)
+        self.snapshot_store = snapshot_store or (get_snapshot_store() if SNAPSHOT_STORE_ENABLED else None)
+        # Einzel-PDFs landen im Arbeitsverzeichnis des Jobs (ohne Angabe im gemeinsamen Ausgabeordner)
+        self.set_output_dir(output_dir or OUTPUT_PDFS_DIR)
 
         # Pfad zum externen JS-File
         self.remove_elements_js_path = os.path.join(os.path.dirname(__file__), 'js', 'remove_elements.js')
@@ -160,139 +175,601 @@ class PDFConverter:
             logger.error(f"Failed to load expanded elements configuration: {e}")
             self.elements_expanded = {"remove": []}
 
+        # Bereinigung pro Modus einmal pro Job zu je einem Skript kompilieren (ein evaluate pro Seite)
+        self.cleanup_scripts = {
+            'collapsed': compile_cleanup_script(False, self.elements_collapsed, self.remove_elements_js),
+            'expanded': compile_cleanup_script(True, self.elements_expanded, self.remove_elements_js),
+        }
+        # Änderungen an Viewport, Druckoptionen oder Bereinigung invalidieren den Render-Cache
+        self.render_settings_hashes = {
+            mode: hash_settings(CONTEXT_OPTIONS, PDF_OPTIONS, script)
+            for mode, script in self.cleanup_scripts.items()
+        }
+
     async def initialize(self):
-        """Initialisiert Playwright und startet den Browser."""
-        self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(
-            headless=True,
-            args=[
-                '--disable-dev-shm-usage',
-                '--no-sandbox',
-                '--disable-setuid-sandbox',
-                '--disable-infobars',
-                '--window-size=2560,1440',  # Größere Fenstergröße
-            ]
-        )
-        logger.info("Playwright Browser gestartet.")
+        """Stellt sicher, dass der Browser-Pool gestartet und vorgewärmt ist."""
+        await self.browser_pool.start()
+        logger.info("Browser-Pool bereit.")
 
     async def close(self):
-        """Schließt den Browser und stoppt Playwright."""
-        if self.browser:
-            await self.browser.close()
-        if self.playwright:
-            await self.playwright.stop()
-        logger.info("Playwright Browser geschlossen.")
+        """Gibt den Converter frei. Die Browser bleiben für weitere Jobs im Pool."""
+        logger.info("PDFConverter freigegeben, Browser verbleiben im Pool.")
 
     # app/processing/download.py
 
-    async def render_page(self, url: str, expanded: bool = False) -> Dict:
-        """Renders a webpage and saves it as PDF."""
-        context = None
-        page = None
+    async def render_page(self, url: str, expanded: bool = False, relaxed: bool = False) -> Dict:
+        """
+        Renders a webpage and saves it as PDF using a pooled browser context.
+        relaxed uses the longer timeouts of the final retry pass.
+        """
+        mode = 'expanded' if expanded else 'collapsed'
+        # Erst mitfahren, dann den Breaker fragen: ein Mitfahrer verbraucht keinen Probe-Versuch
+        followed = await self._follow_flights(url, [mode])
+        if followed:
+            return followed[mode]
+        rejected, probe = self._reject_if_circuit_open(url)
+        if rejected:
+            return rejected
+        flights = self._lead_flights(url, [mode])
+        timer = PhaseTimer()
+        timeouts = RELAXED_RENDER_TIMEOUTS if relaxed else RENDER_TIMEOUTS
+        result = None
         try:
-            context = await self.browser.new_context(
-                viewport={"width": 2560, "height": 1440},
-                device_scale_factor=2,
-                locale='de-DE',
-                user_agent=(
-                    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                    "AppleWebKit/537.36 (KHTML, like Gecko) "
-                    "Chrome/94.0.4606.81 Safari/537.36"
-                )
-            )
-            page = await context.new_page()
-            logger.info(f"Opening page: {url}")
-            await page.goto(url, timeout=120000, wait_until='networkidle')
-
-            # Ensure all content is loaded
-            await asyncio.sleep(2)
-
-            if expanded:
-                # Step 1: Expand hidden elements
-                await expand_hidden_elements(page)
-                # Step 2: Remove unwanted elements based on JSON config
-                await remove_unwanted_elements(page, expanded=expanded)
-
-                if self.remove_elements_js and self.elements_expanded:
-                    # Inject the remove_elements.js script
-                    await page.add_script_tag(content=self.remove_elements_js)
-                    # Wait until the script is loaded
-                    await page.wait_for_function("typeof removeElements === 'function'")
-                    # Pass the JSON config to the removeElements function
-                    await page.evaluate(f"removeElements({json.dumps(self.elements_expanded)})")
-                    logger.info("Injected external JS to remove elements in expanded mode.")
-            else:
-                await remove_fixed_elements(page)
-                # Remove navigation bar and sidebars
-                await remove_navigation_and_sidebars(page)
-                # Step 4: Inject custom CSS for normal mode
-                await inject_custom_css(page, expanded=False)
-
-                if self.remove_elements_js and self.elements_collapsed:
-                    # Inject the remove_elements.js script
-                    await page.add_script_tag(content=self.remove_elements_js)
-                    # Wait until the script is loaded
-                    await page.wait_for_function("typeof removeElements === 'function'")
-                    # Pass the JSON config to the removeElements function
-                    await page.evaluate(f"removeElements({json.dumps(self.elements_collapsed)})")
-                    logger.info("Injected external JS to remove elements in collapsed mode.")
-
-            # Optionally: Scroll to trigger lazy-loading
-            await scroll_page(page)
-
-            # Create a safe filename
-            filename = sanitize_filename(url) + '.pdf'
-
-            if expanded:
-                pdf_path = os.path.join(self.output_dir_expanded, filename)
-            else:
-                pdf_path = os.path.join(self.output_dir_collapsed, filename)
+            async with self.browser_pool.lease_page() as pooled_context:
+                timer.add('context_setup', pooled_context.setup_ms)
+                result = await self._render_on_page(pooled_context.page, url, expanded=expanded, timer=timer,
+                                                    timeouts=timeouts, validate=not (relaxed or probe))
+                if result['status'] != 'success':
+                    # Nach Fehlern (z.B. Timeouts) ist der Seitenzustand unklar, Kontext nicht wiederverwenden
+                    pooled_context.discard = True
+        except Exception as e:
+            logger.error(f"Error leasing browser context for {url}: {e}")
+            result = error_result(url, e)
+        finally:
+            self._record_host_outcome(url, [result] if result else [], probe)
+            await self._land_flights(flights, {mode: result} if result else {})
+        return result
+
+    async def render_page_both(self, url: str, relaxed: bool = False) -> Dict:
+        """
+        Renders a webpage once and saves both the collapsed and the expanded PDF.
+        Returns {"collapsed": result, "expanded": result}.
+        """
+        modes = ['collapsed', 'expanded']
+        followed = await self._follow_flights(url, modes)
+        if followed:
+            return followed
+        rejected, probe = self._reject_if_circuit_open(url)
+        if rejected:
+            return {"collapsed": rejected, "expanded": dict(rejected)}
+        flights = self._lead_flights(url, modes)
+        timer = PhaseTimer()
+        timeouts = RELAXED_RENDER_TIMEOUTS if relaxed else RENDER_TIMEOUTS
+        results = {}
+        try:
+            async with self.browser_pool.lease_page() as pooled_context:
+                timer.add('context_setup', pooled_context.setup_ms)
+                results = await self._render_both_on_page(pooled_context.page, url, timer=timer, timeouts=timeouts,
+                                                          validate=not (relaxed or probe))
+                if any(result['status'] != 'success' for result in results.values()):
+                    pooled_context.discard = True
+        except Exception as e:
+            logger.error(f"Error leasing browser context for {url}: {e}")
+            error = error_result(url, e)
+            results = {"collapsed": error, "expanded": dict(error)}
+        finally:
+            self._record_host_outcome(url, list(results.values()), probe)
+            await self._land_flights(flights, results)
+        return results
+
+    # ----------------------- Zusammenfassen gleicher Renders -----------------------
+
+    def _flight_key(self, url: str, mode: str) -> Tuple[str, str, str]:
+        return normalize_url(url), mode, self.render_settings_hashes[mode]
+
+    async def _follow_flights(self, url: str, modes: List[str]) -> Optional[Dict[str, Dict]]:
+        """
+        Wird die Seite in allen gewünschten Modi gerade gerendert, wartet diese Anfrage auf das
+        Ergebnis und erhält einen Hardlink in ihr eigenes Verzeichnis. Gibt None zurück, wenn
+        selbst gerendert werden muss (kein laufender Render oder der Render ist gescheitert).
+        """
+        flights = [_render_flights.get(self._flight_key(url, mode)) for mode in modes]
+        if not all(flights):
+            return None
+        targets = {mode: self._pdf_path(url, mode == 'expanded') for mode in modes}
+        for mode, flight in zip(modes, flights):
+            flight['followers'].append((targets[mode], self.lease_owner))
+        timer = PhaseTimer()
+        with timer.phase('coalesce'):
+            shared = await asyncio.gather(*(asyncio.shield(flight['future']) for flight in flights))
+        results = {}
+        for mode, result in zip(modes, shared):
+            if not result or result.get('status') != 'success' or targets[mode] not in result.get('linked', ()):
+                _flight_stats['coalesce_failures'] += 1
+                return None
+            # Metriken der eigenen Wartezeit, nicht die des fremden Renders
+            results[mode] = {**{k: v for k, v in result.items() if k not in ('linked', 'metrics')},
+                             'path': targets[mode], 'cache': 'coalesced',
+                             'metrics': self._page_metrics(timer, pdf_path=targets[mode])}
+        _flight_stats['coalesced'] += 1
+        logger.info(f"Render von {url} mit laufender Anfrage zusammengefasst.")
+        return results
+
+    def _lead_flights(self, url: str, modes: List[str]) -> Dict[str, Dict]:
+        """Meldet die Modi als laufend an, die noch niemand rendert. Gibt die eigenen Einträge zurück."""
+        flights = {}
+        for mode in modes:
+            key = self._flight_key(url, mode)
+            if key not in _render_flights:
+                flights[mode] = _render_flights[key] = {
+                    'key': key, 'future': asyncio.get_running_loop().create_future(), 'followers': [],
+                }
+        if flights:
+            _flight_stats['led'] += 1
+        return flights
+
+    async def _land_flights(self, flights: Dict[str, Dict], results: Dict[str, Dict]):
+        """
+        Verteilt die eigenen Ergebnisse an die wartenden Anfragen: erst abmelden (keine neuen
+        Mitfahrer), dann die PDFs in deren Verzeichnisse verlinken und die Blobs für deren Jobs
+        festhalten, danach die Wartenden wecken. Das eigene PDF existiert zu diesem Zeitpunkt noch.
+        """
+        for flight in flights.values():
+            _render_flights.pop(flight['key'], None)
+        try:
+            for mode, flight in flights.items():
+                result = results.get(mode)
+                if result and result.get('status') == 'success' and flight['followers']:
+                    try:
+                        linked = await asyncio.to_thread(self._link_for_followers, result, flight['followers'])
+                        result = {**result, 'linked': linked}
+                    except Exception as e:
+                        logger.warning(f"PDF konnte nicht an wartende Anfragen weitergegeben werden: {e}")
+                flight['future'].set_result(dict(result) if result else None)
+        finally:
+            # Bei Abbruch rendern die Wartenden selbst
+            for flight in flights.values():
+                if not flight['future'].done():
+                    flight['future'].set_result(None)
+
+    def _link_for_followers(self, result: Dict, followers: List[Tuple[str, str]]) -> List[str]:
+        linked = []
+        for target, owner in followers:
+            try:
+                if os.path.abspath(target) != os.path.abspath(result['path']):
+                    link_or_copy(result['path'], target)
+                if self.render_cache and result.get('blob'):
+                    self.render_cache.lease(owner, result['blob'])
+            except OSError as e:
+                # z.B. Arbeitsverzeichnis eines inzwischen abgebrochenen Jobs
+                logger.debug(f"PDF konnte nicht nach {target} verlinkt werden: {e}")
+                continue
+            linked.append(target)
+        return linked
+
+    def _reject_if_circuit_open(self, url: str) -> Tuple[Optional[Dict], bool]:
+        """
+        Liefert sofort ein Fehlerergebnis, wenn der Host gerade gesperrt ist. Der zweite Wert
+        gibt an, ob dieser Render der Probe-Versuch eines halb offenen Hosts ist.
+        """
+        allowed, probe = self.circuit_breaker.acquire(url)
+        if allowed:
+            return None, probe
+        logger.warning(f"Host von {url} vorübergehend gesperrt (Circuit-Breaker), überspringe.")
+        return {"url": url, "status": "error", "error": "Host vorübergehend gesperrt (wiederholte Timeouts)",
+                "retryable": True, "circuit_open": True}, False
+
+    def _record_host_outcome(self, url: str, results: List[Dict], probe: bool = False):
+        """
+        Meldet dem Circuit-Breaker, ob der Host erreichbar war (jede Antwort zählt als Erfolg).
+        Ohne Ergebnis (Abbruch) wird nur ein eigener Probe-Versuch freigegeben, damit der Host
+        nicht dauerhaft gesperrt bleibt.
+        """
+        if not results:
+            if probe:
+                self.circuit_breaker.release_probe(url)
+        elif any(result.get('retryable') for result in results):
+            self.circuit_breaker.record_failure(url)
+        else:
+            self.circuit_breaker.record_success(url)
+
+    async def _load_page(self, page: Page, url: str, timer: PhaseTimer, timeouts: Dict) -> Dict:
+        """
+        Navigates to the URL and waits until the page has settled. Navigation must reach
+        DOMContentLoaded within the navigation timeout; waiting for network idle is capped by
+        the settle timeout and is not fatal (pages with long-polling never become idle).
+        With the snapshot store enabled, the main document comes from the crawled HTML and only
+        subresources are fetched live.
+        """
+        logger.info(f"Opening page: {url}")
+        with timer.phase('goto'):
+            await self.resource_policy.install(page)
+            if self.snapshot_store and not timeouts.get('live'):
+                await self.snapshot_store.install(page, url)
+            await page.goto(url, timeout=timeouts['navigation'], wait_until='domcontentloaded')
+            try:
+                await page.wait_for_load_state('networkidle', timeout=timeouts['settle'])
+            except PlaywrightTimeoutError:
+                logger.info(f"Network idle not reached within {timeouts['settle']} ms, continuing: {url}")
+
+        # Wait until the DOM, images, fonts and layout have settled
+        with timer.phase('readiness'):
+            return await wait_for_page_ready(page)
+
+    async def _apply_cleanup(self, page: Page, expanded: bool) -> Dict:
+        """Runs the compiled cleanup script of the mode in a single round-trip and returns step timings."""
+        mode = 'expanded' if expanded else 'collapsed'
+        timings = await page.evaluate(self.cleanup_scripts[mode], READINESS_OPTIONS)
+        logger.info(f"Cleanup ({mode}) finished: {timings}")
+        return timings
+
+    def set_output_dir(self, output_dir: str):
+        """Setzt das Verzeichnis für die Einzel-PDFs (Render-Farm-Worker wechseln es pro Teilstück)."""
+        self.output_dir_collapsed = os.path.join(output_dir, 'individual_pdfs_collapsed')
+        self.output_dir_expanded = os.path.join(output_dir, 'individual_pdfs_expanded')
+        os.makedirs(self.output_dir_collapsed, exist_ok=True)
+        os.makedirs(self.output_dir_expanded, exist_ok=True)
 
-            # Generate PDF with optimized options
+    def _pdf_path(self, url: str, expanded: bool) -> str:
+        # Lesbarer Teil aus der URL, eindeutig durch den Hash der normalisierten URL
+        digest = hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()[:16]
+        filename = f"{sanitize_filename(url)[:PDF_NAME_MAX_CHARS]}-{digest}.pdf"
+        return os.path.join(self.output_dir_expanded if expanded else self.output_dir_collapsed, filename)
+
+    async def _print_pdf(self, page: Page, url: str, expanded: bool, timer: PhaseTimer,
+                         timeouts: Dict = RENDER_TIMEOUTS) -> Tuple[str, Dict]:
+        """Scrolls to trigger lazy-loading and prints the page as PDF. Returns the PDF path and the scroll report."""
+        # Scroll through the page in viewport steps to trigger lazy-loading
+        with timer.phase('scroll'):
+            scroll_report = await scroll_page(page)
+
+        pdf_path = self._pdf_path(url, expanded)
+        # Erst in eine temporäre Datei drucken: pdf_path kann ein Hardlink auf einen Blob im
+        # Render-Cache sein und darf nicht an Ort und Stelle überschrieben werden
+        tmp_path = f"{pdf_path}.{uuid.uuid4().hex[:8]}.tmp"
+
+        # Generate PDF with optimized options
+        with timer.phase('pdf'):
             await page.emulate_media(media="screen")
-            await page.pdf(
-                path=pdf_path,
-                format='A3',
-                print_background=True,
-                margin={"top": "10mm", "bottom": "10mm", "left": "10mm", "right": "10mm"},
-                prefer_css_page_size=False,
-                scale=1,
-                display_header_footer=False
+            try:
+                await asyncio.wait_for(page.pdf(path=tmp_path, **PDF_OPTIONS), timeout=timeouts['print'] / 1000)
+                os.replace(tmp_path, pdf_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        logger.info(f"PDF created: {pdf_path}")
+        return pdf_path, scroll_report
+
+    @staticmethod
+    def _page_metrics(timer: PhaseTimer, meter: Optional[NetworkMeter] = None,
+                      pdf_path: Optional[str] = None) -> Dict:
+        """Phasenzeiten, Netzwerkzähler und PDF-Größe eines Renders für Job-Ergebnis und Statistik."""
+        metrics = {'phases': timer.as_dict()}
+        if meter:
+            metrics.update(meter.as_dict())
+        if pdf_path and os.path.exists(pdf_path):
+            metrics['pdf_bytes'] = os.path.getsize(pdf_path)
+        return metrics
+
+    # ----------------------- Render-Cache -----------------------
+
+    def _cache_key(self, url: str, mode: str, fingerprint: Optional[str]) -> Optional[str]:
+        if not self.render_cache or not fingerprint:
+            return None
+        return self.render_cache.make_key(url, mode, self.render_settings_hashes[mode], fingerprint)
+
+    async def _fetch_validator(self, page: Page, url: str, modes: List[str], timeouts: Dict,
+                               validate: bool = True) -> Optional[str]:
+        """
+        Fragt ETag/Last-Modified per HEAD ab, um einen Cache-Treffer ohne Seitenaufruf zu erkennen.
+        Übersprungen, wenn für URL und Modi nichts im Cache liegt (ein Treffer ist dann unmöglich)
+        und für Wiederholungen und Probe-Versuche (validate=False), deren Host gerade langsam war.
+        """
+        if not self.render_cache or not validate:
+            return None
+        if not any(self.render_cache.knows(url, mode) for mode in modes):
+            return None
+        try:
+            response = await page.request.head(url, timeout=timeouts['validator'])
+            etag = response.headers.get('etag')
+            last_modified = response.headers.get('last-modified')
+            ok = response.ok
+            await response.dispose()
+            if ok and (etag or last_modified):
+                return f"etag:{etag}|last-modified:{last_modified}"
+        except Exception as e:
+            logger.debug(f"HEAD-Anfrage für {url} fehlgeschlagen: {e}")
+        return None
+
+    async def _dom_fingerprint(self, page: Page) -> Optional[str]:
+        if not self.render_cache:
+            return None
+        try:
+            digest = await page.evaluate(DOM_FINGERPRINT_JS)
+            if len(digest) != 64:
+                digest = hashlib.sha256(digest.encode('utf-8')).hexdigest()
+            return f"dom:{digest}"
+        except Exception as e:
+            logger.debug(f"DOM-Fingerprint konnte nicht berechnet werden: {e}")
+            return None
+
+    async def _restore_cached(self, key: Optional[str], url: str, expanded: bool,
+                              count_miss: bool = True) -> Optional[Dict]:
+        """Kopiert ein gecachtes PDF in das Ausgabeverzeichnis und liefert das passende Ergebnis."""
+        if not self.render_cache or not key:
+            return None
+        pdf_path = self._pdf_path(url, expanded)
+        hit = await asyncio.to_thread(self.render_cache.restore, [key], pdf_path, count_miss, self.lease_owner)
+        if not hit:
+            return None
+        logger.info(f"PDF aus Render-Cache übernommen: {url}")
+        return {"url": url, "status": "success", "path": pdf_path, "title": hit['title'] or url, "cache": "hit",
+                "blob": hit['blob']}
+
+    async def _store_cached(self, keys: List[Optional[str]], result: Dict, mode: str):
+        if not self.render_cache or result.get('status') != 'success':
+            return
+        try:
+            blob = await asyncio.to_thread(
+                self.render_cache.put, keys, result['path'], result['url'], mode, result['title'], self.lease_owner
             )
-            logger.info(f"PDF created: {pdf_path}")
+            if blob:
+                result['blob'] = blob
+        except Exception as e:
+            logger.warning(f"PDF konnte nicht im Render-Cache abgelegt werden: {e}")
+
+    # ----------------------- Rendern -----------------------
+
+    async def _render_on_page(self, page: Page, url: str, expanded: bool = False,
+                              timer: Optional[PhaseTimer] = None, timeouts: Dict = RENDER_TIMEOUTS,
+                              validate: bool = True) -> Dict:
+        mode = 'expanded' if expanded else 'collapsed'
+        timer = timer or PhaseTimer()
+        meter = NetworkMeter()
+        try:
+            # Unveränderte Seite (gleicher ETag/Last-Modified): ohne Seitenaufruf aus dem Cache
+            with timer.phase('cache_lookup'):
+                validator_key = self._cache_key(
+                    url, mode, await self._fetch_validator(page, url, [mode], timeouts, validate))
+                cached = await self._restore_cached(validator_key, url, expanded, count_miss=False)
+            if cached:
+                cached['metrics'] = self._page_metrics(timer, pdf_path=cached['path'])
+                return cached
+
+            await meter.start(page)
+            readiness = await self._load_page(page, url, timer, timeouts)
+
+            # Unverändertes DOM: Bereinigung, Scrollen und Drucken überspringen
+            with timer.phase('fingerprint'):
+                dom_key = self._cache_key(url, mode, await self._dom_fingerprint(page))
+                cached = await self._restore_cached(dom_key, url, expanded)
+            if cached:
+                cached['readiness'] = readiness
+                cached['metrics'] = self._page_metrics(timer, meter, cached['path'])
+                await self._store_cached([validator_key], cached, mode)
+                return cached
+
+            with timer.phase('cleanup'):
+                cleanup_timings = await self._apply_cleanup(page, expanded)
+
+            pdf_path, scroll_report = await self._print_pdf(page, url, expanded, timer, timeouts)
 
             # Extract the page title for the table of contents
             title = await page.title()
 
-            return {"url": url, "status": "success", "path": pdf_path, "title": title}
+            result = {"url": url, "status": "success", "path": pdf_path, "title": title, "readiness": readiness,
+                      "cleanup_timings": cleanup_timings, "scroll": scroll_report, "cache": "miss",
+                      "metrics": self._page_metrics(timer, meter, pdf_path)}
+            await self._store_cached([validator_key, dom_key], result, mode)
+            return result
 
         except Exception as e:
             logger.error(f"Error rendering page {url}: {e}")
-            return {"url": url, "status": "error", "error": str(e)}
+            return error_result(url, e)
         finally:
-            if page:
-                await page.close()
-            if context:
-                await context.close()
-
-    async def convert_urls_to_pdfs(self, urls: List[str], expanded: bool = False) -> List[Dict]:
-        """Konvertiert eine Liste von URLs zu PDFs."""
-        semaphore = asyncio.Semaphore(self.max_concurrent_tasks)
-
-        async def sem_task(url):
-            async with semaphore:
-                return await self.render_page(url, expanded=expanded)
-
-        tasks = [asyncio.create_task(sem_task(url)) for url in urls]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        processed_results = []
+            await meter.stop()
+
+    async def _render_both_on_page(self, page: Page, url: str, timer: Optional[PhaseTimer] = None,
+                                   timeouts: Dict = RENDER_TIMEOUTS, validate: bool = True) -> Dict:
+        """
+        Loads the page once, prints the collapsed PDF, then applies the expansion and
+        cleanup steps to the same DOM and prints the expanded PDF. The collapsed cleanup
+        only hides navigation and removes elements the expanded cleanup removes as well,
+        so the expanded output matches a separate expanded render. Modes found in the
+        render cache are skipped. Load phases and network counters are shared by both
+        outputs; the total of each output is the time until its PDF was ready.
+        """
+        modes = (('collapsed', False), ('expanded', True))
+        results = {}
+        timer = timer or PhaseTimer()
+        meter = NetworkMeter()
+        try:
+            with timer.phase('cache_lookup'):
+                validator = await self._fetch_validator(page, url, [mode for mode, _ in modes], timeouts, validate)
+                validator_keys = {mode: self._cache_key(url, mode, validator) for mode, _ in modes}
+                for mode, expanded in modes:
+                    cached = await self._restore_cached(validator_keys[mode], url, expanded, count_miss=False)
+                    if cached:
+                        results[mode] = cached
+            for cached in results.values():
+                cached['metrics'] = self._page_metrics(timer, pdf_path=cached['path'])
+            if len(results) == len(modes):
+                return results
+
+            await meter.start(page)
+            readiness = await self._load_page(page, url, timer, timeouts)
+            # Read the title before cleanup so both outputs share the original title
+            title = await page.title()
+            with timer.phase('fingerprint'):
+                dom_fingerprint = await self._dom_fingerprint(page)
+        except Exception as e:
+            logger.error(f"Error rendering page {url}: {e}")
+            await meter.stop()
+            error = error_result(url, e)
+            return {mode: results.get(mode, dict(error)) for mode, _ in modes}
+
+        try:
+            for mode, expanded in modes:
+                if mode in results:
+                    continue
+                mode_timer = timer.fork()
+                try:
+                    with mode_timer.phase('fingerprint'):
+                        dom_key = self._cache_key(url, mode, dom_fingerprint)
+                        cached = await self._restore_cached(dom_key, url, expanded)
+                    if cached:
+                        cached['readiness'] = readiness
+                        cached['metrics'] = self._page_metrics(mode_timer, meter, cached['path'])
+                        await self._store_cached([validator_keys[mode]], cached, mode)
+                        results[mode] = cached
+                        continue
+
+                    with mode_timer.phase('cleanup'):
+                        cleanup_timings = await self._apply_cleanup(page, expanded)
+                    pdf_path, scroll_report = await self._print_pdf(page, url, expanded, mode_timer, timeouts)
+                    results[mode] = {"url": url, "status": "success", "path": pdf_path, "title": title,
+                                     "readiness": readiness, "cleanup_timings": cleanup_timings,
+                                     "scroll": scroll_report, "cache": "miss",
+                                     "metrics": self._page_metrics(mode_timer, meter, pdf_path)}
+                    await self._store_cached([validator_keys[mode], dom_key], results[mode], mode)
+                except Exception as e:
+                    logger.error(f"Error rendering page {url} ({mode}): {e}")
+                    results[mode] = error_result(url, e)
+        finally:
+            await meter.stop()
+        return results
+
+    async def convert_urls_to_pdfs(self, urls: List[str], expanded: bool = False, sink=None) -> List[Dict]:
+        """
+        Konvertiert eine Liste von URLs zu PDFs. Mit sink (z.B. StreamingPdfPipeline) wird
+        jedes Ergebnis sofort weitergereicht, statt erst nach der letzten Seite.
+        """
+        results = await self._run_bounded(
+            urls, lambda url, relaxed=False: self.render_page(url, expanded=expanded, relaxed=relaxed), sink
+        )
+        return [
+            {"url": url, "status": "error", "error": str(result)} if isinstance(result, Exception) else result
+            for url, result in zip(urls, results)
+        ]
+
+    async def convert_urls_to_pdfs_both(self, urls: List[str], sink=None) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Konvertiert eine Liste von URLs in beide Varianten mit nur einem Seitenaufruf pro URL.
+        Gibt (collapsed_results, expanded_results) in der Reihenfolge der URLs zurück.
+        """
+        results = await self._run_bounded(urls, self.render_page_both, sink)
+        collapsed_results, expanded_results = [], []
+        for url, result in zip(urls, results):
+            if isinstance(result, Exception):
+                result = {mode: {"url": url, "status": "error", "error": str(result)}
+                          for mode in ('collapsed', 'expanded')}
+            collapsed_results.append(result['collapsed'])
+            expanded_results.append(result['expanded'])
+        return collapsed_results, expanded_results
+
+    async def _run_bounded(self, urls: List[str], render, sink=None) -> List:
+        """
+        Führt render(url) für alle URLs aus. Die Slots teilt der globale Scheduler zu: fair
+        zwischen allen laufenden Jobs, mit höchstens max_concurrent_tasks Seiten pro Job und
+        einer globalen Obergrenze aus dem adaptiven Limiter (Speicher, CPU, Latenz).
+        Ein sink erhält jedes Ergebnis mit seinem Index (deliver) und kann über admit bremsen,
+        wie weit das Rendern der Weiterverarbeitung vorauslaufen darf.
+        URLs, die an Timeouts oder Netzwerkfehlern gescheitert sind, werden am Ende einmal mit
+        großzügigeren Timeouts wiederholt; neu gelungene Ergebnisse gehen an sink.deliver_retry.
+        """
+        async with self.scheduler.job(self.job_id, len(urls), self.max_concurrent_tasks, self.job_weight) as job:
+
+            async def sem_task(index, url):
+                # admit vor dem Belegen eines Slots, sonst blockieren wartende Seiten die Vorgänger
+                if sink:
+                    await sink.admit(index)
+                try:
+                    async with self.scheduler.slot(job) as lease:
+                        result = await render(url)
+                        lease.rendered = _was_rendered(result)
+                except Exception as e:
+                    if sink:
+                        await sink.deliver(index, e)
+                    raise
+                if sink:
+                    await sink.deliver(index, result)
+                return result
+
+            tasks = [asyncio.create_task(sem_task(index, url)) for index, url in enumerate(urls)]
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            await self._retry_failed(urls, results, render, job, sink)
         for result in results:
             if isinstance(result, Exception):
                 logger.error(f"Fehler bei der Verarbeitung einer URL: {result}")
-                processed_results.append({"url": "unknown", "status": "error", "error": str(result)})
+        return results
+
+    async def _retry_failed(self, urls: List[str], results: List, render, job, sink=None):
+        """
+        Wiederholt vorübergehend gescheiterte URLs einmal (relaxed) und ersetzt die Ergebnisse in place.
+        Ist der Circuit-Breaker eines Hosts offen, wird die Sperre abgewartet (ohne Slot) und zuerst
+        eine URL als Probe wiederholt; die übrigen URLs des Hosts folgen nur, wenn die Probe gelingt.
+        """
+        retry_indices = [index for index, result in enumerate(results) if _needs_retry(result)]
+        if not retry_indices:
+            return
+        logger.info(f"Wiederhole {len(retry_indices)} fehlgeschlagene URL(s) mit großzügigeren Timeouts.")
+        by_host: Dict[str, List[int]] = {}
+        for index in retry_indices:
+            by_host.setdefault(self.circuit_breaker.host_of(urls[index]), []).append(index)
+
+        async def retry_task(index):
+            async with self.scheduler.slot(job) as lease:
+                retried = await render(urls[index], relaxed=True)
+                lease.rendered = _was_rendered(retried)
+            previous = results[index]
+            if 'status' in retried:
+                recovered = retried if retried['status'] == 'success' else None
+                results[index] = retried
             else:
-                processed_results.append(result)
-        return processed_results
+                # Beide Modi: nur die Modi ersetzen, die vorher vorübergehend gescheitert sind
+                recovered = {}
+                for mode, result in retried.items():
+                    if previous[mode].get('retryable'):
+                        results[index][mode] = result
+                        if result['status'] == 'success':
+                            recovered[mode] = result
+            if recovered and sink:
+                await sink.deliver_retry(index, recovered)
+            return retried
+
+        async def retry_host(host, indices):
+            wait = self.circuit_breaker.retry_after(urls[indices[0]])
+            if wait > 0:
+                logger.info(f"Host {host} gesperrt, Wiederholung von {len(indices)} URL(s) in {wait:.0f} s.")
+                await asyncio.sleep(wait)
+                probe = await retry_task(indices[0])
+                if _needs_retry(probe):
+                    logger.warning(f"Probe für {host} erneut gescheitert, {len(indices) - 1} URL(s) nicht wiederholt.")
+                    return []
+                indices = indices[1:]
+            return await asyncio.gather(*(retry_task(index) for index in indices), return_exceptions=True)
+
+        retried = await asyncio.gather(*(retry_host(host, indices) for host, indices in by_host.items()),
+                                       return_exceptions=True)
+        for outcome in retried:
+            for error in (outcome if isinstance(outcome, list) else [outcome]):
+                if isinstance(error, Exception):
+                    logger.error(f"Fehler bei der Wiederholung einer URL: {error}")
+
+
+def _needs_retry(result) -> bool:
+    if isinstance(result, Exception) or not isinstance(result, dict):
+        return False
+    if 'status' in result:
+        return bool(result.get('retryable'))
+    return any(mode_result.get('retryable') for mode_result in result.values())
+
+
+def _was_rendered(result: Dict) -> bool:
+    """Ob die Seite wirklich gerendert wurde (kein Cache-Treffer, gesperrter Host oder zusammengefasster Render)."""
+    results = [result] if 'status' in result else result.values()
+    return any(mode_result.get('cache') == 'miss' for mode_result in results)
+
 # app/processing/download.py
 
 if __name__ == "__main__":
@@ -315,15 +792,11 @@ if __name__ == "__main__":
             logger.error("Keine URLs zum Verarbeiten gefunden. Programm beendet.")
             return
 
-        # ======================= Individuelle PDFs (Collapsed) =======================
-        logger.info("Starte die Konvertierung der URLs zu PDFs (eingeklappte Version).")
-        collapsed_results = await converter.convert_urls_to_pdfs(urls, expanded=False)
+        # ======================= Individuelle PDFs (Collapsed + Expanded) =======================
+        logger.info("Starte die Konvertierung der URLs zu PDFs (eingeklappte und ausgeklappte Version).")
+        collapsed_results, expanded_results = await converter.convert_urls_to_pdfs_both(urls)
         merged_collapsed_pdf = os.path.join(OUTPUT_PDFS_DIR, "combined_collapsed.pdf")
         merge_pdfs_with_bookmarks(collapsed_results, merged_collapsed_pdf)
-
-        # ======================= Individuelle PDFs (Expanded) =======================
-        logger.info("Starte die Konvertierung der URLs zu PDFs (ausgeklappte Version).")
-        expanded_results = await converter.convert_urls_to_pdfs(urls, expanded=True)
         merged_expanded_pdf = os.path.join(OUTPUT_PDFS_DIR, "combined_expanded.pdf")
         merge_pdfs_with_bookmarks(expanded_results, merged_expanded_pdf)
 
@@ -363,6 +836,7 @@ if __name__ == "__main__":
 
         # ======================= Abschluss =======================
         await converter.close()
+        await converter.browser_pool.close()
         logger.info(f"Alle Prozesse abgeschlossen. ZIP-Archiv befindet sich unter: {zip_filename}")
         print(f"ZIP-Archiv erstellt: {zip_filename}")
 
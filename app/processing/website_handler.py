@@ -1,7 +1,96 @@
 import asyncio
+import os
+from typing import Dict
+
 from playwright.async_api import Page
 
-from config import logger
+from app.processing.website_utils import load_js_file
+from config import (
+    logger,
+    READINESS_QUIET_MS,
+    READINESS_MUTATION_CAP_MS,
+    READINESS_IMAGE_CAP_MS,
+    READINESS_FONT_CAP_MS,
+    READINESS_LAYOUT_CAP_MS,
+    SCROLL_QUIET_MS,
+    SCROLL_STEP_CAP_MS,
+    SCROLL_TOTAL_CAP_MS,
+    SCROLL_MAX_STEPS,
+)
+
+# Bereitschafts-Detektor (DOM-Ruhe, Bilder, Fonts, Layout-Stabilität), einmalig geladen
+PAGE_READINESS_JS = load_js_file(os.path.join(os.path.dirname(__file__), 'js', 'page_readiness.js'))
+
+READINESS_OPTIONS = {
+    'quietMs': READINESS_QUIET_MS,
+    'mutationCapMs': READINESS_MUTATION_CAP_MS,
+    'imageCapMs': READINESS_IMAGE_CAP_MS,
+    'fontCapMs': READINESS_FONT_CAP_MS,
+    'layoutCapMs': READINESS_LAYOUT_CAP_MS,
+}
+
+# Inkrementeller Scroller (Viewport-Schritte, wartet nur auf ausgelöste Ladevorgänge)
+INCREMENTAL_SCROLL_JS = load_js_file(os.path.join(os.path.dirname(__file__), 'js', 'incremental_scroll.js'))
+
+SCROLL_OPTIONS = {
+    'quietMs': SCROLL_QUIET_MS,
+    'stepCapMs': SCROLL_STEP_CAP_MS,
+    'totalCapMs': SCROLL_TOTAL_CAP_MS,
+    'maxSteps': SCROLL_MAX_STEPS,
+}
+
+# Öffnet Details, klickt Akkordeons/Toggles auf und deaktiviert Animationen
+EXPAND_HIDDEN_ELEMENTS_JS = """
+    () => {
+        // Öffne alle <details> Elemente
+        const details = document.querySelectorAll('details');
+        details.forEach(detail => detail.open = true);
+
+        // Klicke auf alle Elemente, die Klassen wie 'collapsible', 'expandable', 'accordion', oder 'toggle' enthalten
+        const expandableElements = document.querySelectorAll('*[class*="collapsible"], *[class*="expandable"], *[class*="accordion"], *[class*="toggle"], *[data-toggle], *[data-expand]');
+        expandableElements.forEach(el => {
+            // Überprüfen, ob das Element bereits erweitert ist, um unnötige Klicks zu vermeiden
+            const isExpanded = el.getAttribute('aria-expanded') === 'true' || el.classList.contains('expanded');
+            if (!isExpanded) {
+                if (typeof el.click === 'function') {
+                    el.click();
+                } else {
+                    // Fallback: Dispatch ein Click-Event
+                    el.dispatchEvent(new Event('click'));
+                }
+            }
+        });
+
+        // Entferne Animationen und Übergänge, um das Layout stabil zu halten
+        const style = document.createElement('style');
+        style.innerHTML = `
+            * {
+                transition: none !important;
+                animation: none !important;
+            }
+        `;
+        document.head.appendChild(style);
+    }
+"""
+
+
+async def wait_for_page_ready(page: Page, **overrides) -> Dict:
+    """
+    Wartet, bis die Seite zur Ruhe gekommen ist: keine DOM-Mutationen mehr, laufende Bilder
+    und Webfonts geladen, Layout stabil. Jede Bedingung hat eine eigene Obergrenze.
+    Gibt den Bericht des Detektors zurück (Dauer und Timeout pro Bedingung).
+    """
+    options = {**READINESS_OPTIONS, **overrides}
+    try:
+        report = await page.evaluate(
+            f"(options) => {{ {PAGE_READINESS_JS}\nreturn waitForPageReady(options); }}",
+            options
+        )
+        logger.debug(f"Seite bereit nach {report.get('totalMs')} ms: {report}")
+        return report
+    except Exception as e:
+        logger.error(f"Fehler beim Warten auf Seitenbereitschaft: {e}")
+        return {}
 
 
 async def expand_hidden_elements(page: Page):
@@ -11,58 +100,37 @@ async def expand_hidden_elements(page: Page):
     """
     logger.info("Erweitere alle versteckten Elemente auf der Seite.")
     try:
-        await page.evaluate("""
-            () => {
-                // Öffne alle <details> Elemente
-                const details = document.querySelectorAll('details');
-                details.forEach(detail => detail.open = true);
-
-                // Klicke auf alle Elemente, die Klassen wie 'collapsible', 'expandable', 'accordion', oder 'toggle' enthalten
-                const expandableElements = document.querySelectorAll('*[class*="collapsible"], *[class*="expandable"], *[class*="accordion"], *[class*="toggle"], *[data-toggle], *[data-expand]');
-                expandableElements.forEach(el => {
-                    // Überprüfen, ob das Element bereits erweitert ist, um unnötige Klicks zu vermeiden
-                    const isExpanded = el.getAttribute('aria-expanded') === 'true' || el.classList.contains('expanded');
-                    if (!isExpanded) {
-                        if (typeof el.click === 'function') {
-                            el.click();
-                        } else {
-                            // Fallback: Dispatch ein Click-Event
-                            el.dispatchEvent(new Event('click'));
-                        }
-                    }
-                });
-
-                // Entferne Animationen und Übergänge, um das Layout stabil zu halten
-                const style = document.createElement('style');
-                style.innerHTML = `
-                    * {
-                        transition: none !important;
-                        animation: none !important;
-                    }
-                `;
-                document.head.appendChild(style);
-            }
-        """)
+        await page.evaluate(EXPAND_HIDDEN_ELEMENTS_JS)
         logger.debug("Versteckte Elemente erfolgreich erweitert.")
-        await asyncio.sleep(1)  # Warte kurz, um sicherzustellen, dass alle Klicks verarbeitet wurden
+        # Warten, bis die durch die Klicks ausgelösten DOM-Änderungen abgeschlossen sind
+        await wait_for_page_ready(page)
     except Exception as e:
         logger.error(f"Fehler beim Erweitern versteckter Elemente: {e}")
 
 
-async def scroll_page(page: Page):
+async def scroll_page(page: Page, **overrides) -> Dict:
     """
-    Scrollt die Seite nach unten, um Lazy-Loading von Inhalten zu ermöglichen.
+    Scrollt die Seite in Viewport-Schritten nach unten, damit Lazy-Loading (auch per
+    IntersectionObserver) ausgelöst wird. Nach jedem Schritt wird nur so lange gewartet,
+    bis die ausgelösten Ladevorgänge abgeschlossen sind. Eine harte Obergrenze verhindert,
+    dass Endlos-Scrolling einen Render-Slot blockiert. Gibt den Bericht des Scrollers zurück.
     """
     logger.info("Scrolle die Seite, um alle Inhalte zu laden.")
+    options = {**SCROLL_OPTIONS, **overrides}
     try:
-        previous_height = await page.evaluate("document.body.scrollHeight")
-        while True:
-            await page.evaluate("window.scrollTo(0, document.body.scrollHeight);")
-            await asyncio.sleep(2)  # Warte, bis neue Inhalte geladen sind
-            new_height = await page.evaluate("document.body.scrollHeight")
-            if new_height == previous_height:
-                break
-            previous_height = new_height
-        logger.debug("Seite vollständig gescrollt.")
+        # Zusätzliche Absicherung, falls das Skript selbst hängen bleibt
+        report = await asyncio.wait_for(
+            page.evaluate(
+                f"(options) => {{ {INCREMENTAL_SCROLL_JS}\nreturn scrollIncrementally(options); }}",
+                options
+            ),
+            timeout=options['totalCapMs'] / 1000 + 5
+        )
+        if report.get('timedOut') or report.get('stepLimitReached'):
+            logger.warning(f"Scrollen abgebrochen (Obergrenze erreicht): {report}")
+        else:
+            logger.debug(f"Seite vollständig gescrollt: {report}")
+        return report
     except Exception as e:
-        logger.error(f"Fehler beim Scrollen der Seite: {e}")
\ No newline at end of file
+        logger.error(f"Fehler beim Scrollen der Seite: {e}")
+        return {}
@@ -83,39 +83,43 @@ def load_js_file(file_path: str) -> str:
         return ""
 
 
+# Benutzerdefiniertes CSS pro Modus
+EXPANDED_CSS = '''
+    /* Verstecke Navbar und Sidebar */
+    header, nav, .sidebar, #navigation, .mdl-anchornav, #header, .mdl-header, #toc, .mdl-footer, #footer {
+        display: none !important;
+    }
+    /* Passe die Seitenbreite an */
+    body {
+        margin: 0 auto;
+        width: 100%;
+    }
+    /* Weitere CSS-Anpassungen für ein sauberes Layout */
+    .lyt-wrapper {
+        max-width: 100% !important;
+        padding: 0 !important;
+    }
+'''
+
+COLLAPSED_CSS = '''
+    /* Optional: CSS für collapsed Modus */
+    body {
+        margin: 0 auto;
+        width: 100%;
+    }
+    /* Weitere Anpassungen für collapsed Modus */
+'''
+
+
 async def inject_custom_css(page: Page, expanded: bool = False):
     """Fügt benutzerdefiniertes CSS in die Seite ein."""
     try:
         if expanded:
-            css = '''
-                /* Verstecke Navbar und Sidebar */
-                header, nav, .sidebar, #navigation, .mdl-anchornav, #header, .mdl-header, #toc, .mdl-footer, #footer {
-                    display: none !important;
-                }
-                /* Passe die Seitenbreite an */
-                body {
-                    margin: 0 auto;
-                    width: 100%;
-                }
-                /* Weitere CSS-Anpassungen für ein sauberes Layout */
-                .lyt-wrapper {
-                    max-width: 100% !important;
-                    padding: 0 !important;
-                }
-            '''
-            await page.add_style_tag(content=css)
+            await page.add_style_tag(content=EXPANDED_CSS)
             logger.debug("Benutzerdefiniertes CSS für expanded Modus eingefügt.")
         else:
             # Benutzerdefiniertes CSS für collapsed Modus, falls benötigt
-            css = '''
-                /* Optional: CSS für collapsed Modus */
-                body {
-                    margin: 0 auto;
-                    width: 100%;
-                }
-                /* Weitere Anpassungen für collapsed Modus */
-            '''
-            await page.add_style_tag(content=css)
+            await page.add_style_tag(content=COLLAPSED_CSS)
             logger.debug("Benutzerdefiniertes CSS für collapsed Modus eingefügt.")
     except Exception as e:
         logger.error(f"Fehler beim Einfügen von benutzerdefiniertem CSS: {e}")
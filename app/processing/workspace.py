@@ -0,0 +1,136 @@
+# app/processing/workspace.py
+
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+from config import (
+    logger,
+    WORKSPACES_DIR,
+    PUBLISHED_DIR,
+    WORKSPACE_STALE_HOURS,
+    ARTIFACT_RETENTION_HOURS,
+    WORKSPACE_GC_INTERVAL_SECONDS,
+)
+
+
+class JobWorkspace:
+    """
+    Arbeitsverzeichnis eines PDF-Jobs. Einzel-PDFs, zusammengeführte PDFs und das entstehende
+    ZIP-Bundle liegen nur hier, parallel laufende Jobs sehen sich also nicht gegenseitig.
+    Fertige Artefakte (Dateien oder Verzeichnisse) werden mit publish() per os.replace in das
+    Download-Verzeichnis verschoben (atomar, beide liegen im selben Dateisystem).
+    """
+
+    def __init__(self, manager: 'WorkspaceManager', job_id: str, root: Path):
+        self.manager = manager
+        self.job_id = job_id
+        self.root = root
+
+    def path(self, *parts: str) -> str:
+        return os.path.join(self.root, *parts)
+
+    def publish(self, path: str, name: Optional[str] = None) -> str:
+        """Verschiebt path atomar ins Download-Verzeichnis und gibt den neuen Pfad zurück."""
+        target = os.path.join(self.manager.published_dir, name or os.path.basename(path))
+        os.replace(path, target)
+        logger.info(f"Artefakt veröffentlicht: {target}")
+        return target
+
+    def discard(self):
+        """Entfernt das Arbeitsverzeichnis mit allen Zwischenständen und meldet den Job ab."""
+        shutil.rmtree(self.root, ignore_errors=True)
+        self.manager.release(self.job_id)
+
+
+class WorkspaceManager:
+    """
+    Legt Arbeitsverzeichnisse pro Job an und räumt auf: Verzeichnisse ohne laufenden Job, die
+    älter als stale_hours sind (z.B. nach einem Absturz), und veröffentlichte Archive nach
+    retention_hours. Die Garbage Collection läuft höchstens alle gc_interval Sekunden beim
+    Anlegen eines neuen Arbeitsverzeichnisses.
+    """
+
+    def __init__(self, workspaces_dir: Path = WORKSPACES_DIR, published_dir: Path = PUBLISHED_DIR,
+                 stale_hours: float = WORKSPACE_STALE_HOURS, retention_hours: float = ARTIFACT_RETENTION_HOURS,
+                 gc_interval: float = WORKSPACE_GC_INTERVAL_SECONDS):
+        self.workspaces_dir = Path(workspaces_dir)
+        self.published_dir = Path(published_dir)
+        self.workspaces_dir.mkdir(parents=True, exist_ok=True)
+        self.published_dir.mkdir(parents=True, exist_ok=True)
+        self.stale_seconds = stale_hours * 3600
+        self.retention_seconds = retention_hours * 3600
+        self.gc_interval = gc_interval
+        self._active: Set[str] = set()
+        self._lock = threading.Lock()
+        self._last_gc = 0.0
+        self.stats = {'created': 0, 'workspaces_removed': 0, 'artifacts_removed': 0}
+
+    def create(self, job_id: str) -> JobWorkspace:
+        """Legt das Arbeitsverzeichnis eines Jobs an (blockierend, aus async-Code über asyncio.to_thread)."""
+        with self._lock:
+            self._active.add(job_id)
+            run_gc = time.monotonic() - self._last_gc >= self.gc_interval
+            if run_gc:
+                self._last_gc = time.monotonic()
+        if run_gc:
+            self.collect_garbage()
+        root = self.workspaces_dir / job_id
+        root.mkdir(parents=True, exist_ok=True)
+        self.stats['created'] += 1
+        return JobWorkspace(self, job_id, root)
+
+    def release(self, job_id: str):
+        with self._lock:
+            self._active.discard(job_id)
+
+    def collect_garbage(self):
+        """Entfernt verwaiste Arbeitsverzeichnisse und abgelaufene Archive."""
+        now = time.time()
+        with self._lock:
+            active = set(self._active)
+        for workspace in self.workspaces_dir.iterdir():
+            try:
+                if workspace.name in active or now - workspace.stat().st_mtime < self.stale_seconds:
+                    continue
+                if workspace.is_dir():
+                    shutil.rmtree(workspace)
+                else:
+                    workspace.unlink()
+                self.stats['workspaces_removed'] += 1
+                logger.info(f"Verwaistes Arbeitsverzeichnis entfernt: {workspace}")
+            except OSError as e:
+                logger.warning(f"Arbeitsverzeichnis {workspace} konnte nicht entfernt werden: {e}")
+        for artifact in self.published_dir.iterdir():
+            try:
+                if now - artifact.stat().st_mtime < self.retention_seconds:
+                    continue
+                if artifact.is_dir():
+                    shutil.rmtree(artifact)
+                else:
+                    artifact.unlink()
+                self.stats['artifacts_removed'] += 1
+                logger.info(f"Abgelaufenes Artefakt entfernt: {artifact}")
+            except OSError as e:
+                logger.warning(f"Artefakt {artifact} konnte nicht entfernt werden: {e}")
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            active = len(self._active)
+        return {**self.stats, 'active': active}
+
+
+# ======================= Prozessweite Arbeitsverzeichnisse =======================
+
+_workspace_manager: Optional[WorkspaceManager] = None
+
+
+def get_workspace_manager() -> WorkspaceManager:
+    """Gibt die prozessweite Verwaltung der Job-Arbeitsverzeichnisse zurück."""
+    global _workspace_manager
+    if _workspace_manager is None:
+        _workspace_manager = WorkspaceManager()
+    return _workspace_manager
@@ -0,0 +1,394 @@
+# app/processing/zip_archive.py
+
+import hashlib
+import json
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import logger, ZIP_WORKERS, ZIP_STORE_RATIO, ZIP_COMPRESSION_LEVEL
+
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+
+# Ab diesen Werten braucht ein Eintrag bzw. das Archiv ZIP64-Felder
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_COUNT_LIMIT = 0xFFFF
+# Platzhalter in den klassischen Feldern, der echte Wert steht im ZIP64-Extra-Feld
+_ZIP64_MARKER = 0xFFFFFFFF
+_ZIP64_COUNT_MARKER = 0xFFFF
+
+# Stichproben für die Komprimierbarkeit (Anfang, Mitte, Ende der Datei)
+PROBE_SAMPLE_BYTES = 64 * 1024
+CHUNK_BYTES = 1024 * 1024
+
+_FLAG_UTF8 = 0x800
+_UNIX_FILE_ATTRIBUTES = (0o100644 << 16)
+
+
+def _dos_datetime(mtime: float) -> Tuple[int, int]:
+    t = time.localtime(max(mtime, 315532800))  # ZIP kennt keine Zeitstempel vor 1980
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), \
+        ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+
+class ZipMember:
+    """Ein fertig vorbereiteter Eintrag: Methode, CRC und Größen sind bekannt, bevor er geschrieben wird."""
+
+    def __init__(self, arcname: str, method: int, crc: int, compressed_size: int, size: int,
+                 mtime: float, source: str, temporary: bool = False):
+        self.arcname = arcname
+        self.method = method
+        self.crc = crc
+        self.compressed_size = compressed_size
+        self.size = size
+        self.mtime = mtime
+        self.source = source
+        self.temporary = temporary
+
+    def to_manifest(self, source_name: str) -> Dict:
+        return {'arcname': self.arcname, 'method': self.method, 'crc': self.crc,
+                'compressed_size': self.compressed_size, 'size': self.size, 'mtime': self.mtime,
+                'source': source_name}
+
+    @classmethod
+    def from_manifest(cls, entry: Dict, bundle_dir: str) -> 'ZipMember':
+        return cls(entry['arcname'], entry['method'], entry['crc'], entry['compressed_size'], entry['size'],
+                   entry['mtime'], os.path.join(bundle_dir, entry['source']))
+
+    @property
+    def zip64(self) -> bool:
+        return self.size >= ZIP64_LIMIT or self.compressed_size >= ZIP64_LIMIT
+
+    def local_header(self) -> bytes:
+        name = self.arcname.encode('utf-8')
+        dos_time, dos_date = _dos_datetime(self.mtime)
+        extra = b''
+        compressed_size, size = self.compressed_size, self.size
+        if self.zip64:
+            # Im lokalen Header stehen bei ZIP64 immer beide Größen im Extra-Feld
+            extra = struct.pack('<HHQQ', 0x0001, 16, self.size, self.compressed_size)
+            compressed_size = size = _ZIP64_MARKER
+        return struct.pack('<4sHHHHHLLLHH', b'PK\x03\x04', 45 if self.zip64 else 20, _FLAG_UTF8,
+                           self.method, dos_time, dos_date, self.crc, compressed_size, size,
+                           len(name), len(extra)) + name + extra
+
+    def central_entry(self, offset: int) -> bytes:
+        name = self.arcname.encode('utf-8')
+        dos_time, dos_date = _dos_datetime(self.mtime)
+        # Im zentralen Verzeichnis nur die übergelaufenen Felder, in fester Reihenfolge
+        values = []
+        size, compressed_size, header_offset = self.size, self.compressed_size, offset
+        if size >= ZIP64_LIMIT:
+            values.append(size)
+            size = _ZIP64_MARKER
+        if compressed_size >= ZIP64_LIMIT:
+            values.append(compressed_size)
+            compressed_size = _ZIP64_MARKER
+        if header_offset >= ZIP64_LIMIT:
+            values.append(header_offset)
+            header_offset = _ZIP64_MARKER
+        extra = struct.pack(f'<HH{len(values)}Q', 0x0001, 8 * len(values), *values) if values else b''
+        version = 45 if values else 20
+        return struct.pack('<4sHHHHHHLLLHHHHHLL', b'PK\x01\x02', (3 << 8) | version, version, _FLAG_UTF8,
+                           self.method, dos_time, dos_date, self.crc, compressed_size, size,
+                           len(name), len(extra), 0, 0, 0, _UNIX_FILE_ATTRIBUTES, header_offset) + name + extra
+
+
+def zip_end_records(entries: int, cd_offset: int, cd_size: int) -> bytes:
+    """Abschluss des Archivs hinter dem zentralen Verzeichnis (bei Bedarf mit ZIP64-Records)."""
+    records = b''
+    if entries >= ZIP64_COUNT_LIMIT or cd_offset >= ZIP64_LIMIT or cd_size >= ZIP64_LIMIT:
+        zip64_end_offset = cd_offset + cd_size
+        records += struct.pack('<4sQHHLLQQQQ', b'PK\x06\x06', 44, (3 << 8) | 45, 45, 0, 0,
+                               entries, entries, cd_size, cd_offset)
+        records += struct.pack('<4sLQL', b'PK\x06\x07', 0, zip64_end_offset, 1)
+        entries = _ZIP64_COUNT_MARKER if entries >= ZIP64_COUNT_LIMIT else entries
+        cd_offset = _ZIP64_MARKER if cd_offset >= ZIP64_LIMIT else cd_offset
+        cd_size = _ZIP64_MARKER if cd_size >= ZIP64_LIMIT else cd_size
+    return records + struct.pack('<4sHHHHLLH', b'PK\x05\x06', 0, 0, entries, entries, cd_size, cd_offset, 0)
+
+
+def _compressibility(path: str, size: int) -> float:
+    """Verhältnis komprimiert/roh über drei Stichproben (zlib Stufe 1). 1.0 = nicht komprimierbar."""
+    if size == 0:
+        return 1.0
+    offsets = sorted({0, max(0, size // 2 - PROBE_SAMPLE_BYTES // 2), max(0, size - PROBE_SAMPLE_BYTES)})
+    raw = compressed = 0
+    with open(path, 'rb') as f:
+        for offset in offsets:
+            f.seek(offset)
+            sample = f.read(PROBE_SAMPLE_BYTES)
+            raw += len(sample)
+            compressed += len(zlib.compress(sample, 1))
+    return compressed / raw if raw else 1.0
+
+
+def prepare_member(path: str, arcname: str, spool_dir: str, store_ratio: float = ZIP_STORE_RATIO,
+                   level: int = ZIP_COMPRESSION_LEVEL) -> ZipMember:
+    """
+    Bereitet eine Datei als ZIP-Eintrag vor. Lohnt sich Deflate laut Stichprobe nicht (z.B. bei
+    PDFs mit Flate-komprimierten Streams), wird die Datei unverändert gespeichert und nur die
+    CRC berechnet; sonst wird sie in eine temporäre Datei in spool_dir komprimiert.
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    crc = 0
+    if _compressibility(path, size) >= store_ratio:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_BYTES), b''):
+                crc = zlib.crc32(chunk, crc)
+        return ZipMember(arcname, ZIP_STORED, crc, size, size, stat.st_mtime, path)
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    fd, spool_path = tempfile.mkstemp(dir=spool_dir, suffix='.deflate')
+    try:
+        with os.fdopen(fd, 'wb') as out, open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_BYTES), b''):
+                crc = zlib.crc32(chunk, crc)
+                out.write(compressor.compress(chunk))
+            out.write(compressor.flush())
+            compressed_size = out.tell()
+    except BaseException:
+        os.remove(spool_path)
+        raise
+    if compressed_size >= size:
+        os.remove(spool_path)
+        return ZipMember(arcname, ZIP_STORED, crc, size, size, stat.st_mtime, path)
+    return ZipMember(arcname, ZIP_DEFLATED, crc, compressed_size, size, stat.st_mtime, spool_path, temporary=True)
+
+
+class _ZipBuilderBase:
+    """
+    Gemeinsame Grundlage der ZIP-Builder: Namen reservieren, Einträge im Thread-Pool vorbereiten
+    (CRC, ggf. Deflate; zlib gibt dabei den GIL frei) und den Durchsatz messen. Unterklassen
+    legen die vorbereiteten Einträge in _store() ab, das immer unter der Schreibsperre läuft.
+    """
+
+    def __init__(self, base_dir: str, spool_dir: str, workers: int = ZIP_WORKERS):
+        self.base_dir = base_dir
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self._spool_dir = spool_dir
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='zip')
+        self._names_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._names = set()
+        self._closed = False
+        # Durchsatz über die Zeit, in der mindestens ein Eintrag in Arbeit war (nicht die Jobdauer)
+        self._busy = 0
+        self._busy_since = 0.0
+        self.stats = {'files': 0, 'stored': 0, 'deflated': 0, 'bytes_in': 0, 'bytes_out': 0,
+                      'busy_seconds': 0.0}
+
+    def _arcname(self, path: str, arcname: Optional[str]) -> Optional[str]:
+        """Reserviert den Namen im Archiv; None, wenn er schon vergeben ist."""
+        arcname = arcname or os.path.relpath(path, self.base_dir)
+        with self._names_lock:
+            if arcname in self._names:
+                return None
+            self._names.add(arcname)
+        return arcname
+
+    def submit(self, path: str, arcname: Optional[str] = None) -> Future:
+        """Fügt eine Datei im Thread-Pool hinzu. Das Future liefert False, wenn der Name schon im Archiv ist."""
+        arcname = self._arcname(path, arcname)
+        if arcname is None:
+            future = Future()
+            future.set_result(False)
+            return future
+        return self._executor.submit(self._add, path, arcname)
+
+    def add(self, path: str, arcname: Optional[str] = None) -> bool:
+        """Fügt eine Datei im aufrufenden Thread hinzu."""
+        arcname = self._arcname(path, arcname)
+        return self._add(path, arcname) if arcname is not None else False
+
+    def _add(self, path: str, arcname: str) -> bool:
+        with self._names_lock:
+            if self._busy == 0:
+                self._busy_since = time.monotonic()
+            self._busy += 1
+        try:
+            member = prepare_member(path, arcname, self._spool_dir)
+            try:
+                with self._write_lock:
+                    self._store(member)
+                    self.stats['files'] += 1
+                    self.stats['stored' if member.method == ZIP_STORED else 'deflated'] += 1
+                    self.stats['bytes_in'] += member.size
+                    self.stats['bytes_out'] += member.compressed_size
+            finally:
+                if member.temporary and os.path.exists(member.source):
+                    os.remove(member.source)
+            return True
+        finally:
+            with self._names_lock:
+                self._busy -= 1
+                if self._busy == 0:
+                    self.stats['busy_seconds'] += time.monotonic() - self._busy_since
+
+    def _store(self, member: ZipMember):
+        raise NotImplementedError
+
+    def close(self):
+        """Wartet auf ausstehende Einträge und schließt das Archiv ab."""
+        if self._closed:
+            return
+        self._closed = True
+        self._executor.shutdown(wait=True)
+        with self._write_lock:
+            self._finalize()
+        stats = self.get_stats()
+        logger.info(
+            f"ZIP-Archiv erstellt: {self._target()} ({stats['files']} Dateien, {stats['stored']} gespeichert, "
+            f"{stats['deflated']} komprimiert, {stats['throughput_mb_s']} MB/s)"
+        )
+
+    def _finalize(self):
+        raise NotImplementedError
+
+    def _target(self) -> str:
+        raise NotImplementedError
+
+    def get_stats(self) -> Dict:
+        seconds = self.stats['busy_seconds']
+        return {
+            **self.stats,
+            'busy_seconds': round(seconds, 2),
+            'workers': self.workers,
+            'throughput_mb_s': round(self.stats['bytes_in'] / (1024 ** 2) / seconds, 1) if seconds else None,
+        }
+
+
+class ZipArchiveBuilder(_ZipBuilderBase):
+    """
+    Baut ein ZIP-Archiv aus einzeln hinzugefügten Dateien.
+
+    Pro Datei entscheidet eine kurze Stichprobe zwischen STORED und DEFLATE; bereits komprimierte
+    PDFs werden so nur kopiert. Nur das Anhängen der fertigen Einträge an die Archivdatei ist
+    serialisiert. Große Archive und Einträge werden als ZIP64 geschrieben.
+    """
+
+    def __init__(self, zip_path: str, base_dir: Optional[str] = None, workers: int = ZIP_WORKERS):
+        super().__init__(base_dir or os.path.dirname(zip_path), os.path.dirname(os.path.abspath(zip_path)), workers)
+        self.zip_path = zip_path
+        self._file = open(zip_path, 'wb')
+        self._members: List[Tuple[ZipMember, int]] = []
+        self._offset = 0
+
+    def _store(self, member: ZipMember):
+        offset = self._offset
+        header = member.local_header()
+        self._file.write(header)
+        with open(member.source, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_BYTES), b''):
+                self._file.write(chunk)
+        self._offset += len(header) + member.compressed_size
+        self._members.append((member, offset))
+
+    def _finalize(self):
+        central = b''.join(member.central_entry(offset) for member, offset in self._members)
+        self._file.write(central)
+        self._file.write(zip_end_records(len(self._members), self._offset, len(central)))
+        self._file.close()
+
+    def _target(self) -> str:
+        return self.zip_path
+
+
+class ZipBundleBuilder(_ZipBuilderBase):
+    """
+    Bereitet ein ZIP-Archiv vor, ohne es zu schreiben: Die Einträge liegen fertig (unverändert
+    per Hardlink oder bereits Deflate-komprimiert) in bundle_dir/members, CRCs und Größen in
+    bundle_dir/manifest.json. ZipStream setzt daraus beim Download das Archiv zusammen, mit
+    bekannter Gesamtlänge und beliebigen Byte-Bereichen, ohne eine zweite Kopie auf der Platte.
+    """
+
+    def __init__(self, bundle_dir: str, base_dir: Optional[str] = None, workers: int = ZIP_WORKERS):
+        self.bundle_dir = bundle_dir
+        self.members_dir = os.path.join(bundle_dir, 'members')
+        os.makedirs(self.members_dir, exist_ok=True)
+        super().__init__(base_dir or os.path.dirname(bundle_dir), self.members_dir, workers)
+        self._entries: List[Dict] = []
+
+    def _store(self, member: ZipMember):
+        suffix = '.deflate' if member.method == ZIP_DEFLATED else os.path.splitext(member.source)[1]
+        source_name = os.path.join('members', f"{len(self._entries):06d}{suffix}")
+        target = os.path.join(self.bundle_dir, source_name)
+        if member.temporary:
+            os.replace(member.source, target)
+        else:
+            try:
+                os.link(member.source, target)
+            except OSError:
+                shutil.copyfile(member.source, target)
+        self._entries.append(member.to_manifest(source_name))
+
+    def _finalize(self):
+        manifest_path = os.path.join(self.bundle_dir, 'manifest.json')
+        with open(f"{manifest_path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump({'members': self._entries, 'created': time.time()}, f)
+        os.replace(f"{manifest_path}.tmp", manifest_path)
+
+    def _target(self) -> str:
+        return self.bundle_dir
+
+
+class ZipStream:
+    """
+    Liefert das ZIP-Archiv eines Bundles (siehe ZipBundleBuilder) als Byte-Strom. Lokale Header,
+    zentrales Verzeichnis und Gesamtgröße ergeben sich allein aus dem Manifest, daher kann jeder
+    Byte-Bereich (HTTP Range) ausgeliefert werden, ohne das Archiv vorher zu erzeugen.
+    """
+
+    def __init__(self, bundle_dir: str):
+        with open(os.path.join(bundle_dir, 'manifest.json'), 'rb') as f:
+            raw = f.read()
+        manifest = json.loads(raw)
+        self.etag = hashlib.sha256(raw).hexdigest()[:32]
+        self.last_modified = manifest['created']
+        members = [ZipMember.from_manifest(entry, bundle_dir) for entry in manifest['members']]
+        # Segmente: (Offset, feste Bytes oder None, Eintrag dessen Daten aus der Datei kommen)
+        self._segments: List[Tuple[int, Optional[bytes], Optional[ZipMember]]] = []
+        central = []
+        offset = 0
+        for member in members:
+            header = member.local_header()
+            central.append(member.central_entry(offset))
+            self._segments.append((offset, header, None))
+            offset += len(header)
+            self._segments.append((offset, None, member))
+            offset += member.compressed_size
+        directory = b''.join(central)
+        tail = directory + zip_end_records(len(members), offset, len(directory))
+        self._segments.append((offset, tail, None))
+        self.size = offset + len(tail)
+
+    def iter_range(self, start: int = 0, stop: Optional[int] = None) -> Iterator[bytes]:
+        """Liefert die Bytes [start, stop) des Archivs in Blöcken."""
+        stop = self.size if stop is None else min(stop, self.size)
+        for offset, data, member in self._segments:
+            length = len(data) if data is not None else member.compressed_size
+            if offset + length <= start:
+                continue
+            if offset >= stop:
+                break
+            low, high = max(start, offset) - offset, min(stop, offset + length) - offset
+            if data is not None:
+                yield data[low:high]
+                continue
+            with open(member.source, 'rb') as f:
+                f.seek(low)
+                remaining = high - low
+                while remaining:
+                    chunk = f.read(min(CHUNK_BYTES, remaining))
+                    if not chunk:
+                        raise OSError(f"Eintrag {member.arcname} ist kürzer als im Manifest angegeben.")
+                    remaining -= len(chunk)
+                    yield chunk
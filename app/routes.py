@@ -3,28 +3,39 @@
 import os
 import logging
 import hashlib
+import math
 import asyncio
-import shutil
 import threading
 import time
 import uuid
-from typing import List
+from typing import Dict, List
 
-from flask import Blueprint, request, render_template, redirect, url_for, jsonify, send_from_directory, send_file
+from flask import Blueprint, Response, request, render_template, redirect, url_for, jsonify, send_from_directory
 import json
 
-from app.processing.website_downloader  import (
-    PDFConverter,
-    merge_pdfs_with_bookmarks,
-    create_zip_archive
-)
+from app.processing import adaptive_concurrency, browser_pool, circuit_breaker, pdf_merge, pdf_optimizer, preview, \
+    render_cache, render_farm, render_metrics, render_scheduler, resource_policy, snapshot_store, workspace
+from app.processing.website_downloader  import PDFConverter, get_render_flight_stats
+from app.processing.pdf_optimizer import get_pdf_optimizer
+from app.processing.workspace import get_workspace_manager
+from app.processing.pdf_pipeline import StreamingPdfPipeline
+from app.processing.preview import get_preview_renderer
+from app.processing.browser_pool import warm_up_browser_pool
+from app.processing.render_farm import get_render_farm
+from app.processing.render_scheduler import get_render_scheduler
+from app.processing.render_metrics import collect_page_metrics, get_metrics_registry, summarize
+from app.processing.render_loop import render_loop
+from app.processing.render_cache import get_render_cache
+from app.processing.zip_archive import ZipStream
 from app.scrapers.scraping_helpers import (
     scrape_lock,
     scrape_tasks,
     run_scrape_task,  # Stelle sicher, dass dies eine async Funktion ist
     render_links_recursive
 )
-from config import MAPPING_CACHE_DIR, logger, OUTPUT_PDFS_DIR, BASE_DIR, TEMPLATES_DIR, STATIC_DIR
+from config import MAPPING_CACHE_DIR, logger, BASE_DIR, TEMPLATES_DIR, STATIC_DIR, \
+    BROWSER_POOL_WARMUP, RENDER_MAX_CONCURRENCY, PDF_OPTIMIZE_DEFAULT, PDF_FAST_WEB_VIEW_DEFAULT, PREVIEW_CACHE_DIR, PREVIEW_MAX_URLS, \
+    RENDER_CACHE_ENABLED
 
 # Blueprint initialisieren
 main = Blueprint('main', __name__, template_folder=TEMPLATES_DIR, static_folder=STATIC_DIR)
@@ -32,6 +43,16 @@ main = Blueprint('main', __name__, template_folder=TEMPLATES_DIR, static_folder=
 # Task Management
 pdf_tasks = {}
 pdf_lock = threading.Lock()
+# Laufende Pipelines pro Task, für den Merge-Fortschritt auf der Statusseite
+pdf_pipelines = {}
+preview_tasks = {}
+preview_lock = threading.Lock()
+
+# Browser-Pool beim ersten Request vorwärmen, damit der erste PDF-Job keinen Kaltstart hat
+@main.before_app_request
+def warm_up_render_resources():
+    if BROWSER_POOL_WARMUP:
+        warm_up_browser_pool()
 
 # Index Route
 @main.route('/')
@@ -164,6 +185,15 @@ def start_pdf_task():
         data = request.get_json()
         selected_links = data.get('selected_links', [])
         conversion_mode = data.get('conversion_mode', 'collapsed')  # Standard: collapsed
+        # Optionale Job-Einstellungen
+        options = {
+            # Render-Farm erzwingen (True) oder ausschließen (False); sonst nach Jobgröße
+            'render_farm': data.get('render_farm'),
+            # PDFs verkleinern (Bilder herunterrechnen, Streams neu komprimieren)
+            'optimize_pdfs': bool(data.get('optimize_pdfs', PDF_OPTIMIZE_DEFAULT)),
+            # Zusammengeführte PDFs linearisieren, damit Viewer die erste Seite sofort anzeigen
+            'fast_web_view': bool(data.get('fast_web_view', PDF_FAST_WEB_VIEW_DEFAULT)),
+        }
 
         if not selected_links:
             return jsonify({'status': 'error', 'message': 'Keine Links ausgewählt.'}), 400
@@ -172,11 +202,20 @@ def start_pdf_task():
             return jsonify({'status': 'error',
                             'message': 'Ungültiger Konvertierungsmodus. Wähle entweder "collapsed", "expanded" oder "both".'}), 400
 
+        # Anteil an den Render-Slots relativ zu anderen Jobs (gewichtetes Round-Robin)
+        try:
+            weight = float(data.get('weight', 1.0))
+        except (TypeError, ValueError):
+            weight = None
+        if weight is None or not math.isfinite(weight):
+            return jsonify({'status': 'error', 'message': 'Ungültiges Gewicht, erwartet wird eine Zahl.'}), 400
+        options['weight'] = min(max(weight, 0.1), 10.0)
+
         # Generiere eine eindeutige Task-ID
         task_id = str(uuid.uuid4())
 
         # Starte den PDF-Task im Hintergrund mit dem conversion_mode
-        threading.Thread(target=run_pdf_task, args=(task_id, selected_links, conversion_mode)).start()
+        threading.Thread(target=run_pdf_task, args=(task_id, selected_links, conversion_mode, options)).start()
 
         logger.info(f"PDF-Task gestartet mit Task-ID: {task_id} und Modus: {conversion_mode}")
 
@@ -186,12 +225,13 @@ def start_pdf_task():
         logger.error(f"Fehler beim Starten des PDF-Tasks: {e}")
         return jsonify({'status': 'error', 'message': 'Fehler beim Erstellen des PDF-Tasks'}), 500
 
-def run_pdf_task(task_id: str, urls: List[str], conversion_mode: str):
+def run_pdf_task(task_id: str, urls: List[str], conversion_mode: str, options: Dict = None):
     with pdf_lock:
         pdf_tasks[task_id] = {'status': 'running', 'result': {}, 'error': None}
 
     try:
-        asyncio.run(_run_pdf_task(task_id, urls, conversion_mode))
+        # Alle Jobs laufen auf dem gemeinsamen Render-Loop, damit sie sich den Browser-Pool teilen
+        render_loop.run(_run_pdf_task(task_id, urls, conversion_mode, options or {}))
 
     except Exception as e:
         logger.error(f"Fehler bei PDF-Task {task_id}: {e}")
@@ -199,66 +239,84 @@ def run_pdf_task(task_id: str, urls: List[str], conversion_mode: str):
             pdf_tasks[task_id]['status'] = 'failed'
             pdf_tasks[task_id]['error'] = str(e)
 
-async def _run_pdf_task(task_id: str, urls: List[str], conversion_mode: str):
+async def _run_pdf_task(task_id: str, urls: List[str], conversion_mode: str, options: Dict):
+    workspace = None
     try:
-        pdf_converter = PDFConverter(max_concurrent_tasks=20)
-        await pdf_converter.initialize()
-
-        pdf_entries = []
-
-        if conversion_mode == 'collapsed':
-            # Code für collapsed PDFs
-            logger.info(f"Starte die Konvertierung der URLs zu PDFs (collapsed) für Task-ID: {task_id}.")
-            collapsed_results = await pdf_converter.convert_urls_to_pdfs(urls, expanded=False)
-            merged_collapsed_pdf = os.path.join(OUTPUT_PDFS_DIR, f"combined_pdfs_collapsed_{task_id}.pdf")
-            merge_pdfs_with_bookmarks(collapsed_results, merged_collapsed_pdf)
-        elif conversion_mode == 'expanded':
-            # Code für expanded PDFs
-            logger.info(f"Starte die Konvertierung der URLs zu PDFs (expanded) für Task-ID: {task_id}.")
-            expanded_results = await pdf_converter.convert_urls_to_pdfs(urls, expanded=True)
-            merged_expanded_pdf = os.path.join(OUTPUT_PDFS_DIR, f"combined_pdfs_expanded_{task_id}.pdf")
-            merge_pdfs_with_bookmarks(expanded_results, merged_expanded_pdf)
-        elif conversion_mode == 'both':
-            # Code für beide PDFs
-            logger.info(
-                f"Starte die Konvertierung der URLs zu PDFs (both collapsed and expanded) für Task-ID: {task_id}.")
-
-            # Collapsed PDFs generieren
-            collapsed_results = await pdf_converter.convert_urls_to_pdfs(urls, expanded=False)
-            merged_collapsed_pdf = os.path.join(OUTPUT_PDFS_DIR, f"combined_pdfs_collapsed_{task_id}.pdf")
-            merge_pdfs_with_bookmarks(collapsed_results, merged_collapsed_pdf)
-
-            # Expanded PDFs generieren
-            expanded_results = await pdf_converter.convert_urls_to_pdfs(urls, expanded=True)
-            merged_expanded_pdf = os.path.join(OUTPUT_PDFS_DIR, f"combined_pdfs_expanded_{task_id}.pdf")
-            merge_pdfs_with_bookmarks(expanded_results, merged_expanded_pdf)
+        # Eigenes Arbeitsverzeichnis: parallele Jobs teilen sich keine Zwischendateien
+        workspace = await asyncio.to_thread(get_workspace_manager().create, task_id)
+        pdf_converter = PDFConverter(max_concurrent_tasks=RENDER_MAX_CONCURRENCY, job_id=task_id,
+                                     job_weight=options.get('weight', 1.0), output_dir=workspace.path())
+        render_farm = get_render_farm()
+        if render_farm.should_use(len(urls), options.get('render_farm')):
+            # Große Jobs auf mehrere Prozesse mit eigenem Browser verteilen
+            logger.info(f"Task-ID {task_id}: Rendern über die Render-Farm ({render_farm.workers} Worker).")
+            renderer = render_farm
+            render_kwargs = {'output_dir': workspace.path(), 'lease_owner': task_id,
+                             'job_weight': options.get('weight', 1.0)}
+        else:
+            await pdf_converter.initialize()
+            renderer = pdf_converter
+            render_kwargs = {}
+
+        modes = ['collapsed', 'expanded'] if conversion_mode == 'both' else [conversion_mode]
+        merged_paths = {
+            mode: workspace.path(f"combined_pdfs_{mode}_{task_id}.pdf") for mode in modes
+        }
+        # Vorbereitete ZIP-Einträge; das Archiv wird erst beim Download zusammengesetzt
+        bundle_dir = workspace.path('bundle')
+
+        # Jedes fertige PDF wird in URL-Reihenfolge sofort zusammengeführt, ins ZIP gelegt und gelöscht
+        optimizer = get_pdf_optimizer() if options.get('optimize_pdfs') else None
+        pipeline = StreamingPdfPipeline(merged_paths, bundle_dir, base_dir=workspace.path(), optimizer=optimizer,
+                                        linearize=options.get('fast_web_view', False))
+        await pipeline.start()
+        with pdf_lock:
+            pdf_pipelines[task_id] = pipeline
+        page_metrics = []
+
+        try:
+            if conversion_mode == 'both':
+                logger.info(
+                    f"Starte die Konvertierung der URLs zu PDFs (both collapsed and expanded) für Task-ID: {task_id}.")
+                # Beide Varianten mit nur einem Seitenaufruf pro URL generieren
+                collapsed_results, expanded_results = await renderer.convert_urls_to_pdfs_both(
+                    urls, sink=pipeline, **render_kwargs
+                )
+                page_metrics += collect_page_metrics(collapsed_results, 'collapsed')
+                page_metrics += collect_page_metrics(expanded_results, 'expanded')
+            else:
+                logger.info(f"Starte die Konvertierung der URLs zu PDFs ({conversion_mode}) für Task-ID: {task_id}.")
+                results = await renderer.convert_urls_to_pdfs(
+                    urls, expanded=(conversion_mode == 'expanded'), sink=pipeline, **render_kwargs
+                )
+                page_metrics += collect_page_metrics(results, conversion_mode)
+
+            logger.info(f"Schließe zusammengeführte PDFs und ZIP-Archiv ab für Task-ID: {task_id}.")
+            pipeline_stats = await pipeline.finish()
+        except Exception:
+            await pipeline.abort()
+            raise
+        finally:
+            with pdf_lock:
+                pdf_pipelines.pop(task_id, None)
 
         await pdf_converter.close()
 
-        # Erstelle ein ZIP-Archiv mit den ausgewählten PDFs
-        logger.info(f"Erstelle ein ZIP-Archiv für Task-ID: {task_id}.")
-        zip_filename = os.path.join(OUTPUT_PDFS_DIR, f"output_pdfs_{task_id}.zip")
-        create_zip_archive(OUTPUT_PDFS_DIR, zip_filename)
-
-        # Bereinigen der Ausgabeordner, um nur das ZIP-Archiv zu behalten
-        logger.info(f"Bereinige die Ausgabeordner für Task-ID: {task_id}, um nur das ZIP-Archiv zu behalten.")
-        for item in os.listdir(OUTPUT_PDFS_DIR):
-            item_path = os.path.join(OUTPUT_PDFS_DIR, item)
-            if item_path != zip_filename:
-                try:
-                    if os.path.isfile(item_path) or os.path.islink(item_path):
-                        os.remove(item_path)
-                        logger.info(f"Datei entfernt: {item_path}")
-                    elif os.path.isdir(item_path):
-                        shutil.rmtree(item_path)
-                        logger.info(f"Verzeichnis entfernt: {item_path}")
-                except Exception as e:
-                    logger.error(f"Fehler beim Entfernen von {item_path}: {e}")
+        # Phasenzeiten pro Seite im Job ablegen und in die prozessweite Statistik übernehmen
+        get_metrics_registry().record(page_metrics)
+
+        # Das fertige Bundle atomar veröffentlichen, erst danach ist es zum Download sichtbar
+        bundle_dir = await asyncio.to_thread(workspace.publish, bundle_dir, task_id)
 
         # Update Task Info
         with pdf_lock:
             pdf_tasks[task_id]['status'] = 'completed'
-            pdf_tasks[task_id]['result'] = {'zip_file': zip_filename}
+            pdf_tasks[task_id]['result'] = {
+                'bundle_dir': bundle_dir,
+                'zip_name': f"output_pdfs_{task_id}.zip",
+                'metrics': {'summary': summarize(page_metrics), 'pages': page_metrics},
+                'pipeline': pipeline_stats,
+            }
 
         logger.info(f"PDF-Task abgeschlossen: {task_id}")
 
@@ -267,7 +325,81 @@ async def _run_pdf_task(task_id: str, urls: List[str], conversion_mode: str):
         with pdf_lock:
             pdf_tasks[task_id]['status'] = 'failed'
             pdf_tasks[task_id]['error'] = str(e)
+    finally:
+        # Zwischenstände entfernen; nur das veröffentlichte Archiv bleibt
+        if workspace is not None:
+            await asyncio.to_thread(workspace.discard)
+        # Referenzen des Jobs auf gespeicherte PDFs freigeben (erst jetzt dürfen sie verdrängt werden)
+        if RENDER_CACHE_ENABLED:
+            await asyncio.to_thread(get_render_cache().release_job, task_id)
+
+
+# Route zum Starten einer Vorschau (Viewport-Screenshots der Auswahl vor dem PDF-Job)
+@main.route('/start_preview', methods=['POST'])
+def start_preview():
+    data = request.get_json() or {}
+    selected_links = list(dict.fromkeys(data.get('selected_links', [])))[:PREVIEW_MAX_URLS]
+    conversion_mode = data.get('conversion_mode', 'collapsed')
+
+    if not selected_links:
+        return jsonify({'status': 'error', 'message': 'Keine Links ausgewählt.'}), 400
+
+    task_id = str(uuid.uuid4())
+    with preview_lock:
+        preview_tasks[task_id] = {
+            'status': 'running',
+            'previews': {url: {'url': url, 'status': 'pending'} for url in selected_links},
+        }
+    # Bei "Beide" zeigt die Vorschau die expanded-Variante (sie enthält mehr Inhalt)
+    expanded = conversion_mode in ('expanded', 'both')
+    threading.Thread(target=run_preview_task, args=(task_id, selected_links, expanded)).start()
+    logger.info(f"Vorschau gestartet mit Task-ID: {task_id} ({len(selected_links)} URLs)")
+    return jsonify({'status': 'success', 'task_id': task_id}), 200
+
+def run_preview_task(task_id: str, urls: List[str], expanded: bool):
+    def on_result(result: Dict):
+        # Jede fertige Vorschau sofort sichtbar machen, nicht erst am Ende des Auftrags
+        with preview_lock:
+            preview_tasks[task_id]['previews'][result['url']] = result
+
+    async def run():
+        renderer = get_preview_renderer()
+        await renderer.converter.initialize()
+        await renderer.render_many(f"preview-{task_id}", urls, expanded=expanded, on_result=on_result)
 
+    try:
+        render_loop.run(run())
+        with preview_lock:
+            preview_tasks[task_id]['status'] = 'completed'
+    except Exception as e:
+        logger.error(f"Fehler bei Vorschau-Task {task_id}: {e}")
+        with preview_lock:
+            preview_tasks[task_id]['status'] = 'failed'
+            preview_tasks[task_id]['error'] = str(e)
+
+# API-Endpunkt für den Stand einer Vorschau (fertige Bilder erscheinen fortlaufend)
+@main.route('/get_preview_status/<task_id>', methods=['GET'])
+def get_preview_status(task_id):
+    with preview_lock:
+        task_info = preview_tasks.get(task_id)
+        if not task_info:
+            return jsonify({'status': 'not_found'}), 404
+        previews = [dict(preview) for preview in task_info['previews'].values()]
+
+    for preview in previews:
+        if preview['status'] == 'success':
+            preview['image_url'] = url_for('main.preview_image', key=preview['key'])
+    return jsonify({'status': task_info['status'], 'error': task_info.get('error'), 'previews': previews})
+
+# Vorschaubild aus dem Vorschau-Cache ausliefern
+@main.route('/preview_image/<key>.jpg', methods=['GET'])
+def preview_image(key):
+    if len(key) != 64 or any(c not in '0123456789abcdef' for c in key):
+        return jsonify({'status': 'not_found'}), 404
+    response = send_from_directory(PREVIEW_CACHE_DIR, f"{key}.jpg", mimetype='image/jpeg')
+    # Der Schlüssel enthält URL und Render-Einstellungen, das Bild ist unter ihm unveränderlich
+    response.cache_control.max_age = 3600
+    return response
 
 # Route zur Anzeige des PDF-Status
 @main.route('/pdf_status/<task_id>', methods=['GET'])
@@ -296,6 +428,7 @@ def pdf_status(task_id):
 def get_pdf_status(task_id):
     with pdf_lock:
         task_info = pdf_tasks.get(task_id)
+        pipeline = pdf_pipelines.get(task_id)
 
     if not task_info:
         logger.debug(f"PDF Task {task_id} nicht gefunden.")
@@ -305,11 +438,29 @@ def get_pdf_status(task_id):
     response_data = {
         'status': task_info['status'],
         'error': task_info.get('error', None),
+        # Position in der globalen Render-Warteschlange und Fortschritt (solange der Job rendert)
+        'queue': get_render_scheduler().get_job_status(task_id),
+        # Fortschritt der Zusammenführung pro Modus (collapsed/expanded)
+        'merge': pipeline.get_merge_progress() if pipeline else None,
     }
 
     logger.debug(f"PDF Task {task_id} Status: {response_data}")
     return jsonify(response_data)
 
+# API-Endpunkt für die Render-Metriken eines Jobs (Phasenzeiten, Bytes, Requests pro URL)
+@main.route('/pdf_metrics/<task_id>', methods=['GET'])
+def pdf_metrics(task_id):
+    with pdf_lock:
+        task_info = pdf_tasks.get(task_id)
+
+    if not task_info:
+        return jsonify({'status': 'not_found'}), 404
+
+    return jsonify({
+        'status': task_info['status'],
+        'metrics': task_info.get('result', {}).get('metrics'),
+    })
+
 # Route zur Anzeige des PDF-Ergebnisses
 @main.route('/pdf_result/<task_id>', methods=['GET'])
 def pdf_result(task_id):
@@ -333,17 +484,17 @@ def pdf_result(task_id):
         logger.debug(f"Task {task_id} not yet completed, redirecting to status page.")
         return redirect(url_for('main.pdf_status', task_id=task_id))
 
-    # Check if zip_file exists
-    zip_file_path = task_info['result'].get('zip_file')
-    logger.debug(f"ZIP file path for task {task_id}: {zip_file_path}")
-    if not zip_file_path or not os.path.exists(zip_file_path):
-        logger.error(f"ZIP file not found for Task {task_id}: {zip_file_path}")
+    # Check if the bundle exists
+    bundle_dir = task_info['result'].get('bundle_dir')
+    logger.debug(f"ZIP bundle for task {task_id}: {bundle_dir}")
+    if not bundle_dir or not os.path.exists(os.path.join(bundle_dir, 'manifest.json')):
+        logger.error(f"ZIP bundle not found for Task {task_id}: {bundle_dir}")
         return render_template('error.html', message='ZIP file not found.'), 404
 
     logger.debug(f"Rendering result page for task {task_id}")
     return render_template(
         'convert_result.html',
-        zip_filename=os.path.basename(zip_file_path),
+        zip_filename=task_info['result']['zip_name'],
         task_id=task_id
     )
 
@@ -364,18 +515,63 @@ def download_pdfs(task_id):
         logger.warning(f"PDF Task {task_id} is not yet completed.")
         return render_template('error.html', message='PDF Task is not yet completed.'), 400
 
-    zip_file_path = task_info['result'].get('zip_file')
-    logger.debug(f"ZIP file path for task {task_id}: {zip_file_path}")
+    bundle_dir = task_info['result'].get('bundle_dir')
+    logger.debug(f"ZIP bundle for task {task_id}: {bundle_dir}")
 
-    if not zip_file_path or not os.path.exists(zip_file_path):
-        logger.error(f"ZIP file not found for Task {task_id}: {zip_file_path} (Absolute path: {os.path.abspath(zip_file_path)})")
+    try:
+        stream = ZipStream(bundle_dir)
+    except (OSError, TypeError, ValueError, KeyError) as e:
+        logger.error(f"ZIP bundle not found for Task {task_id}: {bundle_dir} ({e})")
         return render_template('error.html', message='ZIP file not found.'), 404
 
-    # Send the file using send_file with the absolute path
-    return send_file(
-        os.path.abspath(zip_file_path),
-        as_attachment=True,
-        download_name=os.path.basename(zip_file_path),
-        mimetype='application/zip'
-    )
-
+    # Das Archiv wird beim Lesen zusammengesetzt; Länge und Bereiche sind aus dem Manifest bekannt
+    status, start, stop = 200, 0, stream.size
+    if_range = request.if_range
+    if request.range and (if_range.etag is None and if_range.date is None or if_range.etag == stream.etag):
+        byte_range = request.range.range_for_length(stream.size)
+        if byte_range is not None:
+            status, (start, stop) = 206, byte_range
+        elif len(request.range.ranges) == 1:
+            response = Response(status=416)
+            response.headers['Content-Range'] = f"bytes */{stream.size}"
+            return response
+
+    response = Response(stream.iter_range(start, stop), status=status, mimetype='application/zip',
+                        direct_passthrough=True)
+    response.headers['Content-Length'] = str(stop - start)
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.set_etag(stream.etag)
+    response.last_modified = stream.last_modified
+    response.headers['Content-Disposition'] = f"attachment; filename={task_info['result']['zip_name']}"
+    if status == 206:
+        response.headers['Content-Range'] = f"bytes {start}-{stop - 1}/{stream.size}"
+    return response
+
+# API-Endpunkt für Render-Statistiken (Browser-Pool)
+def _singleton_stats(module, name: str):
+    """
+    Statistik eines prozessweiten Singletons, ohne es anzulegen: None, solange es noch nicht
+    erzeugt wurde oder abgeschaltet ist (z.B. Render-Cache mit RENDER_CACHE_ENABLED=False).
+    """
+    instance = getattr(module, name, None)
+    return instance.get_stats() if instance is not None else None
+
+
+@main.route('/render_stats', methods=['GET'])
+def render_stats():
+    return jsonify({
+        'browser_pool': _singleton_stats(browser_pool, '_browser_pool'),
+        'resource_policy': _singleton_stats(resource_policy, '_resource_policy'),
+        'render_cache': _singleton_stats(render_cache, '_render_cache'),
+        'render_flights': get_render_flight_stats(),
+        'concurrency': _singleton_stats(adaptive_concurrency, '_render_limiter'),
+        'scheduler': _singleton_stats(render_scheduler, '_render_scheduler'),
+        'render_farm': _singleton_stats(render_farm, '_render_farm'),
+        'render_metrics': _singleton_stats(render_metrics, '_metrics_registry'),
+        'pdf_optimizer': _singleton_stats(pdf_optimizer, '_pdf_optimizer'),
+        'pdf_merge': _singleton_stats(pdf_merge, '_merge_pool'),
+        'workspaces': _singleton_stats(workspace, '_workspace_manager'),
+        'circuit_breaker': _singleton_stats(circuit_breaker, '_circuit_breaker'),
+        'previews': _singleton_stats(preview, '_preview_renderer'),
+        'snapshots': _singleton_stats(snapshot_store, '_snapshot_store'),
+    })
@@ -13,7 +13,8 @@ import aiofiles
 
 # Am Anfang von fetch_content.py
 from config import TABOO_JSON_PATH, COOKIES_SELECTOR_JSON_PATH, EXCLUDE_SELECTORS_JSON_PATH, MAPPING_CACHE_DIR, \
-    CACHE_DIR, OUTPUT_MAPPING_PATH
+    CACHE_DIR, OUTPUT_MAPPING_PATH, SNAPSHOT_STORE_ENABLED
+from app.processing.snapshot_store import get_snapshot_store
 
 # Logging konfigurieren
 logging.basicConfig(
@@ -130,6 +131,10 @@ async def extract_links(url, client, url_mapping, base_netloc, level=0, max_dept
         logger.debug(f"Inhalt ist None für URL: {normalized_url}")
         return
 
+    # HTML für das spätere Rendern aufbewahren, damit das Hauptdokument nicht erneut geladen wird
+    if content and SNAPSHOT_STORE_ENABLED:
+        await asyncio.to_thread(get_snapshot_store().put, normalized_url, content, content_type)
+
     parser = html.fromstring(content) if content else None  # Verwenden von lxml
 
     page_id = url_to_filename(normalized_url)
@@ -163,6 +163,12 @@ document.addEventListener('DOMContentLoaded', function () {
         const modeRadio = document.querySelector('input[name="conversion_mode"]:checked');
         const conversionMode = modeRadio ? modeRadio.value : 'collapsed';
 
+        // Optionale PDF-Einstellungen
+        const optimizeCheckbox = document.getElementById('optimize-pdfs');
+        const optimizePdfs = optimizeCheckbox ? optimizeCheckbox.checked : false;
+        const fastWebViewCheckbox = document.getElementById('fast-web-view');
+        const fastWebView = fastWebViewCheckbox ? fastWebViewCheckbox.checked : false;
+
         // Ladeanzeige einblenden
         const loadingIndicator = document.getElementById('loading-indicator');
         loadingIndicator.style.display = 'block';
@@ -173,7 +179,12 @@ document.addEventListener('DOMContentLoaded', function () {
                 headers: {
                     'Content-Type': 'application/json',
                 },
-                body: JSON.stringify({ selected_links: selectedLinks, conversion_mode: conversionMode }),
+                body: JSON.stringify({
+                    selected_links: selectedLinks,
+                    conversion_mode: conversionMode,
+                    optimize_pdfs: optimizePdfs,
+                    fast_web_view: fastWebView,
+                }),
             });
 
             const data = await response.json();
@@ -199,6 +210,88 @@ document.addEventListener('DOMContentLoaded', function () {
         convertButton.addEventListener('click', startPdfConversion);
     }
 
+    // Vorschau: Viewport-Screenshots der Auswahl, fortlaufend angezeigt
+    let previewTimer = null;
+
+    function renderPreviews(previews) {
+        const grid = document.getElementById('preview-grid');
+        grid.innerHTML = '';
+        previews.forEach(preview => {
+            const item = document.createElement('div');
+            item.classList.add('preview-item', preview.status);
+            if (preview.status === 'success') {
+                const img = document.createElement('img');
+                img.src = preview.image_url;
+                img.alt = preview.url;
+                img.loading = 'lazy';
+                item.appendChild(img);
+            }
+            const caption = document.createElement('div');
+            caption.textContent = preview.status === 'error'
+                ? `${preview.url} (Fehler)` : preview.url;
+            item.appendChild(caption);
+            grid.appendChild(item);
+        });
+    }
+
+    async function pollPreview(taskId) {
+        try {
+            const response = await fetch(`/get_preview_status/${taskId}`);
+            const data = await response.json();
+            if (data.previews) {
+                renderPreviews(data.previews);
+            }
+            if (data.status === 'running') {
+                previewTimer = setTimeout(() => pollPreview(taskId), 500);
+            }
+        } catch (error) {
+            console.error('Fehler beim Abrufen der Vorschau:', error);
+        }
+    }
+
+    async function startPreview() {
+        const selectedLinks = Array.from(
+            document.querySelectorAll('input[name="selected_links"]:checked')
+        ).map(checkbox => checkbox.value);
+        const mainLinkUrl = document.getElementById('main-link').getAttribute('data-url');
+        if (!selectedLinks.includes(mainLinkUrl)) {
+            selectedLinks.unshift(mainLinkUrl);
+        }
+
+        const modeRadio = document.querySelector('input[name="conversion_mode"]:checked');
+        const conversionMode = modeRadio ? modeRadio.value : 'collapsed';
+
+        if (previewTimer) {
+            clearTimeout(previewTimer);
+        }
+        try {
+            const response = await fetch('/start_preview', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    selected_links: selectedLinks,
+                    conversion_mode: conversionMode,
+                }),
+            });
+            const data = await response.json();
+            if (data.status === 'success' && data.task_id) {
+                pollPreview(data.task_id);
+            } else {
+                alert(data.message || 'Fehler beim Starten der Vorschau.');
+            }
+        } catch (error) {
+            console.error('Fehler beim Starten der Vorschau:', error);
+            alert('Es gab ein Problem beim Starten der Vorschau.');
+        }
+    }
+
+    const previewButton = document.getElementById('preview-button');
+    if (previewButton) {
+        previewButton.addEventListener('click', startPreview);
+    }
+
     // Verbesserte Suchfunktion
     const searchInput = document.getElementById('search-input');
     if (searchInput) {
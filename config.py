@@ -53,15 +53,22 @@ else:
 
 MAPPING_CACHE_DIR = CACHE_DIR / os.getenv('MAPPING_CACHE_DIR', 'mapping_cache')
 MAPPING_CACHE_FILE = os.getenv('MAPPING_CACHE_FILE', 'output_mapping.json')  # Nur der Dateiname
+HTTP_CACHE_DIR = CACHE_DIR / os.getenv('HTTP_CACHE_DIR', 'http_cache')  # Gemeinsamer Cache für statische Assets
+RENDER_CACHE_DIR = CACHE_DIR / os.getenv('RENDER_CACHE_DIR', 'render_cache')  # Gerenderte PDFs für Wiederverwendung
+PREVIEW_CACHE_DIR = CACHE_DIR / os.getenv('PREVIEW_CACHE_DIR', 'previews')  # Vorschaubilder der Seiten
+SNAPSHOT_DIR = CACHE_DIR / os.getenv('SNAPSHOT_DIR', 'snapshots')  # Beim Crawlen geladenes HTML
 
 # Output PDFs-Verzeichnis
 OUTPUT_PDFS_DIR = BASE_DIR / os.getenv('OUTPUT_PDFS_DIR', 'output_pdfs')
+WORKSPACES_DIR = OUTPUT_PDFS_DIR / os.getenv('WORKSPACES_DIR', 'jobs')  # Arbeitsverzeichnis pro PDF-Job
+PUBLISHED_DIR = OUTPUT_PDFS_DIR / os.getenv('PUBLISHED_DIR', 'published')  # Fertige ZIP-Archive zum Download
 
 # Pfade zu spezifischen Dateien im CONFIG_DIR
 TABOO_JSON_PATH = CONFIG_DIR / os.getenv('TABOO_JSON_FILE', 'taboo.json')
 COOKIES_SELECTOR_JSON_PATH = CONFIG_DIR / os.getenv('COOKIES_SELECTOR_JSON_FILE', 'cookies_selector.json')
 EXCLUDE_SELECTORS_JSON_PATH = CONFIG_DIR / os.getenv('EXCLUDE_SELECTORS_JSON_FILE', 'exclude_selectors.json')
 URLS_JSON_PATH = CONFIG_DIR / os.getenv('URLS_JSON_FILE', 'urls.json')
+RESOURCE_POLICY_JSON_PATH = CONFIG_DIR / os.getenv('RESOURCE_POLICY_JSON_FILE', 'resource_policy.json')
 
 # Zusätzliche Verzeichnisse für Remove Elements Konfiguration
 REMOVE_ELEMENTS_CONFIG_DIR = CONFIG_DIR / 'remove_elements'
@@ -76,6 +83,102 @@ DEFAULT_MAX_WORKERS = int(os.getenv('MAX_WORKERS', '4'))
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG').upper()
 ENABLE_LOGGING = os.getenv('ENABLE_LOGGING', 'True').lower() in ['true', '1', 't']
 
+# Browser-Pool (warme Chromium-Instanzen, die sich alle PDF-Jobs teilen)
+BROWSER_POOL_SIZE = int(os.getenv('BROWSER_POOL_SIZE', '2'))
+BROWSER_MAX_PAGES = int(os.getenv('BROWSER_MAX_PAGES', '200'))  # Recycling nach so vielen Seiten
+BROWSER_MAX_MEMORY_MB = int(os.getenv('BROWSER_MAX_MEMORY_MB', '1536'))  # Recycling ab diesem RSS
+BROWSER_HEALTH_CHECK_INTERVAL = float(os.getenv('BROWSER_HEALTH_CHECK_INTERVAL', '30'))  # Sekunden
+BROWSER_POOL_WARMUP = os.getenv('BROWSER_POOL_WARMUP', 'True').lower() in ['true', '1', 't']
+
+# Kontext-Pool pro Browser (wiederverwendete BrowserContexts statt Neuanlage pro URL)
+CONTEXT_POOL_MAX_IDLE = int(os.getenv('CONTEXT_POOL_MAX_IDLE', '8'))
+CONTEXT_MAX_USES = int(os.getenv('CONTEXT_MAX_USES', '50'))  # Danach wird der Kontext verworfen
+CONTEXT_REUSE_PAGES = os.getenv('CONTEXT_REUSE_PAGES', 'True').lower() in ['true', '1', 't']
+
+# Seitenbereitschaft (ereignisbasiert statt fester Wartezeiten, alle Werte in Millisekunden)
+READINESS_QUIET_MS = int(os.getenv('READINESS_QUIET_MS', '150'))
+READINESS_MUTATION_CAP_MS = int(os.getenv('READINESS_MUTATION_CAP_MS', '2000'))
+READINESS_IMAGE_CAP_MS = int(os.getenv('READINESS_IMAGE_CAP_MS', '3000'))
+READINESS_FONT_CAP_MS = int(os.getenv('READINESS_FONT_CAP_MS', '2000'))
+READINESS_LAYOUT_CAP_MS = int(os.getenv('READINESS_LAYOUT_CAP_MS', '1000'))
+
+# Inkrementelles Scrollen zum Auslösen von Lazy-Loading
+SCROLL_QUIET_MS = int(os.getenv('SCROLL_QUIET_MS', '150'))
+SCROLL_STEP_CAP_MS = int(os.getenv('SCROLL_STEP_CAP_MS', '1500'))
+SCROLL_TOTAL_CAP_MS = int(os.getenv('SCROLL_TOTAL_CAP_MS', '15000'))  # Harte Obergrenze pro Seite
+SCROLL_MAX_STEPS = int(os.getenv('SCROLL_MAX_STEPS', '150'))  # Schutz gegen Endlos-Scrolling
+
+# Gestufte Render-Timeouts und Circuit-Breaker pro Host
+RENDER_NAVIGATION_TIMEOUT_MS = int(os.getenv('RENDER_NAVIGATION_TIMEOUT_MS', '30000'))  # Bis DOMContentLoaded
+RENDER_SETTLE_TIMEOUT_MS = int(os.getenv('RENDER_SETTLE_TIMEOUT_MS', '10000'))  # Warten auf networkidle (nicht fatal)
+RENDER_PRINT_TIMEOUT_MS = int(os.getenv('RENDER_PRINT_TIMEOUT_MS', '60000'))  # page.pdf
+RENDER_RETRY_TIMEOUT_FACTOR = float(os.getenv('RENDER_RETRY_TIMEOUT_FACTOR', '2.0'))  # Wiederholung am Jobende
+CIRCUIT_BREAKER_THRESHOLD = int(os.getenv('CIRCUIT_BREAKER_THRESHOLD', '3'))  # Aufeinanderfolgende Fehler pro Host
+CIRCUIT_BREAKER_COOLDOWN_SECONDS = float(os.getenv('CIRCUIT_BREAKER_COOLDOWN_SECONDS', '60'))
+
+# Vorschau (Viewport-Screenshots in niedriger Auflösung vor dem eigentlichen PDF-Job)
+PREVIEW_WIDTH = int(os.getenv('PREVIEW_WIDTH', '480'))  # Breite der Vorschaubilder in Pixeln
+PREVIEW_JPEG_QUALITY = int(os.getenv('PREVIEW_JPEG_QUALITY', '60'))
+PREVIEW_NAVIGATION_TIMEOUT_MS = int(os.getenv('PREVIEW_NAVIGATION_TIMEOUT_MS', '15000'))
+PREVIEW_SETTLE_TIMEOUT_MS = int(os.getenv('PREVIEW_SETTLE_TIMEOUT_MS', '1500'))  # Kurzes Warten auf networkidle
+PREVIEW_MAX_URLS = int(os.getenv('PREVIEW_MAX_URLS', '50'))  # Höchstzahl URLs pro Vorschau-Auftrag
+PREVIEW_CACHE_MAX_AGE_HOURS = float(os.getenv('PREVIEW_CACHE_MAX_AGE_HOURS', '24'))
+
+# Render-Cache (PDFs pro URL, Modus, Render-Einstellungen und Inhalts-Fingerprint)
+RENDER_CACHE_ENABLED = os.getenv('RENDER_CACHE_ENABLED', 'True').lower() in ['true', '1', 't']
+RENDER_CACHE_MAX_MB = int(os.getenv('RENDER_CACHE_MAX_MB', '2048'))
+RENDER_CACHE_MAX_AGE_HOURS = float(os.getenv('RENDER_CACHE_MAX_AGE_HOURS', '168'))
+# Höchstdauer der HEAD-Anfrage (ETag/Last-Modified) vor dem Rendern einer bereits gecachten URL
+RENDER_CACHE_VALIDATOR_TIMEOUT_MS = int(os.getenv('RENDER_CACHE_VALIDATOR_TIMEOUT_MS', '3000'))
+
+# HTML-Snapshots aus dem Crawl: Hauptdokument beim Rendern aus dem Snapshot statt erneut vom Server
+SNAPSHOT_STORE_ENABLED = os.getenv('SNAPSHOT_STORE_ENABLED', 'False').lower() in ['true', '1', 't']
+SNAPSHOT_MAX_AGE_HOURS = float(os.getenv('SNAPSHOT_MAX_AGE_HOURS', '24'))
+
+# Adaptive Render-Parallelität (passt die Anzahl gleichzeitiger Seiten an RSS, CPU und Latenz an)
+RENDER_MIN_CONCURRENCY = int(os.getenv('RENDER_MIN_CONCURRENCY', '1'))
+RENDER_MAX_CONCURRENCY = int(os.getenv('RENDER_MAX_CONCURRENCY', '20'))
+RENDER_INITIAL_CONCURRENCY = int(os.getenv('RENDER_INITIAL_CONCURRENCY', '4'))
+RENDER_MEMORY_LIMIT_MB = int(os.getenv('RENDER_MEMORY_LIMIT_MB', '0'))  # 0 = aus cgroup bzw. RAM ermitteln
+RENDER_MEMORY_HIGH_PERCENT = float(os.getenv('RENDER_MEMORY_HIGH_PERCENT', '85'))
+RENDER_MEMORY_LOW_PERCENT = float(os.getenv('RENDER_MEMORY_LOW_PERCENT', '70'))
+RENDER_CPU_HIGH_PERCENT = float(os.getenv('RENDER_CPU_HIGH_PERCENT', '90'))
+RENDER_CONTROL_INTERVAL = float(os.getenv('RENDER_CONTROL_INTERVAL', '2'))  # Sekunden
+RENDER_LATENCY_WINDOW_SECONDS = float(os.getenv('RENDER_LATENCY_WINDOW_SECONDS', '300'))  # Fenster der Latenz-Basislinie
+RENDER_SMALL_JOB_MAX_URLS = int(os.getenv('RENDER_SMALL_JOB_MAX_URLS', '10'))  # Kleine Jobs werden bevorzugt
+
+# Render-Farm: große Jobs auf mehrere Prozesse mit jeweils eigenem Browser verteilen
+RENDER_FARM_WORKERS = int(os.getenv('RENDER_FARM_WORKERS', '0'))  # 0 = Anzahl CPU-Kerne
+RENDER_FARM_MIN_URLS = int(os.getenv('RENDER_FARM_MIN_URLS', '100'))  # Ab dieser Jobgröße wird verteilt
+RENDER_FARM_WORKER_CONCURRENCY = int(os.getenv('RENDER_FARM_WORKER_CONCURRENCY', '6'))  # Seiten pro Worker
+
+# Streaming-Pipeline Rendern -> Zusammenführen -> ZIP
+PIPELINE_REORDER_WINDOW = int(os.getenv('PIPELINE_REORDER_WINDOW', '50'))  # Max. Vorlauf des Renderns in URLs
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '8'))  # Kapazität der Queues zwischen den Stufen
+
+# ZIP-Archive: pro Datei STORED oder DEFLATE nach Stichprobe, Komprimieren im Thread-Pool
+ZIP_WORKERS = int(os.getenv('ZIP_WORKERS', '0'))  # 0 = Anzahl CPU-Kerne
+ZIP_STORE_RATIO = float(os.getenv('ZIP_STORE_RATIO', '0.9'))  # Ab diesem Verhältnis komprimiert/roh unverändert speichern
+ZIP_COMPRESSION_LEVEL = int(os.getenv('ZIP_COMPRESSION_LEVEL', '6'))
+
+# Job-Arbeitsverzeichnisse und veröffentlichte Archive (Garbage Collection)
+WORKSPACE_STALE_HOURS = float(os.getenv('WORKSPACE_STALE_HOURS', '6'))  # Verwaiste Arbeitsverzeichnisse entfernen
+ARTIFACT_RETENTION_HOURS = float(os.getenv('ARTIFACT_RETENTION_HOURS', '24'))  # Fertige Archive so lange behalten
+WORKSPACE_GC_INTERVAL_SECONDS = int(os.getenv('WORKSPACE_GC_INTERVAL_SECONDS', '600'))
+
+# Zusammenführen: byte-identische Schriften, Bilder und ICC-Profile nur einmal im Gesamt-PDF speichern
+PDF_MERGE_DEDUPLICATE = os.getenv('PDF_MERGE_DEDUPLICATE', 'True').lower() in ['true', '1', 't']
+# Prozesse für das Schreiben der zusammengeführten PDFs (2 = collapsed und expanded gleichzeitig, 0 = Anzahl CPU-Kerne)
+PDF_MERGE_WORKERS = int(os.getenv('PDF_MERGE_WORKERS', '2'))
+# Zusammengeführte PDFs linearisiert schreiben (Fast Web View), pro Job wählbar
+PDF_FAST_WEB_VIEW_DEFAULT = os.getenv('PDF_FAST_WEB_VIEW_DEFAULT', 'False').lower() in ['true', '1', 't']
+
+# PDF-Optimierung (Bilder herunterrechnen, Streams neu komprimieren), pro Job wählbar
+PDF_OPTIMIZE_DEFAULT = os.getenv('PDF_OPTIMIZE_DEFAULT', 'False').lower() in ['true', '1', 't']
+PDF_OPTIMIZE_TARGET_DPI = int(os.getenv('PDF_OPTIMIZE_TARGET_DPI', '150'))
+PDF_OPTIMIZE_JPEG_QUALITY = int(os.getenv('PDF_OPTIMIZE_JPEG_QUALITY', '80'))
+PDF_OPTIMIZE_WORKERS = int(os.getenv('PDF_OPTIMIZE_WORKERS', '0'))  # 0 = Anzahl CPU-Kerne
+
 # Logging-Konfiguration
 logger = logging.getLogger(__name__)
 logger.setLevel(getattr(logging, LOG_LEVEL, logging.DEBUG))
@@ -129,12 +232,18 @@ directories = [
     MAPPING_CACHE_DIR,
     LOGS_DIR,
     OUTPUT_PDFS_DIR,
+    WORKSPACES_DIR,
+    PUBLISHED_DIR,
     CSS_DIR,
     IMG_DIR,
     JS_DIR,
     TEMPLATES_DIR,
     UTILS_DIR,
     CACHE_DIR,
+    HTTP_CACHE_DIR,
+    RENDER_CACHE_DIR,
+    PREVIEW_CACHE_DIR,
+    SNAPSHOT_DIR,
     CONFIG_DIR,  # Config-Verzeichnis hinzugefügt
     REMOVE_ELEMENTS_CONFIG_DIR,
 ]
@@ -0,0 +1,53 @@
+import asyncio
+import unittest
+
+from app.processing.adaptive_concurrency import AdaptiveConcurrencyLimiter
+from app.processing.render_scheduler import RenderScheduler
+
+
+class CancelledWaiterTest(unittest.TestCase):
+    """Ein abgebrochener Wartender darf weder Limiter-Slot noch job.active belegt lassen."""
+
+    def test_cancelled_waiter_does_not_leak_slot(self):
+        async def scenario():
+            limiter = AdaptiveConcurrencyLimiter(min_limit=1, max_limit=1, initial_limit=1, interval=3600)
+            scheduler = RenderScheduler(limiter)
+            async with scheduler.job('job', 10, 5) as job:
+                holder_entered = asyncio.Event()
+                holder_exit = asyncio.Event()
+
+                async def holder():
+                    async with scheduler.slot(job):
+                        holder_entered.set()
+                        await holder_exit.wait()
+
+                async def waiter():
+                    async with scheduler.slot(job):
+                        pass
+
+                holder_task = asyncio.create_task(holder())
+                await holder_entered.wait()
+                waiter_task = asyncio.create_task(waiter())
+                await asyncio.sleep(0)
+                # Slot wird frei, der Wartende wird abgebrochen, bevor der Dispatcher läuft
+                holder_exit.set()
+                await asyncio.sleep(0)
+                waiter_task.cancel()
+                await asyncio.gather(holder_task, waiter_task, return_exceptions=True)
+
+                async def follow_up():
+                    async with scheduler.slot(job):
+                        return True
+
+                granted = await asyncio.wait_for(follow_up(), timeout=2)
+                await asyncio.sleep(0)
+                return granted, limiter.active, job.active
+
+        granted, limiter_active, job_active = asyncio.run(scenario())
+        self.assertTrue(granted)
+        self.assertEqual(limiter_active, 0)
+        self.assertEqual(job_active, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()